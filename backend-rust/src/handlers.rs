@@ -4,6 +4,7 @@ use axum::{
     response::IntoResponse,
 };
 use std::env;
+use std::time::Duration;
 use crate::models::{RecommendationRequest, RecommendationResponse};
 
 pub async fn get_recommendations(
@@ -30,9 +31,19 @@ pub async fn get_recommendations(
 
     println!("🔗 Forwarding request to: {}", ai_service_url); // Log untuk debugging
 
+    // Budget request (ms) diteruskan ke AI service lewat header X-Request-Timeout-Ms:
+    // jika CF tidak selesai dalam budget, AI service mengembalikan hasil ter-degradasi (bukan timeout)
+    let timeout_ms: u64 = env::var("AI_SERVICE_TIMEOUT_MS")
+        .ok()
+        .and_then(|value| value.parse().ok())
+        .unwrap_or(1000);
+
     // 3. Tembak ke Python (Proxy)
     let client = reqwest::Client::new();
     let response = client.post(&ai_service_url)
+        .header("X-Request-Timeout-Ms", timeout_ms.to_string())
+        // Sedikit kelonggaran untuk jaringan & serialisasi di atas budget AI service
+        .timeout(Duration::from_millis(timeout_ms + 500))
         .json(&payload)
         .send()
         .await;
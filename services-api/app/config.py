@@ -6,18 +6,87 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Data paths - use environment variables in production, local paths in development
 DATA_PATH = Path(os.getenv("DATA_PATH", str(BASE_DIR / "games.csv")))
+# Jumlah baris games.csv per chunk saat di-stream (memori puncak loader ~ 1 chunk + 8 byte per game untuk dedupe id)
+DATA_CHUNK_ROWS = int(os.getenv("DATA_CHUNK_ROWS", 50000))
 
 # Model paths - only files actually loaded!
 CONTENT_MODEL_PATH = Path(os.getenv("CONTENT_MODEL_PATH", str(BASE_DIR / "models" / "content_based_model.pkl")))
+# Memory-mapped content-based similarity matrix (dibuat dari CONTENT_MODEL_PATH, lihat app/services/cb_engine.py)
+CB_MATRIX_PATH = Path(os.getenv("CB_MATRIX_PATH", str(BASE_DIR / "models" / "content_based_matrix.npy")))
+# Content-based engine: "matrix" (similarity opening x opening, CB_MATRIX_PATH) atau
+# "vectors" (vektor fitur opening + centroid query, CB_VECTORS_PATH; lihat app/services/cb_vectors.py)
+CB_ENGINE = os.getenv("CB_ENGINE", "matrix").lower()
+CB_VECTORS_PATH = Path(os.getenv("CB_VECTORS_PATH", str(BASE_DIR / "models" / "content_based_vectors.npy")))
+# Engine "vectors": IVF (approximate) dipakai mulai jumlah opening ini (0 = selalu exact brute-force),
+# memeriksa CB_IVF_NPROBE cluster per query
+CB_IVF_MIN_ITEMS = int(os.getenv("CB_IVF_MIN_ITEMS", 50000))
+CB_IVF_NPROBE = int(os.getenv("CB_IVF_NPROBE", 16))
 COLLAB_MODEL_PATH = Path(os.getenv("COLLAB_MODEL_PATH", str(BASE_DIR / "models" / "collaborative_model.keras")))
 COLLAB_DATA_PATH = Path(os.getenv("COLLAB_DATA_PATH", str(BASE_DIR / "models" / "collaborative_data.pkl")))
 
+# Compiled bundle (python -m app.services.bundle); jika ada, menggantikan CSV + pickle saat load
+BUNDLE_PATH = Path(os.getenv("BUNDLE_PATH", str(BASE_DIR / "models" / "bundle")))
+
+# Checkpoint statistik opening incremental (python -m app.services.stats); jika ada, menggantikan
+# win rates, complexity & popularity yang dihitung dari games.csv / collaborative_data.pkl
+STATS_PATH = Path(os.getenv("STATS_PATH", str(BASE_DIR / "models" / "opening_stats.npy")))
+
 # Note: hybrid_model.pkl not needed - hybrid logic is in predict() method, not a pickled function
 
+# Result cache for /predict (bounded LRU + TTL)
+PREDICT_CACHE_SIZE = int(os.getenv("PREDICT_CACHE_SIZE", 4096))
+PREDICT_CACHE_TTL = float(os.getenv("PREDICT_CACHE_TTL", 3600))
+PREDICT_CACHE_ALPHA_STEP = float(os.getenv("PREDICT_CACHE_ALPHA_STEP", 0.01))
+
+# Collaborative filtering engine: "numpy" (bobot Keras diekstrak, tanpa TF di request path) atau "keras"
+CF_ENGINE = os.getenv("CF_ENGINE", "numpy").lower()
+CF_PARITY_TOLERANCE = float(os.getenv("CF_PARITY_TOLERANCE", 1e-4))
+# Hasil ekstraksi NumPy dari COLLAB_MODEL_PATH (python -m app.services.cf_engine); jika ada, TensorFlow tidak diimpor
+CF_NUMPY_MODEL_PATH = Path(os.getenv("CF_NUMPY_MODEL_PATH", str(BASE_DIR / "models" / "collaborative_model_numpy.pkl")))
+
+# Precompute CF untuk semua rating bucket:
+#   off        -> lazy per bucket (tanpa artifact)
+#   artifact   -> memory-map artifact jika ada, selain itu lazy
+#   startup    -> artifact jika ada, selain itu hitung semua bucket sebelum siap
+#   background -> artifact jika ada, selain itu hitung semua bucket di background thread
+CF_PRECOMPUTE = os.getenv("CF_PRECOMPUTE", "background").lower()
+CF_BUCKETS_PATH = Path(os.getenv("CF_BUCKETS_PATH", str(BASE_DIR / "models" / "cf_bucket_scores.npy")))
+
+# Micro-batching CF miss di /predict: kumpulkan bucket selama window (ms) atau sampai max bucket berbeda
+CF_BATCH_WINDOW_MS = float(os.getenv("CF_BATCH_WINDOW_MS", 3))
+CF_BATCH_MAX_SIZE = int(os.getenv("CF_BATCH_MAX_SIZE", 8))
+# Batas beban CF: batch inference yang berjalan sekaligus & request yang menunggu (0 = tidak dibatasi);
+# request di luar batas di-degradasi (fallback popularity / CB saja), bukan ikut mengantri
+CF_MAX_INFLIGHT = int(os.getenv("CF_MAX_INFLIGHT", 1))
+CF_MAX_PENDING = int(os.getenv("CF_MAX_PENDING", 256))
+
+# Budget default /predict dalam ms jika request tidak membawa header X-Request-Timeout-Ms
+# (0 = tanpa deadline; gateway yang ingin degradasi mengirim header, mis. backend-rust)
+PREDICT_TIMEOUT_MS = float(os.getenv("PREDICT_TIMEOUT_MS", 0))
+
+# Response /predict & /predict/batch (app/services/encoding.py): gzip jika client mengirim
+# Accept-Encoding: gzip dan body minimal sekian byte; level zlib 1-9 (0 = kompresi mati)
+RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", 1024))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 1))
+
+# Startup: "blocking" (muat semua model sebelum menerima request) atau
+# "background" (bind langsung, model dimuat di background; CB-only sampai CF siap)
+STARTUP_MODE = os.getenv("STARTUP_MODE", "blocking").lower()
+
+# Hot reload model (app/services/reload.py): interval polling file model dalam detik (0 = mati),
+# jumlah request terbaru yang dihitung ulang di snapshot baru sebelum swap, dan token untuk /admin/*
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", 0))
+RELOAD_WARM_QUERIES = int(os.getenv("RELOAD_WARM_QUERIES", 256))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
 # Server configuration (for Cloud Run compatibility)
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", 8001))
+# Jumlah worker untuk `python -m app.server` (model dimuat sekali lalu dibagi ke semua worker)
+WORKERS = int(os.getenv("WORKERS", 1))
 LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+# Fraksi event hot path (mis. CF cache hit) yang benar-benar ditulis ke log (0..1)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.01))
 
 # CORS origins (for production)
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",") if os.getenv("CORS_ORIGINS") != "*" else ["*"]
@@ -32,12 +101,41 @@ class Settings:
     """Settings class for more structured configuration"""
     BASE_DIR = BASE_DIR
     DATA_PATH = DATA_PATH
+    DATA_CHUNK_ROWS = DATA_CHUNK_ROWS
     CONTENT_MODEL_PATH = CONTENT_MODEL_PATH
+    CB_MATRIX_PATH = CB_MATRIX_PATH
+    CB_ENGINE = CB_ENGINE
+    CB_VECTORS_PATH = CB_VECTORS_PATH
+    CB_IVF_MIN_ITEMS = CB_IVF_MIN_ITEMS
+    CB_IVF_NPROBE = CB_IVF_NPROBE
+    BUNDLE_PATH = BUNDLE_PATH
+    STATS_PATH = STATS_PATH
     COLLAB_MODEL_PATH = COLLAB_MODEL_PATH
     COLLAB_DATA_PATH = COLLAB_DATA_PATH
+    PREDICT_CACHE_SIZE = PREDICT_CACHE_SIZE
+    PREDICT_CACHE_TTL = PREDICT_CACHE_TTL
+    PREDICT_CACHE_ALPHA_STEP = PREDICT_CACHE_ALPHA_STEP
+    CF_ENGINE = CF_ENGINE
+    CF_PARITY_TOLERANCE = CF_PARITY_TOLERANCE
+    CF_NUMPY_MODEL_PATH = CF_NUMPY_MODEL_PATH
+    CF_PRECOMPUTE = CF_PRECOMPUTE
+    CF_BUCKETS_PATH = CF_BUCKETS_PATH
+    CF_BATCH_WINDOW_MS = CF_BATCH_WINDOW_MS
+    CF_BATCH_MAX_SIZE = CF_BATCH_MAX_SIZE
+    CF_MAX_INFLIGHT = CF_MAX_INFLIGHT
+    CF_MAX_PENDING = CF_MAX_PENDING
+    PREDICT_TIMEOUT_MS = PREDICT_TIMEOUT_MS
+    RESPONSE_GZIP_MIN_BYTES = RESPONSE_GZIP_MIN_BYTES
+    RESPONSE_GZIP_LEVEL = RESPONSE_GZIP_LEVEL
+    STARTUP_MODE = STARTUP_MODE
+    MODEL_WATCH_INTERVAL = MODEL_WATCH_INTERVAL
+    RELOAD_WARM_QUERIES = RELOAD_WARM_QUERIES
+    ADMIN_TOKEN = ADMIN_TOKEN
     HOST = HOST
     PORT = PORT
+    WORKERS = WORKERS
     LOG_LEVEL = LOG_LEVEL
+    LOG_SAMPLE_RATE = LOG_SAMPLE_RATE
     CORS_ORIGINS = CORS_ORIGINS
     APP_NAME = APP_NAME
     APP_VERSION = APP_VERSION
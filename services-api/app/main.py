@@ -1,9 +1,19 @@
-from fastapi import FastAPI, HTTPException, APIRouter
+from fastapi import FastAPI, HTTPException, APIRouter, Query, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
-from app.schemas import RecommendationRequest, RecommendationResponse
+from app.schemas import RecommendationRequest, RecommendationResponse, BatchRecommendationRequest
 from app.services.engine import recommender
-from typing import List
+from app.services.catalog import OpeningCatalog
+from app.services.reload import reloader
+from app.services.stats import parse_game_stream
+from app.services.encoding import MSGPACK, NDJSON, ResponseEncoder, accepts_gzip
+from app.services import metrics
+from typing import List, Literal, Optional
+import asyncio
+import os
+import secrets
+import time
 import pandas as pd
 from app.config import settings
 
@@ -11,11 +21,22 @@ from app.config import settings
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Load model saat aplikasi start
-    recommender.load_resources()
-    if not recommender.is_ready:
-        print("⚠️ Warning: Models failed to load. API will return errors.")
+    if recommender.is_ready:
+        # Sudah dimuat oleh parent process sebelum fork (python -m app.server)
+        pass
+    elif settings.STARTUP_MODE == "background":
+        # Bind langsung; model dimuat di thread terpisah (lihat recommender.status())
+        app.state.loader = asyncio.create_task(asyncio.to_thread(recommender.load_resources))
+    else:
+        recommender.load_resources()
+        if not recommender.is_ready:
+            print("⚠️ Warning: Models failed to load. API will return errors.")
+    if settings.MODEL_WATCH_INTERVAL > 0:
+        # Hot reload otomatis saat file model berubah (lihat app/services/reload.py)
+        reloader.watch(settings.MODEL_WATCH_INTERVAL)
     yield
     # Clean up resources jika perlu (saat shutdown)
+    reloader.stop()
     print("🛑 Shutting down AI Service...")
 
 app = FastAPI(title="ChessRecs AI Service", version="1.0", lifespan=lifespan)
@@ -29,59 +50,260 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class MetricsMiddleware:
+    """ASGI middleware: jumlah request in-flight, latency & status code per endpoint"""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = None
+
+    def _endpoint(self, path):
+        # Label dibatasi ke route yang terdaftar agar jumlah seri metrics tidak tumbuh tanpa batas
+        if self._route_paths is None:
+            self._route_paths = {route.path for route in app.routes}
+        return path if path in self._route_paths else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self._endpoint(scope["path"])
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = metrics.REQUESTS_IN_FLIGHT.labels(endpoint)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            metrics.REQUEST_SECONDS.labels(endpoint, method).observe(time.perf_counter() - start)
+            metrics.REQUESTS.labels(endpoint, method, status["code"]).inc()
+
+app.add_middleware(MetricsMiddleware)
+
 # Router for API endpoints
 router = APIRouter()
 
 @app.get("/")
 def health_check():
-    return {"status": "active", "model_ready": recommender.is_ready}
+    return {"status": "active", **recommender.status()}
+
+# Fallback jika kolom opening_name tidak ada di data
+DEFAULT_OPENINGS = [
+    "Sicilian Defense",
+    "French Defense", 
+    "Caro-Kann Defense",
+    "Italian Game",
+    "Spanish Opening",
+    "Queen's Gambit",
+    "King's Indian Defense",
+    "English Opening",
+    "Ruy Lopez",
+    "Scandinavian Defense",
+    "Nimzo-Indian Defense",
+    "Pirc Defense"
+]
+
+_catalog = None
+
+def get_catalog() -> OpeningCatalog:
+    """Katalog opening di memori; dibangun ulang hanya jika versi data berubah"""
+    global _catalog
+    if recommender.stages['data']:
+        version = recommender.data_version
+        if _catalog is None or _catalog.version != version:
+            _catalog = OpeningCatalog(recommender.opening_names(), version)
+        return _catalog
+
+    # Data belum dimuat (mis. startup background): baca kolom opening_name dari CSV sekali per versi file
+    stat = os.stat(settings.DATA_PATH)
+    version = f"csv-{stat.st_size}-{stat.st_mtime_ns}"
+    if _catalog is None or _catalog.version != version:
+        header = pd.read_csv(settings.DATA_PATH, nrows=0).columns
+        if 'opening_name' in header:
+            names = pd.read_csv(settings.DATA_PATH, usecols=['opening_name'])['opening_name'].dropna().unique().tolist()
+        else:
+            names = DEFAULT_OPENINGS
+        _catalog = OpeningCatalog(names, version)
+    return _catalog
 
 @app.get("/openings")
-def get_all_openings():
-    """Get list of unique opening names from games.csv"""
+def get_all_openings(request: Request):
+    """Get list of unique opening names (cached, with ETag & gzip)"""
     try:
-        df = pd.read_csv(settings.DATA_PATH)
-        
-        # Get unique opening names and sort
-        if 'opening_name' in df.columns:
-            openings = df['opening_name'].dropna().unique().tolist()
-            openings.sort()
-            return {"openings": openings, "count": len(openings)}
-        else:
-            # Fallback to hardcoded list if column not found
-            return {"openings": [
-                "Sicilian Defense",
-                "French Defense", 
-                "Caro-Kann Defense",
-                "Italian Game",
-                "Spanish Opening",
-                "Queen's Gambit",
-                "King's Indian Defense",
-                "English Opening",
-                "Ruy Lopez",
-                "Scandinavian Defense",
-                "Nimzo-Indian Defense",
-                "Pirc Defense"
-            ], "count": 12}
+        catalog = get_catalog()
     except Exception as e:
         print(f"Error loading openings: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to load openings: {str(e)}")
 
-@app.post("/predict", response_model=List[RecommendationResponse])
-def get_recommendations(payload: RecommendationRequest):
+    headers = {"ETag": catalog.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if catalog.matches_etag(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    if accepts_gzip(request.headers.get("accept-encoding", "")):
+        return Response(catalog.body_gzip, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+    return Response(catalog.body, media_type="application/json", headers=headers)
+
+@app.get("/openings/search")
+def search_openings(
+    q: str = Query(..., min_length=1, max_length=100, description="Teks pencarian"),
+    mode: Literal["prefix", "substring"] = "prefix",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Typeahead: cari opening berdasarkan prefix/substring (case-insensitive) dengan pagination"""
+    try:
+        catalog = get_catalog()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load openings: {str(e)}")
+    return catalog.search(q, mode=mode, offset=offset, limit=limit)
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Hit/miss/eviction counters for the /predict result cache"""
+    return recommender.cache_stats()
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics: latency per stage, CF cache per bucket, model load, HTTP in-flight/latency"""
+    recommender.export_metrics()
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def require_admin(token: Optional[str]):
+    """Endpoint /admin/* hanya aktif jika ADMIN_TOKEN di-set, dan butuh header X-Admin-Token yang cocok"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set).")
+    if not token or not secrets.compare_digest(token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+@app.post("/admin/reload", status_code=202)
+def reload_models(x_admin_token: Optional[str] = Header(None)):
+    """Muat ulang semua model di background lalu tukar snapshot tanpa downtime"""
+    require_admin(x_admin_token)
+    started = reloader.start("api")
+    return {"started": started, **reloader.status()}
+
+@app.get("/admin/reload")
+def get_reload_status(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return reloader.status()
+
+_ingest_lock = asyncio.Lock()
+
+@app.post("/admin/ingest")
+async def ingest_games(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """
+    Tambahkan game baru ke statistik opening (win rates, complexity, popularity) tanpa restart.
+    Body: NDJSON (satu game per baris) atau CSV ber-header (Content-Type: text/csv), di-stream per chunk.
+    """
+    require_admin(x_admin_token)
+    if recommender.snapshot.opening_stats is None:
+        raise HTTPException(
+            status_code=409,
+            detail="No opening stats checkpoint loaded; bootstrap one with python -m app.services.stats games.csv",
+        )
+    ndjson = "csv" not in request.headers.get("content-type", "")
+    async with _ingest_lock:
+        # Ingest ke salinan; snapshot aktif baru diganti (copy-on-write) setelah semua chunk masuk
+        stats = recommender.snapshot.opening_stats.copy()
+        ingested = 0
+        try:
+            async for chunk in parse_game_stream(request.stream(), ndjson=ndjson):
+                ingested += await asyncio.to_thread(stats.update, chunk)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid games: {str(e)}")
+        finally:
+            # Game yang sudah masuk tetap disimpan & diterapkan walaupun chunk berikutnya gagal
+            if ingested:
+                await asyncio.to_thread(stats.save, settings.STATS_PATH)
+                await asyncio.to_thread(reloader.apply_stats, stats)
+    return {
+        "ingested": ingested,
+        "games_ingested": stats.games_ingested,
+        "openings": len(stats),
+        "data_version": recommender.data_version,
+    }
+
+def request_timeout(timeout_ms: Optional[float]):
+    """Budget request dalam detik: header gateway, selain itu PREDICT_TIMEOUT_MS (None = tanpa deadline)"""
+    if timeout_ms is None:
+        timeout_ms = settings.PREDICT_TIMEOUT_MS or None
+    return None if timeout_ms is None else timeout_ms / 1000
+
+def response_encoder(request: Request):
+    """Format (JSON / MessagePack) & gzip response sesuai header Accept dan Accept-Encoding"""
+    return ResponseEncoder(
+        request.headers.get("accept"),
+        request.headers.get("accept-encoding"),
+        gzip_min_bytes=settings.RESPONSE_GZIP_MIN_BYTES,
+        gzip_level=settings.RESPONSE_GZIP_LEVEL,
+    )
+
+@app.post(
+    "/predict",
+    response_model=List[RecommendationResponse],
+    responses={200: {"content": {MSGPACK: {}}}},
+)
+async def get_recommendations(
+    payload: RecommendationRequest,
+    request: Request,
+    x_request_timeout_ms: Optional[float] = Header(None, description="Sisa budget request dari gateway (ms)"),
+):
     if not recommender.is_ready:
         raise HTTPException(status_code=503, detail="AI Models are not loaded yet.")
     
     try:
-        results = recommender.predict(
+        # CF miss dikumpulkan micro-batcher & dihitung di thread terpisah (lihat app/services/batcher.py);
+        # jika CF tidak muat dalam budget, hasil di-degradasi dan ditandai lewat header X-Degraded
+        results, degraded = await recommender.predict_async(
             user_rating=payload.user_rating,
             favorite_openings=payload.favorite_openings,
-            alpha=payload.alpha
+            alpha=payload.alpha,
+            timeout=request_timeout(x_request_timeout_ms),
         )
-        return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+    # Hasil engine sudah sesuai schema: encode langsung tanpa validasi ulang response_model
+    encoder = response_encoder(request)
+    body, headers = encoder.body(results)
+    if degraded:
+        headers["X-Degraded"] = degraded
+    return Response(body, media_type=encoder.media_type, headers=headers)
+
+@app.post("/predict/batch", responses={200: {"content": {NDJSON: {}, MSGPACK: {}}}})
+def get_batch_recommendations(payload: BatchRecommendationRequest, request: Request):
+    """
+    Rekomendasi untuk banyak profil sekaligus, di-stream sebagai NDJSON (satu baris per profil)
+    atau rangkaian objek MessagePack jika diminta lewat Accept
+    """
+    if not recommender.is_ready:
+        raise HTTPException(status_code=503, detail="AI Models are not loaded yet.")
+
+    profiles = [(p.user_rating, p.favorite_openings, p.alpha) for p in payload.profiles]
+
+    def records():
+        try:
+            for index, results in recommender.predict_batch(profiles, top_n=payload.top_n):
+                yield {"index": index, "recommendations": results}
+        except Exception as e:
+            # Header sudah terkirim; laporkan error sebagai record terakhir
+            yield {"error": f"Prediction error: {str(e)}"}
+
+    encoder = response_encoder(request)
+    return StreamingResponse(
+        encoder.stream(records()),
+        media_type=encoder.stream_media_type,
+        headers=encoder.headers(encoder.gzip),
+    )
+
 if __name__ == "__main__":
     import uvicorn
     # Reload=True hanya untuk development
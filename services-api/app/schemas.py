@@ -6,6 +6,10 @@ class RecommendationRequest(BaseModel):
     favorite_openings: List[str] = Field(..., min_length=1, max_length=5, description="List nama opening favorit")
     alpha: float = Field(0.7, ge=0.0, le=1.0, description="Bobot Hybrid (0.0 - 1.0)")
 
+class BatchRecommendationRequest(BaseModel):
+    profiles: List[RecommendationRequest] = Field(..., min_length=1, max_length=50000, description="Daftar profil user")
+    top_n: int = Field(5, ge=1, le=50, description="Jumlah rekomendasi per profil")
+
 class RecommendationResponse(BaseModel):
     opening_name: str
     archetype: Optional[str] = "Unknown"
@@ -0,0 +1,230 @@
+"""
+Multi-worker server: model dimuat sekali oleh parent, lalu di-fork ke N worker uvicorn.
+
+    python -m app.server [--workers 4] [--host 0.0.0.0] [--port 8080]
+
+Dengan 1 worker tidak ada fork: uvicorn dijalankan langsung (sama dengan `uvicorn app.main:app`),
+jadi STARTUP_MODE dan CF_PRECOMPUTE berlaku seperti biasa. Dengan STARTUP_MODE=background parent
+langsung bind & fork tanpa preload; setiap worker memuat modelnya sendiri di background (hanya
+halaman bundle yang di-memory-map yang dibagi).
+
+1. Parent memuat model dari compiled bundle: semua kolom (tabel opening, FEN, matrix
+   similarity CB, index pemain, ...) di-memory-map, sehingga halaman memorinya dibagi
+   oleh semua worker lewat page cache. Jika belum ada bundle (python -m app.services.bundle),
+   parent meng-compile-nya dulu dari games.csv + pickle ke shared memory (/dev/shm) dan
+   menghapusnya saat berhenti.
+2. CF scores untuk semua rating bucket dihitung sebelum fork (CF_PRECOMPUTE dipaksa
+   "startup"), jadi tidak ada thread saat fork dan worker tidak pernah memanggil CF scorer.
+   TensorFlow tidak fork-safe, jadi parent memakai CF_ENGINE=numpy: jika hasil ekstraksi
+   NumPy belum ada, ekstraksi dijalankan di subprocess (python -m app.services.cf_engine).
+   Jika TensorFlow tetap termuat di parent (mis. parity check gagal), server menolak fork.
+   Sisa data Python di-`gc.freeze()` agar GC worker tidak menyentuh (dan menyalin) halamannya.
+3. Parent membuka socket, fork N worker yang menerima koneksi dari socket yang sama,
+   me-restart worker yang mati dan meneruskan SIGTERM/SIGINT ke semua worker.
+
+Memori total ~1x data model + overhead interpreter per worker; throughput naik sesuai
+jumlah core karena setiap worker punya GIL sendiri. /metrics dan result cache per worker.
+"""
+import gc
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+
+import uvicorn
+
+from app.config import settings
+
+# Jeda sebelum me-restart worker yang mati, agar worker yang crash saat start tidak loop terus
+RESTART_DELAY = 1.0
+# Folder services-api, cwd subprocess `python -m app.services...`
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+def _shared_dir():
+    """Folder di shared memory (tmpfs) untuk bundle & CF scorer hasil compile; fallback ke temp dir"""
+    shm = Path("/dev/shm")
+    base = shm if shm.is_dir() and os.access(shm, os.W_OK) else Path(tempfile.gettempdir())
+    return base / f"chessrecs-{os.getpid()}"
+
+
+def _ensure_bundle(target):
+    """Pastikan settings.BUNDLE_PATH menunjuk ke bundle yang bisa di-memory-map (compile ke `target` jika belum ada)"""
+    from app.services.bundle import compile_bundle, load_bundle
+    from app.services.engine import ChessRecommender
+
+    if load_bundle(settings.BUNDLE_PATH) is not None:
+        return
+
+    print(f"⏳ No compiled bundle at {settings.BUNDLE_PATH}; compiling into {target}...")
+    start = time.perf_counter()
+    try:
+        manifest = compile_bundle(ChessRecommender(), target / "bundle")
+    except Exception as e:
+        shutil.rmtree(target / "bundle", ignore_errors=True)
+        print(f"⚠️ Bundle compile failed, workers will share copy-on-write memory only: {e}")
+        return
+    # Data legacy hanya dipakai untuk compile; bebaskan sebelum model dimuat ulang dari bundle
+    gc.collect()
+    settings.BUNDLE_PATH = target / "bundle"
+    print(f"✅ Compiled bundle {manifest['bundle_hash']} in {time.perf_counter() - start:.1f}s")
+
+
+def _ensure_numpy_cf(target):
+    """
+    Pakai CF_ENGINE=numpy di parent agar TensorFlow tidak dimuat sebelum fork. Jika hasil
+    ekstraksi belum ada / stale, ekstrak di subprocess (TensorFlow hanya dimuat di sana).
+    """
+    from app.services.artifacts import file_sha256
+    from app.services.cf_engine import NumpyCFScorer
+
+    settings.CF_ENGINE = "numpy"
+    if not settings.COLLAB_MODEL_PATH.exists():
+        return
+    if NumpyCFScorer.load(settings.CF_NUMPY_MODEL_PATH, source_sha256=file_sha256(settings.COLLAB_MODEL_PATH)):
+        return
+
+    output = target / settings.CF_NUMPY_MODEL_PATH.name
+    print(f"⏳ No NumPy CF scorer at {settings.CF_NUMPY_MODEL_PATH}; extracting into {output}...")
+    target.mkdir(parents=True, exist_ok=True)
+    result = subprocess.run(
+        [sys.executable, "-m", "app.services.cf_engine",
+         "--model", str(settings.COLLAB_MODEL_PATH),
+         "--data", str(settings.COLLAB_DATA_PATH),
+         "--output", str(output)],
+        cwd=SERVICE_DIR,
+    )
+    if result.returncode == 0:
+        settings.CF_NUMPY_MODEL_PATH = output
+
+
+def preload():
+    """Muat model di parent (sebelum fork). Return True jika model siap melayani."""
+    from app.services.engine import recommender
+
+    settings.CF_PRECOMPUTE = "startup"
+    recommender.load_resources()
+    if "tensorflow" in sys.modules:
+        raise SystemExit(
+            "❌ TensorFlow was loaded in the parent process and is not fork-safe. "
+            "Build the NumPy CF scorer (python -m app.services.cf_engine) or run with WORKERS=1."
+        )
+    return recommender.is_ready
+
+
+def _bind(host, port):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock):
+    from app.main import app
+
+    config = uvicorn.Config(app, log_level=settings.LOG_LEVEL, timeout_keep_alive=75)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(sock):
+    pid = os.fork()
+    if pid:
+        return pid
+    # Worker: handler sinyal parent tidak berlaku di sini (uvicorn memasang handler sendiri)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    code = 0
+    try:
+        _run_worker(sock)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def serve(workers=None, host=None, port=None):
+    workers = max(1, workers or settings.WORKERS)
+    host = host or settings.HOST
+    port = port or settings.PORT
+
+    if workers == 1:
+        # Tanpa fork: lifespan app.main yang memuat model (STARTUP_MODE / CF_PRECOMPUTE apa adanya)
+        uvicorn.run("app.main:app", host=host, port=port, log_level=settings.LOG_LEVEL, timeout_keep_alive=75)
+        return
+
+    shared = _shared_dir()
+    try:
+        if settings.STARTUP_MODE == "background":
+            # Bind & fork langsung; setiap worker memuat model sendiri di background (lifespan)
+            print("⏳ STARTUP_MODE=background: workers load their own model after fork")
+        else:
+            _ensure_bundle(shared)
+            _ensure_numpy_cf(shared)
+            if not preload():
+                print("⚠️ Warning: Models failed to load. API will return errors.")
+        # Import app (route, middleware, catalog) sekali di parent agar ikut dibagi
+        import app.main  # noqa: F401
+
+        sock = _bind(host, port)
+        gc.collect()
+        gc.freeze()
+
+        children = set()
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+            for pid in children:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        for _ in range(workers):
+            children.add(_spawn(sock))
+        print(f"🚀 Serving on {host}:{port} with {workers} worker(s): {sorted(children)}")
+
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            children.discard(pid)
+            if stopping:
+                continue
+            print(f"⚠️ Worker {pid} exited (status {os.waitstatus_to_exitcode(status)}); restarting")
+            time.sleep(RESTART_DELAY)
+            if not stopping:
+                children.add(_spawn(sock))
+        sock.close()
+    finally:
+        shutil.rmtree(shared, ignore_errors=True)
+        print("🛑 Shutting down AI Service...")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the API with N forked workers sharing preloaded model data")
+    parser.add_argument("--workers", type=int, default=settings.WORKERS)
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    args = parser.parse_args()
+
+    serve(args.workers, args.host, args.port)
@@ -0,0 +1,23 @@
+import hashlib
+from pathlib import Path
+
+
+def update_digest(h, path):
+    """Tambahkan isi file (atau semua file dalam folder) ke hasher `h`"""
+    path = Path(path)
+    if path.is_file():
+        files = [path]
+    elif path.is_dir():
+        files = sorted(p for p in path.rglob('*') if p.is_file())
+    else:
+        files = []
+    for file in files:
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    return h
+
+
+def file_sha256(path):
+    """sha256 dari isi file/folder (dipakai untuk mendeteksi artifact yang usang)"""
+    return update_digest(hashlib.sha256(), path).hexdigest()
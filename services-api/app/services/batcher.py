@@ -0,0 +1,155 @@
+"""
+Micro-batching asyncio untuk CF inference.
+
+Request yang miss CF cache tidak memanggil scorer sendiri-sendiri: bucket-nya dikumpulkan
+selama `window` detik (atau sampai `max_batch` bucket berbeda), bucket yang sama digabung,
+lalu semuanya dihitung dengan satu inference di thread terpisah (event loop tidak
+terblokir). Hasil dibagikan ke semua request yang menunggu.
+
+Beban dibatasi: paling banyak `max_inflight` batch berjalan sekaligus (request yang datang
+selama itu digabung ke batch berikutnya) dan paling banyak `max_pending` request menunggu.
+Request yang tidak bisa dilayani dalam timeout-nya ditolak dengan CFOverloaded (lihat
+ChessRecommender.predict_async untuk degradasi).
+"""
+import asyncio
+import time
+
+from app.services import metrics
+
+# Bobot sampel terbaru pada rata-rata durasi batch (EWMA) untuk estimasi waktu tunggu
+_EWMA_WEIGHT = 0.2
+
+
+class CFOverloaded(Exception):
+    """CF scores tidak tersedia dalam budget request; `reason` = queue_full / deadline / timeout"""
+
+    def __init__(self, reason):
+        super().__init__(f"CF inference shed ({reason})")
+        self.reason = reason
+
+
+class CFBatcher:
+    """
+    `compute(buckets) -> {bucket: scores}` dijalankan sekali per batch (lihat
+    ChessRecommender.compute_cf_buckets). Dipakai dari satu event loop.
+
+    `compute` diberikan per panggilan (bukan disimpan) agar batcher tidak membuat
+    reference cycle dengan snapshot model pemiliknya, sehingga snapshot lama langsung
+    dilepas setelah hot reload.
+    """
+
+    def __init__(self, window=0.003, max_batch=8, max_pending=0, max_inflight=1):
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.max_pending = max_pending  # 0 = tidak dibatasi
+        self.max_inflight = max(1, max_inflight)
+        self.batch_seconds = 0.0  # EWMA durasi compute per batch
+        self._pending = {}  # bucket -> [Future]
+        self._compute = None
+        self._timer = None
+        self._tasks = set()
+        self._running = 0
+        self._waiting = 0
+
+    @property
+    def depth(self):
+        """Jumlah request yang sedang menunggu CF scores"""
+        return self._waiting
+
+    def estimate(self):
+        """Perkiraan kasar waktu tunggu request baru: window + batch berjalan (jika slot penuh) + batch-nya sendiri"""
+        busy = self._running >= self.max_inflight
+        return self.window + self.batch_seconds * (1 + busy)
+
+    async def scores(self, bucket, compute, timeout=None):
+        """
+        Tunggu CF scores untuk `bucket` (None berarti fallback popularity). Raise CFOverloaded
+        jika antrian penuh, perkiraan waktu tunggu melebihi `timeout` (detik), atau timeout habis.
+        """
+        if self.max_pending and self._waiting >= self.max_pending:
+            self._shed("queue_full")
+        if timeout is not None and timeout < self.estimate():
+            # Request tidak menunggu, tapi bucket tetap dihitung agar request berikutnya kena cache
+            self._enqueue(bucket, compute)
+            self._shed("deadline")
+
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(bucket, compute, future)
+        self._waiting += 1
+        try:
+            if timeout is None:
+                return await future
+            # Future milik request ini saja; batch tetap selesai & mengisi cache untuk request berikutnya
+            return await asyncio.wait_for(future, max(timeout, 0))
+        except asyncio.TimeoutError:
+            self._shed("timeout")
+        finally:
+            self._waiting -= 1
+    
+    def _enqueue(self, bucket, compute, future=None):
+        self._compute = compute
+        waiters = self._pending.setdefault(bucket, [])
+        if future is not None:
+            waiters.append(future)
+        if len(self._pending) >= self.max_batch or self.window <= 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    @staticmethod
+    def _shed(reason):
+        metrics.CF_SHED.labels(reason).inc()
+        raise CFOverloaded(reason)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending or self._running >= self.max_inflight:
+            # Slot penuh: bucket tetap menunggu dan ikut batch yang dimulai saat slot kosong (_run)
+            return
+        pending, self._pending = self._pending, {}
+        compute, self._compute = self._compute, None
+        self._running += 1
+        # Simpan referensi task agar tidak di-garbage-collect sebelum selesai
+        task = asyncio.ensure_future(self._run(pending, compute))
+        self._tasks.add(task)
+        task.add_done_callback(lambda task: self._finish(task, pending))
+
+    async def _run(self, pending, compute):
+        metrics.CF_BATCH_REQUESTS.observe(sum(len(waiters) for waiters in pending.values()))
+        start = time.perf_counter()
+        try:
+            return await asyncio.to_thread(compute, list(pending))
+        finally:
+            elapsed = time.perf_counter() - start
+            self.batch_seconds = elapsed if not self.batch_seconds else (
+                _EWMA_WEIGHT * elapsed + (1 - _EWMA_WEIGHT) * self.batch_seconds
+            )
+
+    def _finish(self, task, pending):
+        """
+        Done callback batch: dipanggil untuk setiap akhir task (selesai, error, atau dibatalkan
+        sebelum/saat compute, mis. event loop ditutup), jadi slot tidak bocor dan tidak ada
+        request yang menunggu selamanya.
+        """
+        self._tasks.discard(task)
+        self._running -= 1
+        if task.cancelled():
+            for waiters in pending.values():
+                for future in waiters:
+                    future.cancel()
+            return
+        error = task.exception()
+        results = task.result() if error is None else {}
+        for bucket, waiters in pending.items():
+            for future in waiters:
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results.get(bucket))
+        # Bucket yang datang selama batch ini berjalan
+        if self._pending:
+            self._flush()
@@ -0,0 +1,137 @@
+"""
+Compiled model bundle.
+
+Menggantikan games.csv + content_based_model.pkl + collaborative_data.pkl saat load:
+semua data turunan yang dipakai engine (tabel opening, archetype, moves, FEN, win rates,
+matrix similarity / vektor CB, encoder & index rating pemain, complexity, popularity) disimpan
+sebagai kolom `.npy` terpisah yang di-memory-map, plus `manifest.json` berisi versi,
+hash bundle dan hash file sumber.
+
+Compile (offline, dari folder services-api):
+    python -m app.services.bundle [--output models/bundle]
+
+Jika folder bundle tidak ada, service memakai file legacy (CSV + pickle).
+"""
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.artifacts import file_sha256
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+class Bundle:
+    """Kolom-kolom bundle (memory-mapped) + manifest."""
+
+    def __init__(self, path, manifest, arrays):
+        self.path = Path(path)
+        self.manifest = manifest
+        self.arrays = arrays
+
+    @property
+    def version(self):
+        return self.manifest["bundle_hash"]
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+
+def _as_column(values):
+    arr = np.asarray(values)
+    if arr.dtype == object:
+        # String disimpan sebagai unicode fixed-width agar bisa di-memory-map
+        arr = arr.astype(str)
+    return np.ascontiguousarray(arr)
+
+
+def save_bundle(path, columns, sources=None, meta=None):
+    """
+    Tulis bundle secara atomik: kolom ditulis ke folder sementara lalu di-rename.
+    `columns` = {nama: array}, `sources` = {label: path file sumber}.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".building")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    bundle_hash = hashlib.sha256()
+    arrays = {}
+    for name in sorted(columns):
+        arr = _as_column(columns[name])
+        np.save(tmp / f"{name}.npy", arr)
+        bundle_hash.update(name.encode())
+        bundle_hash.update(str(arr.dtype).encode())
+        bundle_hash.update(arr.tobytes())
+        arrays[name] = {"dtype": str(arr.dtype), "shape": list(arr.shape)}
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "bundle_hash": bundle_hash.hexdigest()[:16],
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "sources": {label: file_sha256(src) for label, src in (sources or {}).items() if Path(src).exists()},
+        "meta": meta or {},
+        "arrays": arrays,
+    }
+    (tmp / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+
+    if path.exists():
+        shutil.rmtree(path)
+    tmp.rename(path)
+    return manifest
+
+
+def load_bundle(path):
+    """Memory-map semua kolom bundle. Return None jika bundle tidak ada atau versinya berbeda."""
+    path = Path(path)
+    manifest_path = path / MANIFEST_NAME
+    if not manifest_path.is_file():
+        return None
+    manifest = json.loads(manifest_path.read_text())
+    if manifest.get("format_version") != FORMAT_VERSION:
+        print(f"⚠️ Bundle {path} has format {manifest.get('format_version')}, expected {FORMAT_VERSION}; ignoring")
+        return None
+    arrays = {name: np.load(path / f"{name}.npy", mmap_mode='r') for name in manifest["arrays"]}
+    return Bundle(path, manifest, arrays)
+
+
+def compile_bundle(recommender, path):
+    """Compile file legacy (settings.DATA_PATH + pickle) lewat `recommender` ke bundle di `path`"""
+    from app.config import settings
+
+    columns = recommender.compile_bundle_columns()
+    return save_bundle(
+        path,
+        columns,
+        sources={
+            "games": settings.DATA_PATH,
+            "content_model": settings.CONTENT_MODEL_PATH,
+            "collaborative_data": settings.COLLAB_DATA_PATH,
+        },
+        meta={"n_encoded_players": recommender._player_index['n_encoded']},
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.config import settings
+    from app.services.engine import recommender
+
+    parser = argparse.ArgumentParser(description="Compile games.csv + model pickles into a memory-mappable bundle")
+    parser.add_argument("--output", default=str(settings.BUNDLE_PATH))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = compile_bundle(recommender, args.output)
+    size_mb = sum(p.stat().st_size for p in Path(args.output).iterdir()) / 1e6
+    print(f"✅ Compiled bundle {manifest['bundle_hash']} ({len(manifest['arrays'])} columns, {size_mb:.1f} MB) "
+          f"to {args.output} in {time.perf_counter() - start:.1f}s")
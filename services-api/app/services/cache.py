@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _InFlight:
+    """Satu komputasi yang sedang berjalan untuk sebuah key (single-flight)."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache dengan TTL dan single-flight deduplication.
+
+    - Ukuran dibatasi `maxsize` (entry paling lama tidak dipakai dibuang dulu)
+    - Entry kadaluarsa setelah `ttl` detik (ttl <= 0 berarti tanpa TTL)
+    - Beberapa thread yang miss pada key yang sama hanya memicu satu komputasi;
+      thread lain menunggu dan memakai hasil yang sama
+    - `clear()` menaikkan generation: komputasi yang dimulai sebelum clear tidak disimpan,
+      dan caller setelah clear tidak ikut menunggu komputasi lama
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def _lookup(self, key, now):
+        """Cari key tanpa menghitung statistik (lock harus sudah dipegang)."""
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            self.expirations += 1
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key, self._clock())
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    @property
+    def generation(self):
+        """Naik setiap `clear()`; ambil sebelum menghitung nilai yang akan di-`set`"""
+        return self._generation
+
+    def set(self, key, value, generation=None):
+        """Simpan `value`; jika `generation` diberikan dan cache sudah di-clear sejak itu, nilai dibuang"""
+        with self._lock:
+            if generation is None or generation == self._generation:
+                self._store(key, value)
+
+    def _store(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = self._clock() + self.ttl if self.ttl and self.ttl > 0 else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Ambil dari cache, atau jalankan `compute()` sekali untuk semua thread yang menunggu key ini."""
+        with self._lock:
+            found, value = self._lookup(key, self._clock())
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = _InFlight()
+                self._inflight[key] = flight
+                generation = self._generation
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                # Cache di-clear selama compute: hasil mungkin dari data lama, jangan disimpan
+                if generation == self._generation:
+                    self._store(key, flight.value)
+            return flight.value
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.event.set()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._inflight.clear()
+            self._generation += 1
+
+    def keys(self):
+        """Key yang tersimpan, dari yang paling lama tidak dipakai ke yang paling baru"""
+        with self._lock:
+            return list(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "coalesced": self.coalesced,
+                "inflight": len(self._inflight),
+            }
@@ -0,0 +1,57 @@
+import bisect
+import gzip
+import hashlib
+import json
+
+
+class OpeningCatalog:
+    """
+    Katalog nama opening yang dibangun sekali per versi data.
+
+    Body JSON untuk /openings (dan versi gzip-nya) serta ETag dihitung di depan,
+    sehingga setiap request hanya berupa lookup. Pencarian typeahead memakai index
+    nama yang sudah di-casefold & terurut (prefix = bisect, substring = scan).
+    """
+
+    def __init__(self, names, version):
+        self.version = version
+        self.names = sorted(names)
+        self.body = json.dumps({"openings": self.names, "count": len(self.names)}).encode()
+        self.body_gzip = gzip.compress(self.body, compresslevel=6)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:20] + '"'
+
+        # Index untuk pencarian: (nama casefold, nama asli), terurut
+        keyed = sorted((name.casefold(), name) for name in self.names)
+        self._keys = [k for k, _ in keyed]
+        self._sorted_names = [n for _, n in keyed]
+
+    def __len__(self):
+        return len(self.names)
+
+    def matches_etag(self, if_none_match):
+        """True jika header If-None-Match cocok dengan ETag katalog ini"""
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or any(tag.removeprefix("W/") == self.etag for tag in candidates)
+
+    def search(self, query, mode="prefix", offset=0, limit=20):
+        """Cari opening (case-insensitive) dengan pagination; mode 'prefix' atau 'substring'"""
+        q = query.casefold().strip()
+        if mode == "prefix":
+            lo = bisect.bisect_left(self._keys, q)
+            hi = bisect.bisect_left(self._keys, q + "\U0010ffff")
+            total = hi - lo
+            items = self._sorted_names[lo + offset:min(hi, lo + offset + limit)]
+        else:
+            hits = [i for i, key in enumerate(self._keys) if q in key]
+            total = len(hits)
+            items = [self._sorted_names[i] for i in hits[offset:offset + limit]]
+        return {
+            "query": query,
+            "mode": mode,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "items": items,
+        }
@@ -0,0 +1,160 @@
+"""
+Content-based similarity storage.
+
+`content_based_model.pkl` menyimpan `similarity_matrix` sebagai DataFrame dense yang
+di-unpickle di setiap worker. `SimilarityIndex` menyimpannya sebagai matrix NumPy
+(float64 secara default, sama dengan pickle) + index nama opening, dan bisa di-memory-map dari file `.npy`
+sehingga beberapa worker uvicorn berbagi halaman memori yang sama.
+
+Format di disk:
+    content_based_matrix.npy   -> matrix (opening x opening), baris i = kolom i similarity_matrix
+    content_based_matrix.json  -> manifest (versi, dtype, nama opening, hash pickle sumber)
+
+Konversi dari pickle lama (dari folder services-api):
+    python -m app.services.cb_engine [--dtype float64] [--output models/content_based_matrix.npy]
+
+float64 memberi ranking identik dengan pickle, termasuk urutan skor seri. float32/float16
+menghemat memori, tapi pembulatan bisa memecah atau membentuk nilai seri sehingga urutan
+opening dengan skor (hampir) sama bisa berbeda.
+"""
+import json
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.services.artifacts import file_sha256
+from app.services.ranking import top_n_indices
+
+FORMAT_VERSION = 1
+
+
+class SimilarityIndex:
+    """Matrix similarity opening x opening dengan lookup nama -> index integer."""
+
+    def __init__(self, names, columns, row_names=None):
+        # columns[j] = similarity semua opening (baris) terhadap opening kolom ke-j
+        self.names = list(names)
+        self.row_names = np.asarray(self.names if row_names is None else list(row_names), dtype=object)
+        self.columns = columns
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.row_names)
+
+    @classmethod
+    def from_model(cls, model, dtype=None):
+        """Build dari dict content_based_model.pkl (similarity_matrix DataFrame)"""
+        sim_df = model['similarity_matrix']
+        values = sim_df.to_numpy()
+        if dtype is not None:
+            values = values.astype(dtype)
+        # Simpan dalam bentuk transpose agar kolom favorit bisa dibaca sebagai baris yang kontigu
+        columns = np.ascontiguousarray(values.T)
+        return cls(sim_df.columns, columns, row_names=sim_df.index)
+
+    @classmethod
+    def load(cls, path, source_path=None):
+        """
+        Memory-map matrix dari `path`. Return None jika file tidak ada, atau jika
+        `source_path` ada dan isinya berbeda dari pickle yang dipakai saat konversi.
+        """
+        path = Path(path)
+        manifest_path = path.with_suffix('.json')
+        if not path.is_file() or not manifest_path.is_file():
+            return None
+        manifest = json.loads(manifest_path.read_text())
+        if manifest.get("version") != FORMAT_VERSION:
+            return None
+        if source_path is not None and Path(source_path).is_file():
+            if manifest.get("source_sha256") != file_sha256(source_path):
+                print(f"⚠️ {path.name} is stale (content model changed), ignoring")
+                return None
+        columns = np.load(path, mmap_mode='r')
+        return cls(manifest["names"], columns, row_names=manifest["row_names"])
+
+    def save(self, path, source_path=None):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, np.ascontiguousarray(self.columns))
+        manifest = {
+            "version": FORMAT_VERSION,
+            "dtype": str(self.columns.dtype),
+            "shape": list(self.columns.shape),
+            "names": self.names,
+            "row_names": self.row_names.tolist(),
+            "source_sha256": file_sha256(source_path) if source_path else None,
+        }
+        path.with_suffix('.json').write_text(json.dumps(manifest))
+        return manifest
+
+    def mean_scores(self, favorite_openings):
+        """Rata-rata similarity setiap opening terhadap favorit yang valid (None jika tidak ada)"""
+        fav_idx = [self.index[o] for o in favorite_openings if o in self.index]
+        if not fav_idx:
+            return None
+        return np.asarray(self.columns[fav_idx], dtype=np.float64).mean(axis=0)
+
+    @staticmethod
+    def _top(scores, top_n):
+        if scores is None:
+            return None
+        top = top_n_indices(scores, top_n)
+        return top, scores[top]
+
+    def top_n(self, favorite_openings, top_n=50):
+        """DataFrame (opening_name, similarity_score) untuk top_n opening, terurut menurun"""
+        top = self.top_n_positions(favorite_openings, top_n)
+        if top is None:
+            return pd.DataFrame()
+        positions, scores = top
+        return pd.DataFrame({'opening_name': self.row_names[positions], 'similarity_score': scores})
+
+    def top_n_positions(self, favorite_openings, top_n=50):
+        """(posisi baris di row_names, similarity_score) untuk top_n opening, atau None tanpa favorit valid"""
+        return self._top(self.mean_scores(favorite_openings), top_n)
+
+    def top_n_batch(self, favorite_sets, top_n=50, chunk_size=512):
+        """
+        Seperti `top_n_positions` untuk banyak set favorit sekaligus.
+
+        Skor dihitung per chunk sebagai satu perkalian matrix (bobot rata-rata x similarity),
+        dan hanya top_n per set yang disimpan sehingga memori tidak tumbuh dengan jumlah set.
+        Hanya baris favorit yang dibaca dari matrix (bisa memory-mapped), bukan seluruh matrix.
+        """
+        results = []
+        for start in range(0, len(favorite_sets), chunk_size):
+            chunk = favorite_sets[start:start + chunk_size]
+            fav_lists = [[self.index[o] for o in favorites if o in self.index] for favorites in chunk]
+            used, inverse = np.unique(np.fromiter((i for f in fav_lists for i in f), dtype=np.int64), return_inverse=True)
+            weights = np.zeros((len(chunk), len(used)))
+            offset = 0
+            for row, fav_idx in enumerate(fav_lists):
+                if fav_idx:
+                    # np.add.at agar favorit duplikat dihitung dua kali, sama seperti mean_scores
+                    np.add.at(weights[row], inverse[offset:offset + len(fav_idx)], 1.0 / len(fav_idx))
+                    offset += len(fav_idx)
+            scores = weights @ np.asarray(self.columns[used], dtype=np.float64)
+            results.extend(self._top(scores[row] if fav_lists[row] else None, top_n) for row in range(len(chunk)))
+        return results
+
+if __name__ == "__main__":
+    import argparse
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="Convert content_based_model.pkl to a memory-mappable matrix")
+    parser.add_argument("--source", default=str(settings.CONTENT_MODEL_PATH))
+    parser.add_argument("--output", default=str(settings.CB_MATRIX_PATH))
+    parser.add_argument("--dtype", default="float64", choices=["float16", "float32", "float64"])
+    args = parser.parse_args()
+
+    with open(args.source, 'rb') as f:
+        model = pickle.load(f)
+    sim_index = SimilarityIndex.from_model(model, dtype=np.dtype(args.dtype))
+    manifest = sim_index.save(args.output, source_path=args.source)
+    size_mb = Path(args.output).stat().st_size / 1e6
+    print(f"✅ Saved {manifest['shape']} {manifest['dtype']} similarity matrix ({size_mb:.1f} MB) to {args.output}")
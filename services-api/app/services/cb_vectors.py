@@ -0,0 +1,306 @@
+"""
+Content-based retrieval dari vektor fitur opening (tanpa matrix similarity opening x opening).
+
+`similarity_matrix` di content_based_model.pkl adalah cosine similarity antar vektor TF-IDF
+opening (S = V V^T dengan baris V ter-normalisasi L2). Rata-rata kolom similarity untuk
+beberapa favorit sama dengan dot product setiap vektor terhadap centroid vektor favorit:
+
+    mean_j S[:, j] = mean_j V v_j = V (mean_j v_j)
+
+sehingga storage & load O(opening x dim) alih-alih O(opening^2), dan satu query CB cukup
+satu matrix-vector product (BLAS) terhadap semua vektor. Untuk vocabulary besar tersedia
+IVF (pure NumPy): vektor dikelompokkan dengan spherical k-means, query hanya menilai
+anggota `nprobe` cluster dengan centroid paling mirip (approximate, lihat
+benchmarks/cb_index.py untuk recall@k & latency).
+
+Format di disk:
+    content_based_vectors.npy      -> matrix (opening x dim) float32
+    content_based_vectors.json     -> manifest (versi, nama opening, sumber vektor, hash pickle)
+    content_based_vectors.ivf.npz  -> (opsional, --ivf) centroid & anggota cluster IVF
+
+Konversi dari pickle (dari folder services-api):
+    python -m app.services.cb_vectors [--output models/content_based_vectors.npy] [--ivf]
+"""
+import json
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.services.artifacts import file_sha256
+from app.services.ranking import descending_order, top_n_indices
+
+FORMAT_VERSION = 1
+# Selisih maksimum skor vektor vs similarity_matrix agar vektor TF-IDF dianggap setara
+PARITY_TOLERANCE = 1e-4
+# Baris per blok saat assignment k-means (memori ~ blok x jumlah cluster)
+_BLOCK_ROWS = 8192
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def _parity(vectors, sim_values, sample=64):
+    """Selisih maksimum V v_j vs kolom S[:, j] untuk sampel kolom yang tersebar"""
+    cols = np.unique(np.linspace(0, len(vectors) - 1, num=min(sample, len(vectors))).astype(int))
+    approx = vectors.astype(np.float64) @ vectors[cols].astype(np.float64).T
+    return float(np.abs(approx - sim_values[:, cols]).max()) if len(cols) else 0.0
+
+
+def vectors_from_model(model):
+    """
+    (nama opening, vektor, sumber) dari dict content_based_model.pkl.
+
+    Memakai `tfidf_matrix` (baris mengikuti `opening_names`) jika ada dan setara dengan
+    similarity_matrix; selain itu similarity_matrix difaktorkan (eigendecomposition,
+    S = U diag(w) U^T -> V = U sqrt(w)) sehingga skornya tetap sama.
+    """
+    sim_df = model['similarity_matrix']
+    names = list(sim_df.index)
+    if set(names) != set(sim_df.columns):
+        raise ValueError("similarity_matrix rows and columns must contain the same openings")
+    sim_values = sim_df.loc[names, names].to_numpy(dtype=np.float64)
+
+    tfidf = model.get('tfidf_matrix')
+    tfidf_names = model.get('opening_names')
+    if tfidf is not None and tfidf_names is not None and len(tfidf_names) == tfidf.shape[0]:
+        dense = tfidf.toarray() if hasattr(tfidf, 'toarray') else np.asarray(tfidf)
+        positions = pd.Index(list(tfidf_names)).get_indexer(names)
+        if (positions >= 0).all():
+            vectors = _normalize(dense[positions].astype(np.float64))
+            diff = _parity(vectors, sim_values)
+            if diff <= PARITY_TOLERANCE:
+                return names, vectors, "tfidf"
+            print(f"⚠️ tfidf_matrix does not reproduce similarity_matrix (max diff {diff:.2e}), factorizing")
+
+    eigvals, eigvecs = np.linalg.eigh((sim_values + sim_values.T) / 2)
+    keep = eigvals > max(eigvals.max(), 0.0) * 1e-7
+    vectors = eigvecs[:, keep] * np.sqrt(eigvals[keep])
+    diff = _parity(vectors, sim_values)
+    if diff > PARITY_TOLERANCE:
+        print(f"⚠️ similarity_matrix is not positive semi-definite, vector scores differ by up to {diff:.2e}")
+    return names, vectors, "eigh"
+
+
+class IVFIndex:
+    """Inverted file: anggota setiap cluster (order[offsets[c]:offsets[c + 1]]) + centroid-nya."""
+
+    def __init__(self, centroids, order, offsets, nprobe=16):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    def __len__(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, iterations=10, nprobe=16, seed=0):
+        """Spherical k-means (dot product) dengan n_lists ~ sqrt(jumlah vektor)"""
+        n = len(vectors)
+        n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        data = np.asarray(vectors, dtype=np.float32)
+        centroids = _normalize(data[rng.choice(n, size=n_lists, replace=False)])
+        for _ in range(iterations):
+            assign = cls._assign(data, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            empty = np.bincount(assign, minlength=n_lists) == 0
+            # Cluster kosong diisi ulang dengan vektor acak agar jumlah list tetap
+            sums[empty] = data[rng.choice(n, size=int(empty.sum()), replace=False)]
+            centroids = _normalize(sums)
+        assign = cls._assign(data, centroids)
+        order = np.argsort(assign, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))])
+        return cls(centroids, order, offsets, nprobe=nprobe)
+
+    @staticmethod
+    def _assign(data, centroids):
+        assign = np.empty(len(data), dtype=np.int64)
+        for start in range(0, len(data), _BLOCK_ROWS):
+            assign[start:start + _BLOCK_ROWS] = np.argmax(data[start:start + _BLOCK_ROWS] @ centroids.T, axis=1)
+        return assign
+
+    def candidates(self, query, min_candidates=0):
+        """Posisi anggota cluster yang diperiksa: `nprobe` terdekat, ditambah sampai >= min_candidates"""
+        ranked = descending_order(self.centroids @ query.astype(self.centroids.dtype))
+        sizes = np.diff(self.offsets)[ranked]
+        enough = int(np.searchsorted(np.cumsum(sizes), min_candidates)) + 1
+        probe = ranked[:max(self.nprobe, enough)]
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path, nprobe=16):
+        with np.load(path) as data:
+            return cls(data['centroids'], data['order'], data['offsets'], nprobe=nprobe)
+
+
+class VectorIndex:
+    """
+    Vektor fitur per opening dengan lookup nama -> index integer. Interface sama dengan
+    SimilarityIndex (top_n, top_n_positions, top_n_batch) sehingga engine bisa memakai
+    salah satunya.
+    """
+
+    def __init__(self, names, vectors, ivf=None, source=None):
+        self.names = list(names)
+        self.row_names = np.asarray(self.names, dtype=object)
+        self.vectors = vectors
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.ivf = ivf
+        self.source = source
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.row_names)
+
+    @classmethod
+    def from_model(cls, model, dtype=np.float32):
+        """Build dari dict content_based_model.pkl (lihat vectors_from_model)"""
+        names, vectors, source = vectors_from_model(model)
+        return cls(names, np.ascontiguousarray(vectors, dtype=dtype), source=source)
+
+    @classmethod
+    def load(cls, path, source_path=None, nprobe=16):
+        """
+        Memory-map vektor dari `path` (+ IVF jika ada). Return None jika file tidak ada, atau
+        jika `source_path` ada dan isinya berbeda dari pickle yang dipakai saat konversi.
+        """
+        path = Path(path)
+        manifest_path = path.with_suffix('.json')
+        if not path.is_file() or not manifest_path.is_file():
+            return None
+        manifest = json.loads(manifest_path.read_text())
+        if manifest.get("version") != FORMAT_VERSION:
+            return None
+        if source_path is not None and Path(source_path).is_file():
+            if manifest.get("source_sha256") != file_sha256(source_path):
+                print(f"⚠️ {path.name} is stale (content model changed), ignoring")
+                return None
+        ivf_path = path.with_suffix('.ivf.npz')
+        ivf = IVFIndex.load(ivf_path, nprobe=nprobe) if ivf_path.is_file() else None
+        return cls(manifest["names"], np.load(path, mmap_mode='r'), ivf=ivf, source=manifest.get("source"))
+
+    def save(self, path, source_path=None):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, np.ascontiguousarray(self.vectors))
+        ivf_path = path.with_suffix('.ivf.npz')
+        if self.ivf is not None:
+            self.ivf.save(ivf_path)
+        elif ivf_path.exists():
+            ivf_path.unlink()
+        manifest = {
+            "version": FORMAT_VERSION,
+            "dtype": str(self.vectors.dtype),
+            "shape": list(self.vectors.shape),
+            "names": self.names,
+            "source": self.source,
+            "ivf_lists": len(self.ivf) if self.ivf is not None else 0,
+            "source_sha256": file_sha256(source_path) if source_path else None,
+        }
+        path.with_suffix('.json').write_text(json.dumps(manifest))
+        return manifest
+
+    def use_ivf(self, min_items, nprobe=16):
+        """Pakai IVF jika jumlah opening >= min_items (0 = selalu exact); build jika belum ada"""
+        if min_items <= 0 or len(self) < min_items:
+            self.ivf = None
+        elif self.ivf is None:
+            self.ivf = IVFIndex.build(self.vectors, nprobe=nprobe)
+        else:
+            self.ivf.nprobe = nprobe
+        return self
+
+    def centroid(self, favorite_openings):
+        """Rata-rata vektor favorit yang valid (None jika tidak ada)"""
+        fav_idx = [self.index[o] for o in favorite_openings if o in self.index]
+        if not fav_idx:
+            return None
+        return np.asarray(self.vectors[fav_idx], dtype=np.float64).mean(axis=0)
+
+    def mean_scores(self, favorite_openings):
+        """Rata-rata similarity setiap opening terhadap favorit yang valid (exact, None jika tidak ada)"""
+        query = self.centroid(favorite_openings)
+        if query is None:
+            return None
+        return self.vectors @ query.astype(self.vectors.dtype)
+
+    def _search(self, query, top_n):
+        query = query.astype(self.vectors.dtype)
+        if self.ivf is None:
+            scores = self.vectors @ query
+            top = top_n_indices(scores, top_n)
+            return top, scores[top]
+        # Kandidat diurutkan menurut posisi agar hasil deterministik (urutan nilai seri bisa
+        # berbeda dari pencarian exact, seperti kandidatnya yang approximate)
+        candidates = np.sort(self.ivf.candidates(query, min_candidates=top_n))
+        scores = self.vectors[candidates] @ query
+        top = top_n_indices(scores, top_n)
+        return candidates[top], scores[top]
+
+    def top_n(self, favorite_openings, top_n=50):
+        """DataFrame (opening_name, similarity_score) untuk top_n opening, terurut menurun"""
+        top = self.top_n_positions(favorite_openings, top_n)
+        if top is None:
+            return pd.DataFrame()
+        positions, scores = top
+        return pd.DataFrame({'opening_name': self.row_names[positions], 'similarity_score': scores})
+
+    def top_n_positions(self, favorite_openings, top_n=50):
+        """(posisi baris di row_names, similarity_score) untuk top_n opening, atau None tanpa favorit valid"""
+        query = self.centroid(favorite_openings)
+        if query is None:
+            return None
+        return self._search(query, top_n)
+
+    def top_n_batch(self, favorite_sets, top_n=50, chunk_size=512):
+        """
+        Seperti `top_n_positions` untuk banyak set favorit sekaligus. Tanpa IVF, skor satu
+        chunk dihitung sebagai satu perkalian matrix (centroid x vektor^T).
+        """
+        if self.ivf is not None:
+            return [self.top_n_positions(favorites, top_n) for favorites in favorite_sets]
+        results = []
+        for start in range(0, len(favorite_sets), chunk_size):
+            queries = [self.centroid(favorites) for favorites in favorite_sets[start:start + chunk_size]]
+            valid = [q for q in queries if q is not None]
+            scores = iter(np.stack(valid).astype(self.vectors.dtype) @ self.vectors.T if valid else [])
+            for query in queries:
+                if query is None:
+                    results.append(None)
+                    continue
+                row = next(scores)
+                top = top_n_indices(row, top_n)
+                results.append((top, row[top]))
+        return results
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="Extract content-based opening vectors from content_based_model.pkl")
+    parser.add_argument("--source", default=str(settings.CONTENT_MODEL_PATH))
+    parser.add_argument("--output", default=str(settings.CB_VECTORS_PATH))
+    parser.add_argument("--ivf", action="store_true", help="also build and store the IVF index")
+    args = parser.parse_args()
+
+    with open(args.source, 'rb') as f:
+        model = pickle.load(f)
+    vector_index = VectorIndex.from_model(model)
+    if args.ivf:
+        vector_index.use_ivf(1, nprobe=settings.CB_IVF_NPROBE)
+    manifest = vector_index.save(args.output, source_path=args.source)
+    size_mb = Path(args.output).stat().st_size / 1e6
+    print(f"✅ Saved {manifest['shape']} {manifest['dtype']} opening vectors from {manifest['source']} "
+          f"({size_mb:.1f} MB, {manifest['ivf_lists']} IVF lists) to {args.output}")
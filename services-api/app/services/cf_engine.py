@@ -0,0 +1,224 @@
+"""
+Collaborative-filtering scoring engines.
+
+Kedua engine punya interface yang sama: `score(encoded_players, encoded_openings)`
+mengembalikan matrix (len(players) x len(openings)) berisi prediksi model.
+
+- `KerasCFScorer`  : memanggil `model.predict` (perilaku lama)
+- `NumpyCFScorer`  : bobot Keras (embedding + Dense tower) diekstrak sekali saat load,
+                     lalu dievaluasi dengan NumPy murni (tanpa TensorFlow di request path)
+
+Ekstraksi offline (agar service tidak perlu mengimpor TensorFlow sama sekali saat startup):
+    python -m app.services.cf_engine [--output models/collaborative_model_numpy.pkl]
+"""
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+
+class KerasCFScorer:
+    """Scoring lewat Keras `model.predict` (batch player x opening)."""
+
+    name = "keras"
+
+    def __init__(self, model, batch_size=1024):
+        self.model = model
+        self.batch_size = batch_size
+
+    def score(self, encoded_players, encoded_openings):
+        encoded_players = np.asarray(encoded_players)
+        encoded_openings = np.asarray(encoded_openings)
+        players_batch = np.repeat(encoded_players, len(encoded_openings))
+        openings_batch = np.tile(encoded_openings, len(encoded_players))
+        predictions = self.model.predict(
+            [players_batch, openings_batch],
+            batch_size=self.batch_size,
+            verbose=0
+        ).flatten()
+        return predictions.reshape(len(encoded_players), -1)
+
+
+# --- NumPy engine ---------------------------------------------------------
+
+def _sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": _sigmoid,
+    "tanh": np.tanh,
+}
+
+# Layer yang tidak mengubah nilai saat inference
+_PASSTHROUGH_LAYERS = {"Dropout", "Flatten", "Reshape"}
+
+
+def _producer(tensor):
+    """Layer Keras yang menghasilkan `tensor`"""
+    return tensor._keras_history[0]
+
+
+def _skip_passthrough(layer):
+    while type(layer).__name__ in _PASSTHROUGH_LAYERS:
+        layer = _producer(layer.input)
+    return layer
+
+
+def _activation_name(fn):
+    name = getattr(fn, "__name__", fn) or "linear"
+    if name not in _ACTIVATIONS:
+        raise NotImplementedError(f"Unsupported activation: {name}")
+    return name
+
+
+class NumpyCFScorer:
+    """
+    Arsitektur model CF: embedding player & opening -> Concatenate -> Dense ... -> Dense(1).
+
+    Bobot diekstrak sekali dari model Keras; setelah itu tidak ada panggilan TensorFlow.
+    Dense pertama dipecah per bagian concat (x @ W = p @ W_p + o @ W_o), sehingga proyeksi
+    dihitung sekali per player dan sekali per opening lalu dijumlah secara broadcast.
+    Model dengan arsitektur lain memunculkan NotImplementedError saat `from_keras`.
+    Hasil ekstraksi bisa disimpan (`save`) dan dimuat ulang (`load`) tanpa mengimpor TensorFlow.
+    """
+
+    name = "numpy"
+    FORMAT_VERSION = 2
+
+    def __init__(self, player_table, opening_table, dense, player_first=True, grid_cells=131072):
+        self.player_table = np.asarray(player_table, dtype=np.float32)
+        self.opening_table = np.asarray(opening_table, dtype=np.float32)
+        # [(kernel, bias, activation)], Dense terakhir punya 1 unit
+        self.dense = [(np.asarray(k, dtype=np.float32), np.asarray(b, dtype=np.float32), a) for k, b, a in dense]
+        self.player_first = player_first
+        self.grid_cells = grid_cells
+
+    @classmethod
+    def from_keras(cls, model, grid_cells=131072):
+        if len(model.inputs) != 2 or len(model.outputs) != 1:
+            raise NotImplementedError("Expected a two-input (player, opening), single-output model")
+
+        # Dari output mundur: Dense (dan Dropout) sampai Concatenate
+        dense = []
+        layer = _skip_passthrough(_producer(model.outputs[0]))
+        while type(layer).__name__ == "Dense":
+            bias = np.asarray(layer.bias) if layer.use_bias else np.zeros(layer.units, dtype=np.float32)
+            dense.append((np.asarray(layer.kernel), bias, _activation_name(layer.activation)))
+            layer = _skip_passthrough(_producer(layer.input))
+        dense.reverse()
+        if type(layer).__name__ != "Concatenate" or len(layer.input) != 2 or not dense:
+            raise NotImplementedError("Expected Concatenate([player, opening] embeddings) followed by Dense layers")
+        if dense[-1][0].shape[1] != 1:
+            raise NotImplementedError("Expected a single-unit output layer")
+
+        # Setiap bagian concat: Embedding (lewat Flatten/Reshape) dari salah satu input model
+        inputs = [_producer(t) for t in model.inputs]
+        tables = []
+        for part in layer.input:
+            embedding = _skip_passthrough(_producer(part))
+            if type(embedding).__name__ != "Embedding" or _producer(embedding.input) not in inputs:
+                raise NotImplementedError("Expected each Concatenate input to be an Embedding of a model input")
+            tables.append((inputs.index(_producer(embedding.input)), np.asarray(embedding.embeddings)))
+        if {source for source, _ in tables} != {0, 1}:
+            raise NotImplementedError("Expected one embedding per model input")
+
+        player_first = tables[0][0] == 0
+        (_, player_table), (_, opening_table) = sorted(tables, key=lambda t: t[0])
+        if dense[0][0].shape[0] != player_table.shape[1] + opening_table.shape[1]:
+            raise NotImplementedError("Embeddings must be flat vectors (input length 1)")
+        return cls(player_table, opening_table, dense, player_first, grid_cells)
+
+    def save(self, path, source_sha256=None, max_diff=None):
+        """Simpan bobot hasil ekstraksi (pickle berisi dict, list & array NumPy saja)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            "version": self.FORMAT_VERSION,
+            "source_sha256": source_sha256,
+            "max_diff": max_diff,
+            "player_table": self.player_table,
+            "opening_table": self.opening_table,
+            "dense": self.dense,
+            "player_first": self.player_first,
+        }
+        with open(path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path, source_sha256=None, grid_cells=131072):
+        """Muat scorer dari `save`. Return None jika file tidak ada, format lama, atau dibuat dari model Keras lain."""
+        path = Path(path)
+        if not path.is_file():
+            return None
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get("version") != cls.FORMAT_VERSION:
+            return None
+        if source_sha256 is not None and state.get("source_sha256") != source_sha256:
+            print(f"⚠️ {path.name} is stale (Keras model changed), ignoring")
+            return None
+        return cls(state["player_table"], state["opening_table"], state["dense"], state["player_first"], grid_cells)
+
+    # --- Evaluation ---
+
+    def _evaluate(self, encoded_players, encoded_openings):
+        kernel, bias, activation = self.dense[0]
+        width = self.player_table.shape[1] if self.player_first else self.opening_table.shape[1]
+        first, second = kernel[:width], kernel[width:]
+        player_kernel, opening_kernel = (first, second) if self.player_first else (second, first)
+        # (k, h) + (n, h) -> grid (k, n, h)
+        players = self.player_table[encoded_players] @ player_kernel
+        openings = self.opening_table[encoded_openings] @ opening_kernel + bias
+        x = _ACTIVATIONS[activation](players[:, None, :] + openings[None, :, :])
+        for kernel, bias, activation in self.dense[1:]:
+            x = _ACTIVATIONS[activation](x @ kernel + bias)
+        return x[..., 0]
+
+    def score(self, encoded_players, encoded_openings):
+        encoded_players = np.asarray(encoded_players, dtype=np.int64).reshape(-1)
+        encoded_openings = np.asarray(encoded_openings, dtype=np.int64).reshape(-1)
+        # Pecah per chunk player agar tensor grid (k x n x hidden) tetap kecil
+        chunk = max(1, self.grid_cells // max(1, len(encoded_openings)))
+        if len(encoded_players) <= chunk:
+            return self._evaluate(encoded_players, encoded_openings)
+        return np.concatenate([
+            self._evaluate(encoded_players[i:i + chunk], encoded_openings)
+            for i in range(0, len(encoded_players), chunk)
+        ])
+
+
+def check_parity(reference, candidate, encoded_players, encoded_openings):
+    """Bandingkan dua scorer pada sampel yang sama; kembalikan selisih absolut maksimum."""
+    expected = reference.score(encoded_players, encoded_openings)
+    actual = candidate.score(encoded_players, encoded_openings)
+    return float(np.max(np.abs(np.asarray(expected, dtype=np.float64) - actual)))
+
+
+if __name__ == "__main__":
+    import argparse
+    import tensorflow as tf
+    from app.config import settings
+    from app.services.artifacts import file_sha256
+
+    parser = argparse.ArgumentParser(description="Extract the Keras CF model into a NumPy scorer")
+    parser.add_argument("--model", default=str(settings.COLLAB_MODEL_PATH))
+    parser.add_argument("--data", default=str(settings.COLLAB_DATA_PATH))
+    parser.add_argument("--output", default=str(settings.CF_NUMPY_MODEL_PATH))
+    args = parser.parse_args()
+
+    keras_model = tf.keras.models.load_model(args.model)
+    with open(args.data, 'rb') as f:
+        collaborative_data = pickle.load(f)
+    n_players = len(collaborative_data['player_encoder'].classes_)
+    n_openings = len(collaborative_data['opening_encoder'].classes_)
+
+    scorer = NumpyCFScorer.from_keras(keras_model)
+    sample_players = np.unique(np.linspace(0, n_players - 1, num=min(64, n_players)).astype(int))
+    diff = check_parity(KerasCFScorer(keras_model), scorer, sample_players, np.arange(n_openings))
+    if diff > settings.CF_PARITY_TOLERANCE:
+        raise SystemExit(f"❌ Parity check failed: max diff {diff:.2e} > {settings.CF_PARITY_TOLERANCE:.0e}")
+    scorer.save(args.output, source_sha256=file_sha256(args.model), max_diff=diff)
+    print(f"✅ Saved NumPy CF scorer to {args.output} (max diff vs Keras {diff:.2e})")
@@ -0,0 +1,99 @@
+"""
+Precompute CF score vectors untuk semua rating bucket.
+
+Hanya ada 11 bucket (500-3000, langkah 250), jadi seluruh hasil CF muat dalam satu
+matrix dense (bucket x opening). Matrix bisa dihitung saat startup (background/blocking)
+atau offline ke artifact `.npy` + manifest `.json` yang di-memory-map oleh `load_resources`.
+
+Usage (offline, dari folder services-api):
+    python -m app.services.cf_precompute [--output models/cf_bucket_scores.npy]
+"""
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+from app.services.artifacts import update_digest
+
+ARTIFACT_VERSION = 1
+BUCKET_STEP = 250
+RATING_MIN = 500
+RATING_MAX = 3000
+RATING_BUCKETS = tuple(range(RATING_MIN, RATING_MAX + 1, BUCKET_STEP))
+
+
+def rating_bucket(user_rating):
+    """Round rating ke bucket terdekat (kelipatan 250, dibatasi 500-3000)"""
+    bucket = round(user_rating / BUCKET_STEP) * BUCKET_STEP
+    return max(RATING_MIN, min(RATING_MAX, bucket))
+
+
+def fingerprint(opening_names, source_paths, temperature):
+    """Hash dari semua input yang mempengaruhi isi matrix (model, data, vocabulary, parameter)"""
+    h = hashlib.sha256()
+    h.update(f"v{ARTIFACT_VERSION}|t{temperature}|b{','.join(map(str, RATING_BUCKETS))}".encode())
+    h.update('\n'.join(map(str, opening_names)).encode())
+    for path in source_paths:
+        update_digest(h, path)
+    return h.hexdigest()
+
+
+def _manifest_path(path):
+    return Path(path).with_suffix('.json')
+
+
+def save_artifact(path, scores, computed, fingerprint_hash):
+    """Simpan matrix (bucket x opening) sebagai .npy + manifest .json"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(path, np.ascontiguousarray(scores, dtype=np.float64))
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "fingerprint": fingerprint_hash,
+        "buckets": list(RATING_BUCKETS),
+        "computed": [bool(c) for c in computed],
+        "shape": list(scores.shape),
+    }
+    _manifest_path(path).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def load_artifact(path, expected_fingerprint, n_openings):
+    """
+    Memory-map artifact jika ada dan cocok dengan model yang sedang dimuat.
+    Return (scores, computed) atau None jika artifact tidak ada/usang.
+    """
+    path = Path(path)
+    manifest_path = _manifest_path(path)
+    if not path.is_file() or not manifest_path.is_file():
+        return None
+    manifest = json.loads(manifest_path.read_text())
+    if manifest.get("version") != ARTIFACT_VERSION or manifest.get("fingerprint") != expected_fingerprint:
+        print(f"⚠️ CF bucket artifact {path.name} is stale, ignoring")
+        return None
+    scores = np.load(path, mmap_mode='r')
+    if scores.shape != (len(RATING_BUCKETS), n_openings):
+        print(f"⚠️ CF bucket artifact {path.name} has shape {scores.shape}, ignoring")
+        return None
+    return scores, manifest["computed"]
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.config import settings
+    from app.services.engine import recommender
+
+    parser = argparse.ArgumentParser(description="Precompute CF scores for all rating buckets")
+    parser.add_argument("--output", default=str(settings.CF_BUCKETS_PATH))
+    args = parser.parse_args()
+
+    # Jangan pakai artifact lama / thread background saat membuat artifact baru
+    settings.CF_PRECOMPUTE = "off"
+    recommender.load_resources()
+    if not recommender.cf_ready:
+        raise SystemExit("❌ Models failed to load")
+
+    scores, computed = recommender.precompute_cf_buckets()
+    manifest = save_artifact(args.output, scores, computed, recommender._cf_fingerprint)
+    print(f"✅ Saved CF bucket scores {manifest['shape']} to {args.output}")
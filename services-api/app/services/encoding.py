@@ -0,0 +1,141 @@
+"""
+Encoding response /predict & /predict/batch.
+
+Hasil engine sudah berupa dict dengan field RecommendationResponse, jadi response di-encode
+langsung ke bytes tanpa validasi & serialisasi ulang lewat pydantic. Format dipilih dari header
+Accept (JSON atau MessagePack) dan body dikompres gzip jika Accept-Encoding mengizinkan dan
+ukurannya melewati RESPONSE_GZIP_MIN_BYTES. Lihat benchmarks/serialization.py untuk angkanya.
+"""
+import json
+import math
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # msgpack opsional: tanpa paket ini hanya JSON yang ditawarkan
+    msgpack = None
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/msgpack"
+_MSGPACK_TYPES = {MSGPACK, "application/x-msgpack", "application/vnd.msgpack"}
+
+# Flush stream gzip setiap sekian byte input, agar batch besar tetap ter-stream ke client
+_STREAM_FLUSH_BYTES = 64 * 1024
+
+
+def _qualities(header):
+    """Parse header Accept / Accept-Encoding -> {nilai (lowercase): q}"""
+    qualities = {}
+    for part in (header or "").split(","):
+        value, *params = [p.strip() for p in part.split(";")]
+        if not value:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, raw = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        qualities[value.lower()] = max(q, qualities.get(value.lower(), 0.0))
+    return qualities
+
+
+def negotiate(accept):
+    """MSGPACK jika client memintanya dengan q >= JSON (dan msgpack terpasang), selain itu JSON"""
+    if msgpack is None or not accept:
+        return JSON
+    qualities = _qualities(accept)
+    packed = max((qualities.get(t, 0.0) for t in _MSGPACK_TYPES), default=0.0)
+    plain = max(qualities.get(t, 0.0) for t in (JSON, NDJSON, "application/*", "*/*"))
+    return MSGPACK if packed > 0 and packed >= plain else JSON
+
+
+def accepts_gzip(accept_encoding):
+    qualities = _qualities(accept_encoding)
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def _finite(obj):
+    """NaN/inf -> None, sama seperti serialisasi JSON pydantic"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+def _dumps_json(obj):
+    # Format sama dengan JSONResponse Starlette (compact, UTF-8)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def encode(obj, media_type=JSON):
+    """Encode hasil engine (list/dict of str & float) ke bytes sesuai media type"""
+    if media_type == MSGPACK:
+        return msgpack.packb(obj)
+    try:
+        return _dumps_json(obj)
+    except ValueError:
+        # Jarang: skor NaN (mis. opening tanpa statistik) -> null
+        return _dumps_json(_finite(obj))
+
+
+def gzip_bytes(body, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+class ResponseEncoder:
+    """Format & kompresi untuk satu request, dipilih dari header Accept dan Accept-Encoding"""
+
+    def __init__(self, accept=None, accept_encoding=None, gzip_min_bytes=1024, gzip_level=1):
+        self.media_type = negotiate(accept)
+        self.gzip = gzip_level > 0 and accepts_gzip(accept_encoding)  # level 0 = kompresi mati
+        self.gzip_min_bytes = gzip_min_bytes
+        self.gzip_level = gzip_level
+
+    def headers(self, compressed):
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if compressed:
+            headers["Content-Encoding"] = "gzip"
+        return headers
+
+    def body(self, obj):
+        """(bytes, headers) untuk satu response"""
+        body = encode(obj, self.media_type)
+        compressed = self.gzip and len(body) >= self.gzip_min_bytes
+        if compressed:
+            body = gzip_bytes(body, self.gzip_level)
+        return body, self.headers(compressed)
+
+    @property
+    def stream_media_type(self):
+        """Batch: NDJSON (satu baris JSON per record) atau rangkaian objek MessagePack"""
+        return MSGPACK if self.media_type == MSGPACK else NDJSON
+
+    def stream(self, records):
+        """Encode iterable record menjadi chunk bytes (dikompres gzip jika diminta)"""
+        if self.media_type == MSGPACK:
+            packer = msgpack.Packer()
+            chunks = (packer.pack(record) for record in records)
+        else:
+            chunks = (encode(record) + b"\n" for record in records)
+        if not self.gzip:
+            yield from chunks
+            return
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        pending = 0
+        for chunk in chunks:
+            out = compressor.compress(chunk)
+            pending += len(chunk)
+            if pending >= _STREAM_FLUSH_BYTES:
+                out += compressor.flush(zlib.Z_SYNC_FLUSH)
+                pending = 0
+            if out:
+                yield out
+        yield compressor.flush()
@@ -1,129 +1,527 @@
 import pandas as pd
 import numpy as np
-import tensorflow as tf
+import asyncio
+import contextvars
+import copy
+import hashlib
+import json
+import logging
 import pickle
-import chess
+import threading
+import time
+from contextlib import contextmanager
 from app.config import settings
+from app.services.artifacts import file_sha256
+from app.services.batcher import CFBatcher, CFOverloaded
+from app.services.cache import TTLCache
+from app.services.bundle import load_bundle
+from app.services.cb_engine import SimilarityIndex
+from app.services.cb_vectors import VectorIndex
+from app.services.cf_engine import KerasCFScorer, NumpyCFScorer, check_parity
+from app.services.fen import moves_to_fen_batch, seed_fen_cache
+from app.services.hybrid import NO_CANDIDATES, blend
+from app.services.ranking import descending_order
+from app.services.stats import OpeningStats
+from app.services.vocab import OpeningVocabulary
+from app.services import metrics
+from app.services.logs import logger, log_sampled
+from app.services.cf_precompute import RATING_BUCKETS, rating_bucket, fingerprint, load_artifact as load_cf_artifact
+
+# Softmax temperature untuk CF scores
+CF_TEMPERATURE = 2.0
+
+# Histogram latency per stage (lihat app/services/metrics.py)
+_CB_SECONDS = metrics.STAGE_SECONDS.labels("cb_scoring")
+_CB_BATCH_SECONDS = metrics.STAGE_SECONDS.labels("cb_scoring_batch")
+_CF_SECONDS = metrics.STAGE_SECONDS.labels("cf_scoring")
+_CF_NEIGHBOR_SECONDS = metrics.STAGE_SECONDS.labels("cf_neighbor_search")
+_CF_INFERENCE_SECONDS = metrics.STAGE_SECONDS.labels("cf_inference")
+_HYBRID_SECONDS = metrics.STAGE_SECONDS.labels("hybrid_merge")
+_FORMAT_SECONDS = metrics.STAGE_SECONDS.labels("formatting")
+
+# True selama predict() dari predict_async yang sudah mencatat CF cache miss: lookup bucket
+# sesudah micro-batcher tidak dihitung lagi sebagai hit (satu hit/miss per request)
+_CF_LOOKUP_COUNTED = contextvars.ContextVar("cf_lookup_counted", default=False)
 
-def moves_to_fen(moves_str: str) -> str:
-    """Convert opening moves to FEN notation for board visualization"""
-    board = chess.Board()
-    try:
-        # Split moves and filter out move numbers
-        moves_list = moves_str.split()
-        for move in moves_list:
-            # Skip move numbers (like "1.", "20.")
-            if move.endswith('.'):
-                continue
-            # Skip empty strings
-            if not move or move.isspace():
-                continue
-                
-            try:
-                board.push_san(move)
-            except Exception as e:
-                # Log error for debugging but continue
-                print(f"⚠️ Failed to parse move '{move}': {e}")
-                # Return current board state (partial opening)
-                break
-        
-        fen = board.fen()
-        print(f"✅ Generated FEN: {fen}")  # Debug log
-        return fen
-    except Exception as e:
-        # If any error, return starting position
-        print(f"❌ FEN error: {e}")
-        return chess.Board().fen()
+
+def _softmax(x):
+    e_x = np.exp(x - np.max(x))
+    return e_x / e_x.sum()
+
+
+def _skipna_max(values):
+    """max() seperti pandas (NaN diabaikan, NaN jika tidak ada nilai)"""
+    values = values[~np.isnan(values)]
+    return values.max() if len(values) else np.nan
 
 
 class ChessRecommender:
     def __init__(self):
         self.chess_data = None
+        # Compiled bundle (app/services/bundle.py); None berarti memakai file legacy
+        self._bundle = None
+        # Versi data opening yang sedang dimuat (berubah jika daftar/metadata opening berubah)
+        self.data_version = None
+        self._base_data_version = None  # versi data tanpa checkpoint statistik opening
         self.content_based_model = None
         self.collaborative_data = None
         self.collaborative_model = None
         self.hybrid_model = None
+        # CF scorer aktif (KerasCFScorer atau NumpyCFScorer)
+        self._cf_scorer = None
+        # is_ready: data & CB siap (predict bisa melayani), cf_ready: CF juga siap
         self.is_ready = False
+        self.cf_ready = False
+        self.stages = {'data': False, 'cb': False, 'cf': False}
+        self.load_timings = {}
         # Cached data for performance
         self._opening_complexity_cache = None
+        # Complexity & popularity dari file model (sebelum statistik incremental), plus rata-rata &
+        # jumlah rating pemain per opening (None untuk bundle lama) untuk menggeser complexity
+        self._model_complexity = None
+        self._model_popularity = None
+        self._model_opening_rating = None
+        # Player ratings sorted at load time for searchsorted neighbor lookup
+        self._player_index = None
+        # CF vocabulary (opening_encoder.classes_) & popularity counts for the fallback path
+        self._cf_opening_names = None
+        self._opening_popularity = None
         self._encoded_openings_cache = None
-        # Lazy cache for CF predictions by rating bucket (key: rating_bucket, value: DataFrame)
+        # Per-opening metadata index (key: opening_name, value: dict archetype/moves/fen/win rates)
+        self._opening_index = {}
+        # Id opening bersama untuk skor CB & CF (array dense), plus pemetaan tiap stage ke id tersebut
+        self._vocab = OpeningVocabulary()
+        self._cb_row_ids = None
+        self._cf_alignment = None
+        # Statistik opening incremental (app/services/stats.py), None jika memakai games.csv
+        self.opening_stats = None
+        # Cache for CF predictions by rating bucket (key: rating_bucket, value: np.ndarray over _cf_opening_names)
         self._cf_prediction_cache = {}
+        # Bucket tanpa pemain valid (selalu memakai fallback popularity)
+        self._cf_fallback_buckets = set()
+        self._cf_compute_lock = threading.Lock()
+        # Micro-batcher asyncio untuk CF miss dari predict_async()
+        self._cf_batcher = CFBatcher(
+            window=settings.CF_BATCH_WINDOW_MS / 1000,
+            max_batch=settings.CF_BATCH_MAX_SIZE,
+            max_pending=settings.CF_MAX_PENDING,
+            max_inflight=settings.CF_MAX_INFLIGHT,
+        )
+        self._cf_fingerprint = None
+        # Bounded LRU+TTL cache for full predict() results (key: normalized request)
+        self._result_cache = TTLCache(maxsize=settings.PREDICT_CACHE_SIZE, ttl=settings.PREDICT_CACHE_TTL)
 
     def load_resources(self):
-        """Memuat semua model dan dataset ke memori sekali saja saat startup."""
+        """
+        Memuat semua model dan dataset ke memori sekali saja saat startup.
+
+        Dimuat bertahap: data -> cb -> cf. Setelah data & CB siap (`is_ready`), predict()
+        sudah bisa melayani hasil CB-only; CF menyusul setelah `cf_ready`.
+        """
         print("⏳ Loading AI Models & Data...")
+        load_start = time.perf_counter()
         try:
-            # 1. Load CSV Data
-            self.chess_data = pd.read_csv(settings.DATA_PATH)
-            # Preprocessing ringan (DRY: dipindahkan ke sini dari load_data app.py)
-            self.chess_data = self.chess_data.drop_duplicates(subset=['id'])
-            self.chess_data = self.chess_data.assign(
-                opening_archetype=self.chess_data.opening_name.map(
-                    lambda n: n.split(":")[0].split("|")[0].split("#")[0].strip()
-                ),
-                opening_moves=self.chess_data.apply(
-                    lambda srs: ' '.join(srs['moves'].split(" ")[:srs['opening_ply']]), axis=1
-                )
-            )
+            with self._phase('data'):
+                self._load_data()
+            with self._phase('cb'):
+                self._load_content_based()
+            self.is_ready = True
+        except Exception as e:
+            print(f"❌ Failed to load models: {e}")
+            self.is_ready = False
+            return
+
+        try:
+            with self._phase('cf'):
+                self._load_collaborative()
+            self.cf_ready = True
+            print("✅ AI Models Loaded & Optimized Successfully!")
+        except Exception as e:
+            print(f"❌ Failed to load collaborative model, serving content-based only: {e}")
+            self.cf_ready = False
+        finally:
+            self._load_opening_stats()
+            self.load_timings['total'] = round(time.perf_counter() - load_start, 4)
+            metrics.MODEL_LOAD_SECONDS.labels("total").set(self.load_timings['total'])
+
+    @contextmanager
+    def _phase(self, name):
+        """Catat durasi satu tahap loading & tandai tahap tersebut siap"""
+        start = time.perf_counter()
+        yield
+        self.load_timings[name] = round(time.perf_counter() - start, 4)
+        self.stages[name] = True
+        metrics.MODEL_LOAD_SECONDS.labels(name).set(self.load_timings[name])
+        print(f"✅ Stage '{name}' loaded in {self.load_timings[name]:.2f}s")
+
+    def status(self):
+        """Readiness per tahap + durasi loading (detik)"""
+        return {
+            "model_ready": self.is_ready,
+            "data_version": self.data_version,
+            "cf_ready": self.cf_ready,
+            "stages": dict(self.stages),
+            "load_timings": dict(self.load_timings),
+        }
 
-            # 2. Load Models
+    def _load_data(self):
+        # Compiled bundle: semua data turunan sudah dihitung & di-memory-map
+        self._bundle = load_bundle(settings.BUNDLE_PATH)
+        if self._bundle is not None:
+            print(f"✅ Using compiled bundle {self._bundle.version} from {settings.BUNDLE_PATH}")
+            self.chess_data = None
+            self._opening_index = self._opening_index_from_bundle(self._bundle)
+            self.data_version = self._bundle.version
+        else:
+            self._load_data_legacy()
+            self.data_version = self._opening_index_version(self._opening_index)
+        self._base_data_version = self.data_version
+        self._vocab.add(self._opening_index)
+
+    def _load_data_legacy(self):
+        # 1. Stream CSV per chunk (hanya kolom yang dipakai, dedupe id, agregasi per opening):
+        #    memori puncak ~ jumlah opening, bukan jumlah game. DataFrame game tidak disimpan.
+        self.chess_data = None
+        stats = OpeningStats.from_csv(settings.DATA_PATH, chunk_rows=settings.DATA_CHUNK_ROWS)
+
+        # Pre-build per-opening metadata index (archetype, moves, FEN, win rates)
+        print("⏳ Building opening metadata index...")
+        self._opening_index = self._build_opening_index(stats)
+
+    def _load_content_based(self):
+        # Content-based: matrix / vektor dari bundle / .npy (memory-mapped, dibagi antar worker), fallback ke pickle
+        vectors = settings.CB_ENGINE == "vectors"
+        if self._bundle is not None and 'cb_vectors' in self._bundle:
+            self.content_based_model = VectorIndex(self._bundle['cb_names'].tolist(), self._bundle['cb_vectors'])
+        elif self._bundle is not None:
+            self.content_based_model = SimilarityIndex(
+                self._bundle['cb_names'].tolist(),
+                self._bundle['cb_columns'],
+                row_names=self._bundle['cb_row_names'].tolist()
+            )
+        elif vectors:
+            self.content_based_model = VectorIndex.load(
+                settings.CB_VECTORS_PATH, source_path=settings.CONTENT_MODEL_PATH, nprobe=settings.CB_IVF_NPROBE
+            )
+        else:
+            self.content_based_model = SimilarityIndex.load(settings.CB_MATRIX_PATH, source_path=settings.CONTENT_MODEL_PATH)
+        if self.content_based_model is None:
             with open(settings.CONTENT_MODEL_PATH, 'rb') as f:
-                self.content_based_model = pickle.load(f)
-            
-            with open(settings.COLLAB_DATA_PATH, 'rb') as f:
-                self.collaborative_data = pickle.load(f)
-            
-            # Load Keras Model
-            keras_model = tf.keras.models.load_model(settings.COLLAB_MODEL_PATH)
+                model = pickle.load(f)
+            self.content_based_model = VectorIndex.from_model(model) if vectors else SimilarityIndex.from_model(model)
+        elif self._bundle is None:
+            path = settings.CB_VECTORS_PATH if vectors else settings.CB_MATRIX_PATH
+            print(f"✅ Memory-mapped content-based {'vectors' if vectors else 'matrix'} from {path.name}")
+        if isinstance(self.content_based_model, VectorIndex):
+            self.content_based_model.use_ivf(settings.CB_IVF_MIN_ITEMS, settings.CB_IVF_NPROBE)
+        self._cb_row_ids = self._vocab.add(self.content_based_model.row_names)
+        # Hasil lama tidak valid lagi setelah model dimuat ulang
+        self._result_cache.clear()
+
+    def _load_collaborative_data(self):
+        """CF data: vocabulary, complexity, popularity & index rating pemain (dari bundle atau pickle)"""
+        if self._bundle is not None:
+            bundle = self._bundle
+            self.collaborative_data = None
+            self._cf_opening_names = bundle['cf_opening_names']
+            self._opening_complexity_cache = pd.Series(bundle['complexity_values'], index=bundle['complexity_names'])
+            self._opening_popularity = pd.Series(bundle['popularity_counts'], index=bundle['popularity_names'])
+            self._model_opening_rating = pd.DataFrame(
+                {'mean': bundle['complexity_mean_rating'], 'count': bundle['complexity_rating_count']},
+                index=bundle['complexity_names'],
+            ) if 'complexity_mean_rating' in bundle else None
+            self._keep_model_cf_stats()
+            self._player_index = {
+                'ratings': bundle['player_ratings'],
+                'order': bundle['player_order'],
+                'sorted_ratings': bundle['player_sorted_ratings'],
+                'codes': bundle['player_codes'],
+                'encoded': bundle['player_encoded'],
+                'n_encoded': int(bundle.manifest['meta']['n_encoded_players']),
+            }
+            return
+
+        with open(settings.COLLAB_DATA_PATH, 'rb') as f:
+            self.collaborative_data = pickle.load(f)
+
+        # === PERFORMANCE OPTIMIZATION ===
+        # 1. Pre-compute opening complexity & popularity (cache)
+        print("⏳ Pre-computing opening complexity...")
+        self._model_opening_rating = self._compute_opening_rating(self.collaborative_data)
+        self._opening_complexity_cache = self._normalize_complexity(self._model_opening_rating['mean'])
+        self._opening_popularity = self.collaborative_data['player_opening_matrix'].groupby('opening_name').size()
+        self._keep_model_cf_stats()
+        
+        # 2. Pre-cache CF vocabulary & sorted player ratings
+        self._cf_opening_names = np.asarray(self.collaborative_data['opening_encoder'].classes_)
+        self._player_index = self._build_player_index(self.collaborative_data)
+
+    def _load_collaborative(self):
+        self._load_collaborative_data()
+        self._encoded_openings_cache = np.arange(len(self._cf_opening_names))
+        self._cf_alignment = self._build_cf_alignment()
+
+        # Hybrid model not needed - logic is in predict() method
+        self.hybrid_model = None  # Not used in current implementation
+        
+        # 3. CF engine: NumPy scorer hasil ekstraksi (tanpa TensorFlow) jika tersedia,
+        #    selain itu muat Keras (TensorFlow diimpor di sini saja)
+        scorer = None
+        if settings.CF_ENGINE == "numpy":
+            source_sha256 = file_sha256(settings.COLLAB_MODEL_PATH) if settings.COLLAB_MODEL_PATH.exists() else None
+            scorer = NumpyCFScorer.load(settings.CF_NUMPY_MODEL_PATH, source_sha256=source_sha256)
+        if scorer is not None:
+            print(f"✅ NumPy CF engine loaded from {settings.CF_NUMPY_MODEL_PATH.name} (TensorFlow not imported)")
+            self.collaborative_model = {'model': None}
+        else:
+            keras_model = self._load_keras_model()
             self.collaborative_model = {'model': keras_model}
-            
-            # with open(settings.COLLAB_EXTRA_PATH, 'rb') as f:
-            #     collab_data_extra = pickle.load(f)
-            #     self.collaborative_model.update(collab_data_extra)
-            
-            # Hybrid model not needed - logic is in predict() method
-            # with open(settings.HYBRID_MODEL_PATH, 'rb') as f:
-            #    self.hybrid_model = pickle.load(f)
-            self.hybrid_model = None  # Not used in current implementation
-
-            # === PERFORMANCE OPTIMIZATION ===
-            # 1. Pre-compute opening complexity (cache)
-            print("⏳ Pre-computing opening complexity...")
-            self._opening_complexity_cache = self._compute_opening_complexity()
-            
-            # 2. Pre-cache encoded openings
-            opening_encoder = self.collaborative_data['opening_encoder']
-            self._encoded_openings_cache = np.arange(len(opening_encoder.classes_))
-            
-            # 3. Pre-warm TensorFlow model (trigger XLA compilation)
+            # Pilih CF engine (NumPy jika lolos parity check terhadap Keras)
+            scorer = self._build_cf_scorer(keras_model)
+        self._cf_scorer = scorer
+        
+        # 4. Pre-warm TensorFlow model (trigger XLA compilation) - hanya jika Keras dipakai
+        if self._cf_scorer.name == "keras":
             print("⏳ Warming up TensorFlow model...")
             self._prewarm_model()
-            
-            self.is_ready = True
-            print("✅ AI Models Loaded & Optimized Successfully!")
+        
+        # Hasil lama tidak valid lagi setelah model dimuat ulang
+        self._cf_prediction_cache = {}
+        self._result_cache.clear()
+        
+        # 5. Precompute CF untuk semua rating bucket (artifact / startup / background)
+        cf_data_source = self._bundle.path / "manifest.json" if self._bundle is not None else settings.COLLAB_DATA_PATH
+        self._cf_fingerprint = fingerprint(
+            self._cf_opening_names,
+            [cf_data_source, settings.COLLAB_MODEL_PATH],
+            CF_TEMPERATURE
+        )
+        self._start_cf_precompute()
+
+    def _load_opening_stats(self):
+        """Terapkan checkpoint statistik incremental jika ada (lihat settings.STATS_PATH)"""
+        try:
+            stats = OpeningStats.load(settings.STATS_PATH)
+            if stats is not None:
+                self.apply_opening_stats(stats)
+                print(f"✅ Applied opening stats checkpoint ({stats.games_ingested} games, {len(stats)} openings)")
         except Exception as e:
-            print(f"❌ Failed to load models: {e}")
-            self.is_ready = False
+            print(f"⚠️ Failed to apply opening stats checkpoint, using statistics from the model files: {e}")
 
-    def _compute_opening_complexity(self):
-        """Pre-compute opening complexity scores (called once at startup)"""
-        player_opening = self.collaborative_data['player_opening_matrix'].copy()
-        player_data = self.collaborative_data['player_data']
+    def apply_opening_stats(self, stats):
+        """
+        Ganti games & win rates di index opening dengan nilai dari OpeningStats, dan geser
+        complexity & popularity fallback CF dari file model dengan game setelah baseline
+        checkpoint (tanpa game baru nilainya tetap persis). Opening yang belum dikenal
+        ditambahkan ke index (metadata dari game pertamanya). Struktur baru dibangun lengkap
+        dulu lalu dipasang dengan assignment.
+        """
+        table = stats.table()
+        index = dict(self._opening_index)
+        new = table.index[~table.index.isin(list(index))]
+        fens = moves_to_fen_batch(table.loc[new, 'moves'].tolist()) if len(new) else {}
+        for name, row in zip(table.index, table.itertuples(index=False)):
+            if row.games == 0:
+                continue
+            meta = dict(index[name]) if name in index else {
+                "archetype": row.archetype, "moves": row.moves, "fen": fens[row.moves],
+            }
+            meta.update({
+                "games": int(row.games),
+                "win_rate_white": float(row.win_rate_white),
+                "win_rate_black": float(row.win_rate_black),
+                "win_rate_draw": float(row.win_rate_draw),
+            })
+            index[name] = meta
+        self._vocab.add(index)
+
+        if self._cf_opening_names is not None:
+            self._opening_complexity_cache, self._opening_popularity = self._cf_stats_since_baseline(stats.delta())
+            self._cf_alignment = self._build_cf_alignment()
+        self._opening_index = index
+        # Checkpoint ikut menentukan versi: complexity/popularity bisa berubah tanpa index berubah
+        self.data_version = hashlib.sha256(f"{self._base_data_version}:{stats.fingerprint()}".encode()).hexdigest()[:16]
+        self.opening_stats = stats
+        self._result_cache.clear()
+
+    def with_opening_stats(self, stats):
+        """
+        Snapshot baru = snapshot ini dengan statistik opening `stats`, untuk dipasang lewat
+        RecommenderHandle.swap. Model & CF scores dipakai bersama; index, vocabulary dan result
+        cache milik snapshot baru, jadi snapshot aktif tidak berubah selama request berjalan.
+        """
+        snapshot = copy.copy(self)
+        snapshot._vocab = copy.deepcopy(self._vocab)
+        snapshot._result_cache = TTLCache(maxsize=settings.PREDICT_CACHE_SIZE, ttl=settings.PREDICT_CACHE_TTL)
+        snapshot.apply_opening_stats(stats)
+        return snapshot
+
+    def _keep_model_cf_stats(self):
+        """Simpan complexity & popularity dari file model sebagai dasar statistik incremental"""
+        self._model_complexity = self._opening_complexity_cache
+        self._model_popularity = self._opening_popularity
+
+    def _cf_stats_since_baseline(self, delta):
+        """
+        (complexity, popularity) dari file model ditambah game setelah baseline: play baru
+        menambah popularity, rating baru masuk ke rata-rata rating per opening (lalu min-max
+        ulang). Opening tanpa game baru memakai nilai model apa adanya.
+        """
+        complexity, popularity = self._model_complexity, self._model_popularity
+        plays = delta['plays'][delta['plays'] > 0]
+        if len(plays):
+            popularity = popularity.add(plays, fill_value=0).astype(popularity.dtype)
+
+        rated = delta[delta['rating_count'] > 0]
+        base = self._model_opening_rating
+        if len(rated) and base is not None:
+            names = base.index.union(rated.index)
+            mean = base['mean'].reindex(names)
+            count = base['count'].reindex(names, fill_value=0)
+            new_sum = rated['rating_sum'].reindex(names, fill_value=0)
+            new_count = rated['rating_count'].reindex(names, fill_value=0)
+            combined = (mean.fillna(0) * count + new_sum) / (count + new_count)
+            complexity = self._normalize_complexity(mean.where(new_count == 0, combined))
+        elif len(rated):
+            logger.warning("Bundle has no per-opening rating means (recompile it); complexity ignores ingested games")
+        return complexity, popularity
+
+    @staticmethod
+    def _load_keras_model():
+        """Import TensorFlow secara lazy - hanya saat jalur Keras benar-benar dibutuhkan"""
+        print("⏳ Loading Keras model (importing TensorFlow)...")
+        import tensorflow as tf
+        return tf.keras.models.load_model(settings.COLLAB_MODEL_PATH)
+
+    @staticmethod
+    def _compute_opening_rating(collaborative_data):
+        """Rata-rata & jumlah rating pemain per opening (called once at startup)"""
+        player_opening = collaborative_data['player_opening_matrix'].copy()
+        player_data = collaborative_data['player_data']
         player_opening = player_opening.merge(player_data[['player_id', 'rating']], on='player_id', how='left')
-        opening_avg_rating = player_opening.groupby('opening_name')['rating'].mean()
-        
+        ratings = player_opening.groupby('opening_name')['rating']
+        return pd.DataFrame({'mean': ratings.mean(), 'count': ratings.count()})
+
+    @staticmethod
+    def _normalize_complexity(opening_avg_rating):
+        """Complexity = rata-rata rating per opening, dinormalisasi min-max"""
         if opening_avg_rating.max() - opening_avg_rating.min() > 0:
             normalized_complexity = (opening_avg_rating - opening_avg_rating.min()) / (opening_avg_rating.max() - opening_avg_rating.min())
         else:
             normalized_complexity = pd.Series(0.5, index=opening_avg_rating.index)
         return normalized_complexity
 
+    @staticmethod
+    def _opening_index_version(index):
+        """Hash pendek dari isi index opening (nama + metadata)"""
+        h = hashlib.sha256()
+        for name in sorted(index):
+            h.update(json.dumps([name, index[name]], sort_keys=True).encode())
+        return h.hexdigest()[:16]
+
+    def opening_names(self):
+        """Semua nama opening yang dikenal (dari index metadata)"""
+        return list(self._opening_index)
+
+    def _opening_index_from_bundle(self, bundle):
+        """Rebuild dict index opening dari kolom bundle"""
+        columns = ('archetype', 'moves', 'fen', 'games', 'win_rate_white', 'win_rate_black', 'win_rate_draw')
+        values = {col: bundle[f'opening_{col}'].tolist() for col in columns}
+        # FEN dari bundle juga mengisi cache moves -> FEN, jadi tidak ada replay langkah
+        seed_fen_cache(zip(values['moves'], values['fen']))
+        return {
+            name: {col: values[col][i] for col in columns}
+            for i, name in enumerate(bundle['opening_name'].tolist())
+        }
+
+    def compile_bundle_columns(self):
+        """
+        Muat file legacy (CSV + pickle) lalu kembalikan semua data turunan sebagai kolom
+        untuk app/services/bundle.py. Memakai fungsi load yang sama dengan service
+        sehingga hasil dari bundle identik dengan hasil dari file legacy.
+        """
+        self._bundle = None
+        self._load_data_legacy()
+        self.content_based_model = None
+        self._load_content_based()
+        self._load_collaborative_data()
+
+        names = sorted(self._opening_index)
+        columns = {'opening_name': names}
+        for col in ('archetype', 'moves', 'fen', 'games', 'win_rate_white', 'win_rate_black', 'win_rate_draw'):
+            columns[f'opening_{col}'] = [self._opening_index[name][col] for name in names]
+
+        cb = self.content_based_model
+        if isinstance(cb, VectorIndex):
+            columns['cb_vectors'] = np.asarray(cb.vectors)
+        else:
+            columns['cb_columns'] = np.asarray(cb.columns)
+        columns.update({
+            'cb_names': cb.names,
+            'cb_row_names': cb.row_names.tolist(),
+            'cf_opening_names': self._cf_opening_names,
+            'complexity_names': self._opening_complexity_cache.index.to_numpy(),
+            'complexity_values': self._opening_complexity_cache.to_numpy(),
+            'complexity_mean_rating': self._model_opening_rating['mean'].to_numpy(),
+            'complexity_rating_count': self._model_opening_rating['count'].to_numpy(),
+            'popularity_names': self._opening_popularity.index.to_numpy(),
+            'popularity_counts': self._opening_popularity.to_numpy(),
+            'player_ratings': self._player_index['ratings'],
+            'player_order': self._player_index['order'],
+            'player_sorted_ratings': self._player_index['sorted_ratings'],
+            'player_codes': self._player_index['codes'],
+            'player_encoded': self._player_index['encoded'],
+        })
+        return columns
+
+    @staticmethod
+    def _build_opening_index(stats):
+        """Pre-compute metadata & win rates per opening dari OpeningStats (called once at startup)"""
+        # Metadata dari game pertama setiap opening; urutan = urutan kemunculan pertama di CSV
+        table = stats.table()
+        # Opening tanpa satu pun winner tidak punya win rate (seperti crosstab)
+        table = table[table['games'] > 0]
+
+        # FEN semua opening dihitung sekali lewat move-trie (prefix bersama di-replay sekali)
+        fen_by_moves = moves_to_fen_batch(table['moves'].tolist())
+
+        index = {}
+        for name, row in zip(table.index, table.itertuples(index=False)):
+            index[name] = {
+                "archetype": row.archetype,
+                "moves": row.moves,
+                "fen": fen_by_moves[row.moves],
+                "games": int(row.games),
+                "win_rate_white": float(row.win_rate_white),
+                "win_rate_black": float(row.win_rate_black),
+                "win_rate_draw": float(row.win_rate_draw),
+            }
+        return index
+
+    def _build_cf_scorer(self, keras_model):
+        """Build CF scorer sesuai settings.CF_ENGINE, dengan parity check terhadap Keras"""
+        keras_scorer = KerasCFScorer(keras_model)
+        if settings.CF_ENGINE != "numpy":
+            return keras_scorer
+        try:
+            numpy_scorer = NumpyCFScorer.from_keras(keras_model)
+            # Sampel player tersebar di seluruh encoder, dinilai terhadap semua opening
+            n_players = self._player_index['n_encoded']
+            sample_players = np.unique(np.linspace(0, n_players - 1, num=min(16, n_players)).astype(int))
+            diff = check_parity(keras_scorer, numpy_scorer, sample_players, self._encoded_openings_cache)
+        except Exception as e:
+            print(f"⚠️ NumPy CF engine unavailable, using Keras: {e}")
+            return keras_scorer
+        if diff > settings.CF_PARITY_TOLERANCE:
+            print(f"⚠️ NumPy CF engine parity check failed (max diff {diff:.2e}), using Keras")
+            return keras_scorer
+        print(f"✅ NumPy CF engine active (max diff vs Keras {diff:.2e})")
+        return numpy_scorer
+
     def _prewarm_model(self):
         """Run dummy prediction to trigger XLA compilation at startup"""
         try:
             model = self.collaborative_model['model']
-            player_encoder = self.collaborative_data['player_encoder']
             
             # Small dummy batch
             dummy_players = np.array([0, 0, 0])
@@ -141,263 +539,496 @@ class ChessRecommender:
         return score_norm * (target_max - target_min) + target_min
 
     def _get_win_rates(self, opening_name):
-        games = self.chess_data[self.chess_data.opening_name == opening_name]
-        if len(games) == 0:
+        meta = self._opening_index.get(opening_name)
+        if meta is None:
             return 0.0, 0.0, 0.0
-        total = len(games)
-        w = len(games[games.winner == 'white']) / total
-        b = len(games[games.winner == 'black']) / total
-        d = len(games[games.winner == 'draw']) / total
-        return w, b, d
+        return meta['win_rate_white'], meta['win_rate_black'], meta['win_rate_draw']
 
     # --- Core Logic Methods (Refactored from app.py) ---
     
     def _get_content_based(self, favorite_openings, top_n=50):
-        # ... (Logika dari get_content_based_recommendations di app.py) ...
-        # Saya ringkas untuk mempersingkat jawaban, tapi Anda paste logika intinya di sini
-        # Pastikan menggunakan self.content_based_model
-        
-        # Contoh implementasi minimal:
-        sim_df = self.content_based_model['similarity_matrix']
-        valid_favs = [o for o in favorite_openings if o in self.content_based_model['opening_names']]
-        if not valid_favs: return pd.DataFrame()
-        
-        scores = sim_df[valid_favs].mean(axis=1)
-        recs = pd.DataFrame({'opening_name': scores.index, 'similarity_score': scores.values})
-        # ... normalisasi & sorting ...
-        recs = recs.sort_values('similarity_score', ascending=False)
-        return recs.head(top_n)
+        """Top-N opening (ids, scores) berdasarkan rata-rata similarity terhadap opening favorit"""
+        with _CB_SECONDS.time():
+            return self._cb_candidates(self.content_based_model.top_n_positions(favorite_openings, top_n))
+
+    def _cb_candidates(self, top):
+        """(posisi baris CB, skor) -> (id vocabulary, skor)"""
+        if top is None:
+            return NO_CANDIDATES
+        positions, scores = top
+        return self._cb_row_ids[positions], scores
+
+    def _build_cf_alignment(self):
+        """
+        Sejajarkan vocabulary CF & popularity dengan complexity score sekali saat load
+        (predictions.index.intersection(complexity.index)), sehingga penyesuaian rating
+        per request cukup berupa operasi array.
+        """
+        complexity = self._opening_complexity_cache
+
+        def align(names):
+            names = pd.Index(names)
+            common = names.intersection(complexity.index)
+            return {
+                'positions': names.get_indexer(common),
+                'complexity': complexity.loc[common].to_numpy(dtype=np.float64),
+                'ids': self._vocab.add(common),
+            }
+
+        alignment = {'cf': align(self._cf_opening_names), 'popularity': align(self._opening_popularity.index)}
+        alignment['popularity']['counts'] = self._opening_popularity.to_numpy()[alignment['popularity']['positions']]
+        return alignment
+
+    @staticmethod
+    def _adjust_by_rating(predictions, complexity_scores, user_rating, rating_max=3000, influence=0.3):
+        """Sesuaikan skor dengan kompleksitas opening relatif terhadap rating user, lalu normalisasi ke max 1"""
+        normalized_rating = user_rating / rating_max
+        rating_factor = normalized_rating - 0.5
+        complexity_factor = complexity_scores - 0.5
+        adjustment = influence * rating_factor * complexity_factor * 2
+        adjusted = predictions * (1 + adjustment)
+
+        # Normalize
+        peak = _skipna_max(adjusted)
+        if peak > 0:
+            adjusted = adjusted / peak
+        return adjusted
 
     def _get_collaborative(self, user_rating, top_n=50, debug=False):
         """
         Logic Collaborative Filtering - OPTIMIZED VERSION
+        Return (ids, scores) top_n opening, terurut menurun.
         """
-        if self.collaborative_data is None or self.collaborative_model is None:
-            return pd.DataFrame(columns=['opening_name', 'score'])
+        if not self.cf_ready:
+            # CF masih dimuat (atau gagal dimuat): predict() memakai hasil CB saja
+            return NO_CANDIDATES
 
-        # --- Helper Inner Functions (Optimized) ---
-        def softmax(x):
-            e_x = np.exp(x - np.max(x))
-            return e_x / e_x.sum()
+        with _CF_SECONDS.time():
+            return self._cf_candidates(user_rating, top_n)
 
-        def adjust_by_rating_vectorized(predictions, complexity_scores, user_rating, rating_max=3000, influence=0.3):
-            """Vectorized version - much faster than loop"""
-            normalized_rating = user_rating / rating_max
-            
-            # Align indices
-            common_idx = predictions.index.intersection(complexity_scores.index)
-            pred_aligned = predictions.loc[common_idx]
-            comp_aligned = complexity_scores.loc[common_idx]
-            
-            # Vectorized calculation
-            rating_factor = normalized_rating - 0.5
-            complexity_factor = comp_aligned - 0.5
-            adjustment = influence * rating_factor * complexity_factor * 2
-            adjusted = pred_aligned * (1 + adjustment)
-            
-            # Normalize
-            if adjusted.max() > 0:
-                adjusted = adjusted / adjusted.max()
-            return adjusted
-
-        # --- Main Logic ---
-        player_data = self.collaborative_data['player_data']
-        player_encoder = self.collaborative_data['player_encoder']
-        opening_encoder = self.collaborative_data['opening_encoder']
-        model = self.collaborative_model['model']
-
-        # === LAZY CACHING ===
+    def _cf_candidates(self, user_rating, top_n):
+        """Skor bucket (cache / hitung / fallback popularity) + penyesuaian rating -> top_n (ids, scores)"""
+        alignment = self._cf_alignment
         # Round rating to nearest 250 for cache bucket (reduces buckets while maintaining accuracy)
-        rating_bucket = round(user_rating / 250) * 250
-        rating_bucket = max(500, min(3000, rating_bucket))
-        
-        # Check if we have cached predictions for this rating bucket
-        if rating_bucket in self._cf_prediction_cache:
-            print(f"⚡ Cache HIT for rating bucket {rating_bucket}")
-            cached_result = self._cf_prediction_cache[rating_bucket].copy()
-            # Apply rating-specific adjustments
-            final_result = adjust_by_rating_vectorized(
-                pd.Series(cached_result['score'].values, index=cached_result['opening_name']),
-                self._opening_complexity_cache,
-                user_rating
-            )
-            return pd.DataFrame({
-                'opening_name': final_result.index,
-                'score': final_result.values
-            }).sort_values('score', ascending=False).head(top_n)
-        
-        print(f"🔄 Cache MISS for rating bucket {rating_bucket}, computing...")
+        bucket_scores = self._get_cf_bucket_scores(rating_bucket(user_rating))
+
+        if bucket_scores is None:
+            return self._popularity_candidates(user_rating, top_n)
+
+        # Apply rating-specific adjustments (USE CACHED COMPLEXITY & VECTORIZED FUNCTION)
+        cf = alignment['cf']
+        scores = self._adjust_by_rating(
+            np.asarray(bucket_scores)[cf['positions']], cf['complexity'], user_rating
+        )
+        top = descending_order(scores)[:top_n]
+        return cf['ids'][top], scores[top]
+
+    def _popularity_candidates(self, user_rating, top_n=50):
+        """Fallback popularity (tanpa CF inference) - USE CACHED COMPLEXITY -> top_n (ids, scores)"""
+        popularity = self._cf_alignment['popularity']
+        adjusted = self._adjust_by_rating(popularity['counts'], popularity['complexity'], user_rating)
+        peak = _skipna_max(adjusted)
+        scores = adjusted / peak if peak > 0 else adjusted
+        top = descending_order(scores)[:top_n]
+        return popularity['ids'][top], scores[top]
+
+    def _get_cf_bucket_scores(self, bucket):
+        """Raw CF scores (softmax, sebelum penyesuaian rating) untuk satu bucket, dari cache atau dihitung"""
+        cached = self._cf_prediction_cache.get(bucket)
+        hit = cached is not None or bucket in self._cf_fallback_buckets
+        if not _CF_LOOKUP_COUNTED.get():
+            metrics.CF_CACHE_REQUESTS.labels(bucket, "hit" if hit else "miss").inc()
+        if hit:
+            log_sampled(logging.DEBUG, "CF cache hit for rating bucket %s", bucket)
+            return cached
+        return self.compute_cf_buckets([bucket])[bucket]
+
+    def cf_bucket_cached(self, bucket):
+        """True jika skor bucket (atau status fallback popularity-nya) sudah diketahui"""
+        return bucket in self._cf_prediction_cache or bucket in self._cf_fallback_buckets
+
+    def clear_cf_cache(self):
+        """Kosongkan CF bucket cache (bucket dihitung ulang saat dipakai)"""
+        with self._cf_compute_lock:
+            self._cf_prediction_cache = {}
+            self._cf_fallback_buckets = set()
+
+    def compute_cf_buckets(self, buckets):
+        """
+        CF scores untuk beberapa bucket sekaligus -> {bucket: scores atau None (fallback popularity)}.
+
+        Bucket yang belum di-cache dihitung dengan satu inference: pemain mirip dari semua
+        bucket digabung menjadi satu batch untuk CF scorer, lalu dipecah lagi per bucket.
+        Baris hasil scorer tidak bergantung pada isi batch, jadi hasilnya identik dengan
+        menghitung per bucket. Hasil disimpan ke cache. Metric hit/miss dicatat oleh caller
+        (saat memutuskan perlu compute), bukan di sini.
+        """
+        results = {}
+        with self._cf_compute_lock:
+            # Cek ulang di dalam lock: thread lain (atau precompute background) mungkin sudah mengisi bucket
+            pending = []
+            for bucket in dict.fromkeys(buckets):
+                if self.cf_bucket_cached(bucket):
+                    results[bucket] = self._cf_prediction_cache.get(bucket)
+                else:
+                    pending.append(bucket)
+            if not pending:
+                return results
+            logger.info("CF cache miss for rating buckets %s, computing", pending)
+
+            neighbors = {}
+            for bucket in pending:
+                with _CF_NEIGHBOR_SECONDS.time():
+                    similar = self._find_similar_players(bucket)
+                if similar is None:
+                    self._cf_fallback_buckets.add(bucket)
+                    results[bucket] = None
+                else:
+                    neighbors[bucket] = similar
+            if not neighbors:
+                return results
+
+            # Predict with CF scorer (NumPy/Keras) - satu batch untuk semua bucket, USE CACHED encoded_openings
+            with _CF_INFERENCE_SECONDS.time():
+                encoded_players = np.concatenate([players for players, _ in neighbors.values()])
+                predictions_matrix = self._cf_scorer.score(encoded_players, self._encoded_openings_cache)
+                offset = 0
+                for bucket, (players, weights) in neighbors.items():
+                    avg_predictions = weights @ predictions_matrix[offset:offset + len(players)]
+                    offset += len(players)
+                    scores = _softmax(avg_predictions / CF_TEMPERATURE)
+                    self._cf_prediction_cache[bucket] = scores
+                    results[bucket] = scores
+            metrics.CF_BATCH_BUCKETS.observe(len(neighbors))
+        return results
+
+    def _find_similar_players(self, user_rating):
+        """
+        Cari pemain dengan rating mirip (jendela rating yang melebar) memakai index rating terurut.
+        Return (encoded_players, weights) atau None jika tidak ada pemain yang dikenal encoder.
+        """
+        idx = self._player_index
+        ratings = idx['ratings']
+        sorted_ratings = idx['sorted_ratings']
 
         # Cari pemain mirip (REDUCED from 10 to 5 for performance)
-        rating_diff = abs(player_data['rating'] - user_rating)
         min_similar_players = 5
         rating_ranges = [50, 100, 200, 300, 400, 500, 750, 1000]
         
-        similar_players_idx = None
         for r_range in rating_ranges:
-            similar_players_idx = rating_diff[rating_diff <= r_range].index
-            if len(similar_players_idx) >= min_similar_players:
+            lo = np.searchsorted(sorted_ratings, user_rating - r_range, side='left')
+            hi = np.searchsorted(sorted_ratings, user_rating + r_range, side='right')
+            if hi - lo >= min_similar_players:
                 break
+        # Posisi baris asli, dalam urutan player_data
+        rows = np.sort(idx['order'][lo:hi])
         
-        if len(similar_players_idx) < min_similar_players:
-            similar_players_idx = rating_diff.nsmallest(min_similar_players).index
+        if len(rows) < min_similar_players:
+            rows = np.argsort(np.abs(ratings - user_rating), kind='stable')[:min_similar_players]
 
-        rating_weights = 1 / (rating_diff.loc[similar_players_idx] + 10)
+        rating_weights = 1 / (np.abs(ratings[rows] - user_rating) + 10)
         rating_weights = rating_weights / rating_weights.sum()
-        
-        similar_players = player_data.loc[similar_players_idx, 'player_id'].unique()
-        
-        # Filter valid players
-        valid_similar_players = [p for p in similar_players if p in player_encoder.classes_]
-        valid_player_indices = [similar_players_idx[i] for i, p in enumerate(similar_players) if p in player_encoder.classes_]
-        
-        if valid_player_indices:
-            valid_weights = rating_weights.loc[valid_player_indices]
-            valid_weights = valid_weights / valid_weights.sum()
-        else:
-            valid_weights = None
 
-        if len(valid_similar_players) == 0:
-            # Fallback popularity - USE CACHED COMPLEXITY
-            opening_counts = self.collaborative_data['player_opening_matrix'].groupby('opening_name').size()
-            adjusted_counts = adjust_by_rating_vectorized(opening_counts, self._opening_complexity_cache, user_rating)
-            normalized_counts = adjusted_counts / adjusted_counts.max() if adjusted_counts.max() > 0 else adjusted_counts
-            
-            return pd.DataFrame({
-                'opening_name': adjusted_counts.index,
-                'score': normalized_counts.values
-            }).sort_values('score', ascending=False).head(top_n)
+        # Pemain unik dalam urutan kemunculan pertama
+        codes = idx['codes'][rows]
+        _, first = np.unique(codes, return_index=True)
+        unique_codes = codes[np.sort(first)]
 
-        else:
-            # Predict with Model - USE CACHED encoded_openings
-            encoded_players = player_encoder.transform(valid_similar_players)
-            encoded_openings = self._encoded_openings_cache  # CACHED!
-            
-            players_batch = np.repeat(encoded_players, len(encoded_openings))
-            openings_batch = np.tile(encoded_openings, len(encoded_players))
-            
-            predictions = model.predict(
-                [players_batch, openings_batch],
-                batch_size=1024,
-                verbose=0
-            ).flatten()
-            
-            predictions_matrix = predictions.reshape(len(encoded_players), -1)
-            
-            if valid_weights is not None:
-                weighted_predictions = np.zeros(predictions_matrix.shape[1])
-                for i in range(len(valid_similar_players)):
-                    if i < len(valid_weights): # Safety check
-                        weighted_predictions += predictions_matrix[i] * valid_weights.iloc[i]
-                    else:
-                        weighted_predictions += predictions_matrix[i] * (1/len(valid_similar_players))
-                avg_predictions = weighted_predictions
+        # Filter valid players (dikenal oleh player_encoder); bobot diambil per posisi seperti sebelumnya
+        encoded = idx['encoded'][unique_codes]
+        valid = np.flatnonzero(encoded >= 0)
+        if len(valid) == 0:
+            return None
+        valid_weights = rating_weights[valid]
+        return encoded[valid], valid_weights / valid_weights.sum()
+
+    def _build_player_index(self, collaborative_data):
+        """Pre-sort rating pemain & pre-compute index encoder (called once at startup)"""
+        player_data = collaborative_data['player_data']
+        player_encoder = collaborative_data['player_encoder']
+        ratings = player_data['rating'].to_numpy()
+        order = np.argsort(ratings, kind='stable')
+        codes, uniques = pd.factorize(player_data['player_id'])
+        return {
+            'ratings': ratings,
+            'order': order,
+            'sorted_ratings': ratings[order],
+            'codes': codes,
+            # -1 untuk player yang tidak dikenal encoder
+            'encoded': pd.Index(player_encoder.classes_).get_indexer(uniques),
+            'n_encoded': len(player_encoder.classes_),
+        }
+
+    def precompute_cf_buckets(self):
+        """
+        Hitung CF scores untuk semua rating bucket ke matrix dense (bucket x opening).
+        Bucket yang sudah ada di cache (mis. dari artifact) tidak dihitung ulang.
+        Return (scores, computed) di mana computed[i] False berarti bucket memakai fallback popularity.
+        """
+        n_openings = len(self._encoded_openings_cache)
+        scores = np.zeros((len(RATING_BUCKETS), n_openings))
+        computed = []
+        for i, bucket in enumerate(RATING_BUCKETS):
+            # Bukan request: tidak masuk metric CF cache hit/miss
+            row = self.compute_cf_buckets([bucket])[bucket]
+            if row is not None:
+                scores[i] = row
+            computed.append(row is not None)
+        return scores, computed
+
+    def _load_cf_bucket_artifact(self):
+        """Isi CF cache dari artifact .npy (memory-mapped) jika cocok dengan model saat ini"""
+        loaded = load_cf_artifact(settings.CF_BUCKETS_PATH, self._cf_fingerprint, len(self._encoded_openings_cache))
+        if loaded is None:
+            return False
+        scores, computed = loaded
+        for i, bucket in enumerate(RATING_BUCKETS):
+            if computed[i]:
+                self._cf_prediction_cache[bucket] = scores[i]
             else:
-                avg_predictions = np.mean(predictions_matrix, axis=0)
+                # Bucket tanpa pemain mirip: fallback popularity, sama seperti saat dihitung langsung
+                self._cf_fallback_buckets.add(bucket)
+        print(f"✅ Loaded precomputed CF scores for {sum(computed)} rating buckets "
+              f"({len(computed) - sum(computed)} popularity fallback)")
+        return True
 
-            temperature = 2.0
-            softmax_predictions = softmax(avg_predictions / temperature)
-            
-            # Store raw predictions in cache (before rating adjustment)
-            # This allows reuse for nearby ratings
-            raw_predictions_df = pd.DataFrame({
-                'opening_name': opening_encoder.classes_,
-                'score': softmax_predictions
-            })
-            self._cf_prediction_cache[rating_bucket] = raw_predictions_df
-            print(f"✅ Cached predictions for rating bucket {rating_bucket}")
-            
-            # USE CACHED COMPLEXITY & VECTORIZED FUNCTION
-            final_predictions = adjust_by_rating_vectorized(
-                pd.Series(softmax_predictions, index=opening_encoder.classes_),
-                self._opening_complexity_cache,
-                user_rating
-            )
-            
-            return pd.DataFrame({
-                'opening_name': final_predictions.index,
-                'score': final_predictions.values
-            }).sort_values('score', ascending=False).head(top_n)
+    def _start_cf_precompute(self):
+        """Jalankan sesuai settings.CF_PRECOMPUTE (lihat app/config.py)"""
+        mode = settings.CF_PRECOMPUTE
+        if mode == "off":
+            return
+        if self._load_cf_bucket_artifact() or mode == "artifact":
+            return
+        if mode == "startup":
+            print("⏳ Pre-computing CF scores for all rating buckets...")
+            self.precompute_cf_buckets()
+        elif mode == "background":
+            print("⏳ Pre-computing CF scores for all rating buckets in background...")
+            threading.Thread(target=self.precompute_cf_buckets, name="cf-precompute", daemon=True).start()
+
+    def _result_cache_key(self, user_rating, favorite_openings, alpha, top_n):
+        """Normalisasi request menjadi key cache: (rating, favorites terurut, alpha terkuantisasi, top_n)"""
+        step = settings.PREDICT_CACHE_ALPHA_STEP
+        if step > 0:
+            alpha = round(round(alpha / step) * step, 6)
+        return (int(user_rating), tuple(sorted(favorite_openings)), float(alpha), int(top_n))
+
+    def cache_stats(self):
+        """Statistik hit/miss/eviction untuk result cache & CF cache"""
+        return {
+            "result_cache": self._result_cache.stats(),
+            "cf_cache_buckets": sorted(self._cf_prediction_cache.keys()),
+        }
+
+    def export_metrics(self):
+        """Salin state yang dihitung di tempat lain (readiness, statistik result cache) ke metrics"""
+        for stage, ready in self.stages.items():
+            metrics.MODEL_STAGE_READY.labels(stage).set(int(ready))
+        stats = self._result_cache.stats()
+        for event in ("hits", "misses", "evictions", "expirations", "coalesced"):
+            metrics.RESULT_CACHE_EVENTS.labels(event).set_total(stats[event])
+        metrics.RESULT_CACHE_SIZE.set(stats["size"])
+        metrics.CF_QUEUE_DEPTH.set(self._cf_batcher.depth)
 
     def predict(self, user_rating: int, favorite_openings: list, alpha: float, top_n: int = 5):
         if not self.is_ready:
             raise RuntimeError("Model is not loaded")
 
+        # Rating dipakai apa adanya karena penyesuaian CF bergantung pada rating persis
+        # (bukan hanya bucket); favorites & alpha dinormalisasi agar hasil cache
+        # identik dengan hasil komputasi langsung untuk key yang sama.
+        key = self._result_cache_key(user_rating, favorite_openings, alpha, top_n)
+        if not self.cf_ready:
+            # Hasil CB-only selama CF dimuat tidak disimpan ke cache
+            return self._predict_uncached(*key)
+        results = self._result_cache.get_or_compute(key, lambda: self._predict_uncached(*key))
+        # Salinan dangkal agar caller tidak bisa mengubah isi cache
+        return [dict(r) for r in results]
+
+    async def predict_async(self, user_rating: int, favorite_openings: list, alpha: float, top_n: int = 5,
+                            timeout=None):
+        """
+        predict() untuk endpoint async: jika bucket CF belum di-cache, request menunggu
+        micro-batcher (inference digabung dengan request lain, di thread terpisah). Sisanya
+        (result cache, CB, hybrid, format) juga dijalankan di thread lewat asyncio.to_thread,
+        sehingga event loop tidak pernah terblokir oleh komputasi.
+
+        `timeout` = sisa budget request (detik). Jika CF tidak siap, antrian CF penuh, CF tidak
+        selesai dalam budget atau gagal, request di-degradasi tanpa menunggu CF (_predict_degraded).
+        Return (results, degraded): degraded None, atau mode degradasi ("popularity" / "cb_only").
+        """
+        if not self.is_ready:
+            raise RuntimeError("Model is not loaded")
+        args = (user_rating, favorite_openings, alpha, top_n)
+        if not self.cf_ready:
+            return await asyncio.to_thread(self._predict_degraded, *args, "cf_unavailable")
+        bucket = rating_bucket(user_rating)
+        if self.cf_bucket_cached(bucket):
+            # Hit dicatat oleh lookup bucket di predict()
+            return await asyncio.to_thread(self.predict, *args), None
+        metrics.CF_CACHE_REQUESTS.labels(bucket, "miss").inc()
+        try:
+            await self._cf_batcher.scores(bucket, self.compute_cf_buckets, timeout=timeout)
+        except CFOverloaded as e:
+            return await asyncio.to_thread(self._predict_degraded, *args, e.reason)
+        except Exception as e:
+            logger.error("CF inference failed for rating bucket %s: %s", bucket, e)
+            return await asyncio.to_thread(self._predict_degraded, *args, "error")
+        # asyncio.to_thread menyalin context, jadi predict() di thread melihat flag ini
+        token = _CF_LOOKUP_COUNTED.set(True)
+        try:
+            return await asyncio.to_thread(self.predict, *args), None
+        finally:
+            _CF_LOOKUP_COUNTED.reset(token)
+
+    def _predict_degraded(self, user_rating, favorite_openings, alpha, top_n, reason):
+        """
+        Hasil tanpa CF inference: skor CF diganti fallback popularity (tanpa model, sama seperti
+        bucket tanpa pemain mirip), atau CB saja jika data CF belum dimuat. Hasil lengkap dari
+        result cache tetap dipakai jika ada; hasil degradasi tidak disimpan ke cache.
+        """
+        key = self._result_cache_key(user_rating, favorite_openings, alpha, top_n)
+        cached = self._result_cache.get(key) if self.cf_ready else None
+        if cached is not None:
+            return [dict(r) for r in cached], None
+        user_rating, favorites, alpha, top_n = key
+        mode = "popularity" if self._cf_alignment is not None else "cb_only"
+        cf_recs = self._popularity_candidates(user_rating) if mode == "popularity" else NO_CANDIDATES
+        results = self._hybrid_results(self._get_content_based(list(favorites)), cf_recs, list(favorites), alpha, top_n)
+        metrics.PREDICT_DEGRADED.labels(mode, reason).inc()
+        log_sampled(logging.WARNING, "Serving degraded /predict (%s, %s)", mode, reason)
+        return results, mode
+
+    def warm_result_cache(self, keys):
+        """Isi result cache untuk key request (mis. key terbaru dari snapshot sebelumnya saat reload)"""
+        if not self.cf_ready:
+            return 0
+        for key in keys:
+            generation = self._result_cache.generation
+            self._result_cache.set(key, self._predict_uncached(*key), generation)
+        return len(keys)
+
+    def _predict_uncached(self, user_rating: int, favorite_openings, alpha: float, top_n: int = 5):
+        favorite_openings = list(favorite_openings)
+
         # 1. Get CB & CF Recs
         cb_recs = self._get_content_based(favorite_openings)
         cf_recs = self._get_collaborative(user_rating)
 
-        # 2. Merge & Hybrid Logic (Sesuai app.py)
-        # Rename columns
-        if not cb_recs.empty:
-            cb_recs = cb_recs.rename(columns={'similarity_score': 'cb_score'})
-        if not cf_recs.empty:
-            cf_recs = cf_recs.rename(columns={'score': 'cf_score'})
+        return self._hybrid_results(cb_recs, cf_recs, favorite_openings, alpha, top_n)
 
-        # Merge
-        if cb_recs.empty and cf_recs.empty:
-            return []
-        elif cb_recs.empty:
-            hybrid = cf_recs
-            hybrid['cb_score'] = 0
-            hybrid['hybrid_score'] = (1 - alpha) * hybrid['cf_score']
-        elif cf_recs.empty:
-            hybrid = cb_recs
-            hybrid['cf_score'] = 0
-            hybrid['hybrid_score'] = alpha * hybrid['cb_score']
-        else:
-            hybrid = pd.merge(cb_recs, cf_recs, on='opening_name', how='outer').fillna(0)
-            
-            # === FIX: Percentile-based normalization for fair comparison ===
-            # This ensures both CB and CF have the same distribution shape
-            # so that alpha=0.5 is truly balanced
-            
-            for col in ['cb_score', 'cf_score']:
-                if hybrid[col].max() > 0:
-                    # Convert to percentile ranks (0-1)
-                    # This makes distributions comparable regardless of original scale
-                    ranked = hybrid[col].rank(method='average', pct=True)
-                    # Scale to [0.1, 1.0] to ensure no zeros
-                    hybrid[col] = ranked * 0.9 + 0.1
-                else:
-                    hybrid[col] = 0.1
-            
-            # Hitung hybrid score dengan bobot alpha
-            # alpha=1.0 → 100% CB, alpha=0.0 → 100% CF, alpha=0.5 → 50/50
-            hybrid['hybrid_score'] = (alpha * hybrid['cb_score']) + ((1 - alpha) * hybrid['cf_score'])
-            
-            # Normalisasi ulang hybrid_score ke [0, 1] agar maksimum 100%
-            hs_max = hybrid['hybrid_score'].max()
-            hs_min = hybrid['hybrid_score'].min()
-            if hs_max > hs_min:
-                hybrid['hybrid_score'] = (hybrid['hybrid_score'] - hs_min) / (hs_max - hs_min)
+    def predict_batch(self, profiles, top_n: int = 5):
+        """
+        Rekomendasi untuk banyak profil (user_rating, favorite_openings, alpha) sekaligus.
 
-        # 3. Filter & Sort
-        hybrid = hybrid[~hybrid.opening_name.isin(favorite_openings)]
-        hybrid = hybrid.sort_values('hybrid_score', ascending=False).head(top_n)
+        Profil identik digabung, CB dihitung untuk semua set favorit unik sebagai operasi
+        matrix, dan CF dihitung sekali per rating. Generator ini menghasilkan
+        (index, results) dalam urutan input sehingga bisa langsung di-stream.
+
+        Result cache /predict hanya dibaca: hasil batch (sampai 50k profil) tidak disimpan
+        agar tidak mengusir entry interaktif yang sering dipakai.
+        """
+        if not self.is_ready:
+            raise RuntimeError("Model is not loaded")
+
+        keys = [self._result_cache_key(rating, favorites, alpha, top_n) for rating, favorites, alpha in profiles]
+        use_cache = self.cf_ready
+
+        # Hanya key yang belum ada di result cache yang perlu dihitung
+        computed = {}
+        pending = []
+        for key in dict.fromkeys(keys):
+            cached = self._result_cache.get(key) if use_cache else None
+            if cached is None:
+                pending.append(key)
+            else:
+                computed[key] = cached
+
+        # CB: satu operasi matrix untuk semua set favorit unik
+        favorite_sets = list(dict.fromkeys(key[1] for key in pending))
+        with _CB_BATCH_SECONDS.time():
+            cb_by_favorites = {
+                favorites: self._cb_candidates(top)
+                for favorites, top in zip(favorite_sets, self.content_based_model.top_n_batch(favorite_sets))
+            }
+        # CF: vektor bucket dipakai ulang, penyesuaian rating sekali per rating
+        cf_by_rating = {}
+
+        for index, key in enumerate(keys):
+            if key not in computed:
+                user_rating, favorites, alpha, key_top_n = key
+                if user_rating not in cf_by_rating:
+                    cf_by_rating[user_rating] = self._get_collaborative(user_rating)
+                results = self._hybrid_results(
+                    cb_by_favorites[favorites], cf_by_rating[user_rating], list(favorites), alpha, key_top_n
+                )
+                computed[key] = results
+            yield index, [dict(r) for r in computed[key]]
+
+    def _hybrid_results(self, cb_recs, cf_recs, favorite_openings, alpha: float, top_n: int):
+        """Gabungkan kandidat CB & CF (ids, scores) menjadi hybrid score, lalu format sesuai schema"""
+        # 2. Merge & Hybrid Logic (Sesuai app.py) - array NumPy, lihat app/services/hybrid.py
+        vocab = self._vocab
+        with _HYBRID_SECONDS.time():
+            hybrid = blend(cb_recs, cf_recs, vocab.lookup(favorite_openings), alpha, top_n, vocab.rank)
+        if hybrid is None:
+            return []
 
         # 4. Format Output sesuai Schema
+        format_start = time.perf_counter()
+        ids, hybrid_scores, cb_scores, cf_scores = (column.tolist() for column in hybrid)
         results = []
-        for _, row in hybrid.iterrows():
-            name = row['opening_name']
-            # Ambil data tambahan dari self.chess_data
-            meta = self.chess_data[self.chess_data.opening_name == name].iloc[0]
-            w, b, d = self._get_win_rates(name)
-            
+        for opening_id, hybrid_score, cb_score, cf_score in zip(ids, hybrid_scores, cb_scores, cf_scores):
+            name = vocab.names[opening_id]
+            # Ambil data tambahan dari index (O(1) lookup, tanpa scan self.chess_data)
+            meta = self._opening_index.get(name)
+            if meta is None:
+                continue
+
             results.append({
                 "opening_name": name,
-                "archetype": meta['opening_archetype'],
-                "moves": meta['opening_moves'],
-                "fen": moves_to_fen(meta['opening_moves']),  # ← ADD FEN
-                "hybrid_score": float(row['hybrid_score']),
-                "cb_score": float(row['cb_score']),
-                "cf_score": float(row['cf_score']),
-                "win_rate_white": w,
-                "win_rate_black": b,
-                "win_rate_draw": d
+                "archetype": meta['archetype'],
+                "moves": meta['moves'],
+                "fen": meta['fen'],
+                "hybrid_score": hybrid_score,
+                "cb_score": cb_score,
+                "cf_score": cf_score,
+                "win_rate_white": meta['win_rate_white'],
+                "win_rate_black": meta['win_rate_black'],
+                "win_rate_draw": meta['win_rate_draw']
             })
-            
+
+        _FORMAT_SECONDS.observe(time.perf_counter() - format_start)
         return results
 
-# Singleton Instance
-recommender = ChessRecommender()
\ No newline at end of file
+class RecommenderHandle:
+    """
+    Akses stabil ke snapshot model aktif (ChessRecommender).
+
+    Atribut & method diteruskan ke snapshot saat diakses, jadi request yang sudah berjalan
+    tetap memakai snapshot lama sampai selesai walaupun `swap()` sudah memasang snapshot
+    baru. Snapshot lama dilepas setelah referensi terakhirnya hilang (lihat app/services/reload.py).
+    """
+
+    def __init__(self, snapshot):
+        self.__dict__['_snapshot'] = snapshot
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def swap(self, snapshot):
+        """Pasang snapshot baru (satu assignment, atomik bagi thread lain); return snapshot lama"""
+        old = self._snapshot
+        self.__dict__['_snapshot'] = snapshot
+        return old
+
+    def __getattr__(self, name):
+        return getattr(self._snapshot, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._snapshot, name, value)
+
+
+# Singleton Instance (snapshot aktif diganti saat hot reload)
+recommender = RecommenderHandle(ChessRecommender())
\ No newline at end of file
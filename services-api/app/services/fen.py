@@ -0,0 +1,117 @@
+import time
+
+import chess
+
+from app.services import metrics
+from app.services.logs import logger
+
+# Cache opening moves -> FEN. Urutan langkah opening jumlahnya kecil & tetap, jadi cukup
+# dibatasi secara kasar agar input tak terduga tidak membuat cache tumbuh tanpa batas.
+_FEN_CACHE = {}
+FEN_CACHE_MAX_SIZE = 65536
+START_FEN = chess.Board().fen()
+_FEN_SECONDS = metrics.STAGE_SECONDS.labels("fen")
+_FEN_BATCH_SECONDS = metrics.STAGE_SECONDS.labels("fen_batch")
+
+
+def _tokens(moves_str):
+    """Langkah SAN dari string moves (nomor langkah seperti '1.' dan token kosong dilewati)"""
+    return [move for move in moves_str.split() if not move.endswith('.')]
+
+
+def _remember(moves_str, fen):
+    if len(_FEN_CACHE) < FEN_CACHE_MAX_SIZE:
+        _FEN_CACHE[moves_str] = fen
+
+
+def seed_fen_cache(pairs):
+    """Isi cache dari pasangan (moves, fen) yang sudah dihitung (mis. kolom bundle)"""
+    for moves_str, fen in pairs:
+        _remember(moves_str, fen)
+
+
+def fen_cache_size():
+    return len(_FEN_CACHE)
+
+
+def clear_fen_cache():
+    _FEN_CACHE.clear()
+
+
+def moves_to_fen(moves_str: str) -> str:
+    """Convert opening moves to FEN notation for board visualization"""
+    cached = _FEN_CACHE.get(moves_str)
+    if cached is not None:
+        return cached
+
+    start = time.perf_counter()
+    board = chess.Board()
+    try:
+        for move in _tokens(moves_str):
+            try:
+                board.push_san(move)
+            except Exception as e:
+                # Log error for debugging but continue
+                logger.warning("Failed to parse move '%s': %s", move, e)
+                # Return current board state (partial opening)
+                break
+        fen = board.fen()
+    except Exception as e:
+        # If any error, return starting position
+        logger.error("FEN error: %s", e)
+        return START_FEN
+    _remember(moves_str, fen)
+    _FEN_SECONDS.observe(time.perf_counter() - start)
+    return fen
+
+
+def moves_to_fen_batch(moves_list):
+    """
+    FEN untuk banyak string moves sekaligus -> dict {moves: fen}.
+
+    Semua urutan langkah dimasukkan ke trie lalu di-replay sekali secara depth-first
+    (push/pop), sehingga prefix bersama seperti "e4 c5 Nf3" hanya di-parse satu kali.
+    Hasil identik dengan memanggil moves_to_fen per string.
+    """
+    start = time.perf_counter()
+    results = {}
+    # Trie node: [children {san: node}, list string moves yang berakhir di node ini]
+    root = [{}, []]
+    for moves_str in dict.fromkeys(moves_list):
+        cached = _FEN_CACHE.get(moves_str)
+        if cached is not None:
+            results[moves_str] = cached
+            continue
+        node = root
+        for move in _tokens(moves_str):
+            node = node[0].setdefault(move, [{}, []])
+        node[1].append(moves_str)
+
+    board = chess.Board()
+
+    def collect(node, fen):
+        # Semua string di subtree ini berhenti di posisi `fen` (langkah berikutnya gagal di-parse)
+        for moves_str in node[1]:
+            results[moves_str] = fen
+        for child in node[0].values():
+            collect(child, fen)
+
+    def walk(node):
+        fen = board.fen() if node[1] else None
+        for moves_str in node[1]:
+            results[moves_str] = fen
+        for move, child in node[0].items():
+            try:
+                board.push_san(move)
+            except Exception as e:
+                logger.warning("Failed to parse move '%s': %s", move, e)
+                collect(child, fen or board.fen())
+                continue
+            walk(child)
+            board.pop()
+
+    walk(root)
+    for moves_str, fen in results.items():
+        _remember(moves_str, fen)
+    _FEN_BATCH_SECONDS.observe(time.perf_counter() - start)
+    return results
@@ -0,0 +1,188 @@
+"""
+Hybrid merge CB + CF di atas array NumPy.
+
+Kandidat setiap stage berupa tuple (ids, scores): id opening dari `OpeningVocabulary`
+dan skornya, dalam urutan keluaran stage (skor menurun). `blend` menggantikan logika
+pandas lama (outer merge + fillna, rank(pct=True), isin, sort_values, iterrows) dengan
+operasi array dan menghasilkan ranking yang identik. `reference_blend` adalah
+implementasi pandas lama, dipakai `check_parity` untuk membuktikan kesamaannya.
+
+Parity check (dari folder services-api):
+    python -m app.services.hybrid [--queries 500]   # kandidat asli dari model
+    python -m pytest -q tests/test_hybrid.py         # kandidat sintetis & pemilihan kandidat CB, termasuk nilai seri
+"""
+import numpy as np
+import pandas as pd
+
+from app.services.ranking import descending_order, percentile_rank
+
+NO_CANDIDATES = (np.empty(0, dtype=np.intp), np.empty(0))
+
+
+def _percentile_scale(scores):
+    """Percentile rank diskalakan ke [0.1, 1.0]; 0.1 untuk semua jika tidak ada skor positif"""
+    if scores.max() > 0:
+        return percentile_rank(scores) * 0.9 + 0.1
+    return np.full(len(scores), 0.1)
+
+
+def blend(cb, cf, favorite_ids, alpha, top_n, rank):
+    """
+    Gabungkan kandidat CB & CF menjadi hybrid score.
+
+    `rank` = OpeningVocabulary.rank (id -> posisi leksikografis). Return
+    (ids, hybrid_score, cb_score, cf_score) untuk top_n opening terurut menurun,
+    atau None jika kedua stage kosong.
+    """
+    cb_ids, cb_scores = cb
+    cf_ids, cf_scores = cf
+
+    if not len(cb_ids) and not len(cf_ids):
+        return None
+    elif not len(cb_ids):
+        ids = cf_ids
+        cf_col = cf_scores
+        cb_col = np.zeros(len(ids))
+        hybrid = (1 - alpha) * cf_col
+    elif not len(cf_ids):
+        ids = cb_ids
+        cb_col = cb_scores
+        cf_col = np.zeros(len(ids))
+        hybrid = alpha * cb_col
+    else:
+        # Outer merge: skor dense per id, opening yang tidak ada di satu stage bernilai 0
+        n = len(rank)
+        cb_dense = np.zeros(n)
+        cb_dense[cb_ids] = cb_scores
+        cf_dense = np.zeros(n)
+        cf_dense[cf_ids] = cf_scores
+        present = np.zeros(n, dtype=bool)
+        present[cb_ids] = True
+        present[cf_ids] = True
+        ids = np.flatnonzero(present)
+        # Urutan baris sama dengan hasil pd.merge(how='outer'): nama terurut leksikografis
+        ids = ids[np.argsort(rank[ids], kind='stable')]
+        cb_col = cb_dense[ids]
+        cf_col = cf_dense[ids]
+        # fillna(0)
+        cb_col[np.isnan(cb_col)] = 0
+        cf_col[np.isnan(cf_col)] = 0
+
+        # Percentile-based normalization agar distribusi CB & CF sebanding (alpha=0.5 benar-benar seimbang)
+        cb_col = _percentile_scale(cb_col)
+        cf_col = _percentile_scale(cf_col)
+
+        # alpha=1.0 → 100% CB, alpha=0.0 → 100% CF, alpha=0.5 → 50/50
+        hybrid = (alpha * cb_col) + ((1 - alpha) * cf_col)
+
+        # Normalisasi ulang hybrid_score ke [0, 1] agar maksimum 100%
+        hs_max = hybrid.max()
+        hs_min = hybrid.min()
+        if hs_max > hs_min:
+            hybrid = (hybrid - hs_min) / (hs_max - hs_min)
+
+    # Filter favorit, lalu top_n
+    keep = ~np.isin(ids, favorite_ids)
+    ids, hybrid, cb_col, cf_col = ids[keep], hybrid[keep], cb_col[keep], cf_col[keep]
+    top = descending_order(hybrid)[:top_n]
+    return ids[top], hybrid[top], cb_col[top], cf_col[top]
+
+
+def reference_blend(cb_recs, cf_recs, favorite_openings, alpha, top_n):
+    """Implementasi pandas lama (acuan parity): DataFrame top_n dengan hybrid/cb/cf score"""
+    if not cb_recs.empty:
+        cb_recs = cb_recs.rename(columns={'similarity_score': 'cb_score'})
+    if not cf_recs.empty:
+        cf_recs = cf_recs.rename(columns={'score': 'cf_score'})
+
+    if cb_recs.empty and cf_recs.empty:
+        return None
+    elif cb_recs.empty:
+        hybrid = cf_recs
+        hybrid['cb_score'] = 0
+        hybrid['hybrid_score'] = (1 - alpha) * hybrid['cf_score']
+    elif cf_recs.empty:
+        hybrid = cb_recs
+        hybrid['cf_score'] = 0
+        hybrid['hybrid_score'] = alpha * hybrid['cb_score']
+    else:
+        hybrid = pd.merge(cb_recs, cf_recs, on='opening_name', how='outer').fillna(0)
+        for col in ['cb_score', 'cf_score']:
+            if hybrid[col].max() > 0:
+                ranked = hybrid[col].rank(method='average', pct=True)
+                hybrid[col] = ranked * 0.9 + 0.1
+            else:
+                hybrid[col] = 0.1
+        hybrid['hybrid_score'] = (alpha * hybrid['cb_score']) + ((1 - alpha) * hybrid['cf_score'])
+        hs_max = hybrid['hybrid_score'].max()
+        hs_min = hybrid['hybrid_score'].min()
+        if hs_max > hs_min:
+            hybrid['hybrid_score'] = (hybrid['hybrid_score'] - hs_min) / (hs_max - hs_min)
+
+    hybrid = hybrid[~hybrid.opening_name.isin(favorite_openings)]
+    return hybrid.sort_values('hybrid_score', ascending=False).head(top_n)
+
+
+def _frame(candidates, names, score_column):
+    ids, scores = candidates
+    if not len(ids):
+        return pd.DataFrame()
+    return pd.DataFrame({'opening_name': [names[i] for i in ids], score_column: scores})
+
+
+def check_parity(recommender, n_queries=500, seed=0):
+    """
+    Bandingkan `blend` dengan `reference_blend` pada kandidat CB/CF asli dari recommender,
+    ditambah versi dengan skor dibulatkan (banyak nilai seri) dan stage kosong.
+    Hanya merge yang diuji: kandidat dipakai apa adanya. Pemilihan kandidat CB terhadap
+    jalur pandas lama diuji di tests/test_hybrid.py. Return (jumlah kasus, jumlah kasus yang berbeda).
+    """
+    rng = np.random.default_rng(seed)
+    vocab = recommender._vocab
+    openings = recommender.opening_names()
+    cases = mismatches = 0
+    for _ in range(n_queries):
+        rating = int(rng.integers(600, 2900))
+        favorites = list(rng.choice(openings, size=int(rng.integers(0, 4)), replace=False)) if openings else []
+        alpha = float(rng.choice([round(rng.random(), 2), round(float(rng.integers(0, 11)) / 10, 1)]))
+        top_n = int(rng.integers(1, 21))
+        cb = recommender._get_content_based(favorites)
+        cf = recommender._get_collaborative(rating)
+        rounded_cb = (cb[0], np.round(cb[1], 1))
+        rounded_cf = (cf[0], np.round(cf[1], 1))
+        for cb_case, cf_case in ((cb, cf), (rounded_cb, rounded_cf), (cb, NO_CANDIDATES), (NO_CANDIDATES, cf)):
+            cases += 1
+            actual = blend(cb_case, cf_case, vocab.lookup(favorites), alpha, top_n, vocab.rank)
+            expected = reference_blend(
+                _frame(cb_case, vocab.names, 'similarity_score'),
+                _frame(cf_case, vocab.names, 'score'),
+                favorites, alpha, top_n
+            )
+            if actual is None or expected is None:
+                mismatches += (actual is None) != (expected is None)
+                continue
+            ids, hybrid, cb_col, cf_col = actual
+            same = (
+                [vocab.names[i] for i in ids] == expected['opening_name'].tolist()
+                and np.array_equal(hybrid, expected['hybrid_score'].to_numpy(dtype=np.float64))
+                and np.array_equal(cb_col, expected['cb_score'].to_numpy(dtype=np.float64))
+                and np.array_equal(cf_col, expected['cf_score'].to_numpy(dtype=np.float64))
+            )
+            mismatches += not same
+    return cases, mismatches
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.services.engine import recommender
+
+    parser = argparse.ArgumentParser(description="Check the vectorized hybrid merge against the pandas implementation")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    recommender.load_resources()
+    cases, mismatches = check_parity(recommender, args.queries, args.seed)
+    if mismatches:
+        raise SystemExit(f"❌ Hybrid parity check failed: {mismatches}/{cases} cases differ")
+    print(f"✅ Hybrid parity check passed: {cases} cases identical (names, order & scores)")
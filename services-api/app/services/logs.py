@@ -0,0 +1,26 @@
+"""
+Logging untuk hot path (per request): leveled via LOG_LEVEL dan di-sample via LOG_SAMPLE_RATE,
+sehingga log seperti cache hit tidak menjadi beban sendiri saat traffic tinggi.
+Log startup/loading tetap memakai print seperti sebelumnya.
+"""
+import logging
+import random
+
+from app.config import settings
+
+logger = logging.getLogger("chessrecs")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+logger.setLevel(settings.LOG_LEVEL.upper())
+
+
+def log_sampled(level, message, *args, rate=None):
+    """Log sebagian kecil event saja (rate 0..1, default settings.LOG_SAMPLE_RATE)"""
+    if not logger.isEnabledFor(level):
+        return
+    rate = settings.LOG_SAMPLE_RATE if rate is None else rate
+    if rate >= 1 or random.random() < rate:
+        logger.log(level, message, *args)
@@ -0,0 +1,228 @@
+"""
+Metrics in-process (counter, gauge, histogram) dengan output format teks Prometheus.
+
+Implementasi minimal tanpa dependency: setiap observasi hanya berupa bisect + penjumlahan
+di bawah lock per seri, sehingga aman dipanggil di hot path. `render()` dipakai oleh
+endpoint /metrics.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+_REGISTRY = []
+
+# Bucket latency (detik): stage engine berada di kisaran puluhan mikrodetik - ratusan milidetik
+STAGE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def labels(self, *values, **kwargs):
+        """Seri untuk kombinasi label tertentu (dibuat saat pertama dipakai)"""
+        key = tuple(str(v) for v in values) if values else tuple(str(kwargs[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._children.items())
+        for key, child in items:
+            yield from child.samples(self.name, self.labelnames, key)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self._value += amount
+
+    def set_total(self, value):
+        """Salin nilai counter yang dihitung di tempat lain (mis. statistik TTLCache)"""
+        self._value = float(value)
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self, name, labelnames, key):
+        yield f"{name}{_format_labels(labelnames, key)} {_format_value(self._value)}"
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value):
+        self._value = float(value)
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def samples(self, name, labelnames, key):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        for bound, count in zip(self._bounds + (float("inf"),), counts):
+            cumulative += count
+            yield f"{name}_bucket{_format_labels(labelnames, key, [('le', _format_value(bound))])} {cumulative}"
+        yield f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}"
+        yield f"{name}_count{_format_labels(labelnames, key)} {cumulative}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+def render():
+    """Semua metric dalam format teks Prometheus (text/plain; version=0.0.4)"""
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
+
+
+# --- Metrics service ---------------------------------------------------------
+
+STAGE_SECONDS = Histogram(
+    "chessrecs_stage_seconds", "Latency per engine stage", ["stage"]
+)
+CF_CACHE_REQUESTS = Counter(
+    "chessrecs_cf_cache_requests_total", "CF bucket score lookups by rating bucket and result", ["bucket", "result"]
+)
+CF_BATCH_BUCKETS = Histogram(
+    "chessrecs_cf_batch_buckets", "Rating buckets computed per CF inference", buckets=(1, 2, 3, 4, 6, 8, 11)
+)
+CF_BATCH_REQUESTS = Histogram(
+    "chessrecs_cf_batch_requests", "Requests served per micro-batched CF inference", buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+CF_QUEUE_DEPTH = Gauge(
+    "chessrecs_cf_queue_depth", "Requests waiting for micro-batched CF scores"
+)
+CF_SHED = Counter(
+    "chessrecs_cf_shed_total", "Requests that did not get CF scores within their budget, by reason", ["reason"]
+)
+PREDICT_DEGRADED = Counter(
+    "chessrecs_predict_degraded_total", "/predict responses served without CF scores, by mode and reason",
+    ["mode", "reason"]
+)
+MODEL_LOAD_SECONDS = Gauge(
+    "chessrecs_model_load_seconds", "Duration of each model-load phase", ["phase"]
+)
+MODEL_RELOADS = Counter(
+    "chessrecs_model_reloads_total", "Hot model reloads by result", ["result"]
+)
+MODEL_STAGE_READY = Gauge(
+    "chessrecs_model_stage_ready", "1 if the model-load stage is ready", ["stage"]
+)
+RESULT_CACHE_EVENTS = Counter(
+    "chessrecs_result_cache_events_total", "/predict result cache events", ["event"]
+)
+RESULT_CACHE_SIZE = Gauge(
+    "chessrecs_result_cache_entries", "Entries in the /predict result cache"
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "chessrecs_http_requests_in_flight", "HTTP requests currently being served", ["endpoint"]
+)
+REQUEST_SECONDS = Histogram(
+    "chessrecs_http_request_seconds", "HTTP request latency", ["endpoint", "method"], buckets=REQUEST_BUCKETS
+)
+REQUESTS = Counter(
+    "chessrecs_http_requests_total", "HTTP requests by endpoint and status code", ["endpoint", "method", "status"]
+)
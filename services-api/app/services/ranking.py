@@ -0,0 +1,49 @@
+import numpy as np
+
+
+def top_n_indices(scores, n):
+    """
+    Index dari n skor tertinggi, terurut menurun: `descending_order(scores)[:n]`, identik
+    dengan pandas `sort_values(ascending=False).head(n)` (quicksort tidak stabil) termasuk
+    urutan nilai seri.
+
+    Tidak memakai argpartition sebagai pre-filter: urutan nilai seri dari quicksort
+    bergantung pada seluruh array, jadi mengurutkan subset kandidat saja bisa memberi
+    opening atau urutan yang berbeda dari pandas.
+    """
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    return descending_order(scores)[:n]
+
+
+def descending_order(values):
+    """
+    Index yang mengurutkan `values` menurun, identik dengan pandas
+    `sort_values(ascending=False)` (quicksort tidak stabil): urutan nilai seri sama
+    persis dan NaN diletakkan di akhir.
+    """
+    values = np.asarray(values)
+    mask = np.isnan(values)
+    idx = np.arange(len(values))
+    # Trik yang sama dengan pandas nargsort: argsort ascending atas array terbalik, lalu dibalik lagi
+    non_nans = values[~mask][::-1]
+    non_nan_idx = idx[~mask][::-1]
+    indexer = non_nan_idx[non_nans.argsort(kind='quicksort')][::-1]
+    return np.concatenate([indexer, np.flatnonzero(mask)])
+
+
+def percentile_rank(values):
+    """Setara pandas `rank(method='average', pct=True)` untuk array tanpa NaN"""
+    values = np.asarray(values)
+    n = len(values)
+    if n == 0:
+        return np.empty(0)
+    order = np.argsort(values, kind='mergesort')
+    sorted_values = values[order]
+    starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+    ends = np.r_[starts[1:], n]
+    # Rata-rata rank (1-based) dalam satu grup seri = (awal + akhir) / 2, eksak di float64
+    average = (starts + 1 + ends) / 2
+    ranks = np.empty(n)
+    ranks[order] = np.repeat(average, ends - starts)
+    return ranks / n
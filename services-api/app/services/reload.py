@@ -0,0 +1,216 @@
+"""
+Hot reload model tanpa downtime.
+
+Reload membangun snapshot ChessRecommender baru secara penuh di background thread:
+data, CB, CF, index, CF scores untuk semua rating bucket, dan result cache yang
+dihangatkan dengan request terbaru dari snapshot lama. Setelah lengkap, snapshot ditukar
+dengan satu assignment (RecommenderHandle.swap). Request yang sedang berjalan selesai
+di snapshot lama, yang dilepas setelah referensi terakhirnya hilang. Jika snapshot baru
+gagal dimuat, snapshot lama tetap dipakai.
+
+Dipicu lewat POST /admin/reload atau mode watch (MODEL_WATCH_INTERVAL > 0): mtime & ukuran
+file model dipantau dan reload dijalankan setelah perubahan stabil selama satu interval.
+Jika hanya checkpoint statistik opening (STATS_PATH) yang berubah (atau game baru masuk lewat
+/admin/ingest), statistik tersebut dipasang lewat salinan snapshot aktif tanpa reload model
+(ChessRecommender.with_opening_stats), di bawah lock yang sama dengan reload.
+Pada `python -m app.server`, setiap worker me-reload snapshot-nya sendiri.
+"""
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+
+from app.config import settings
+from app.services import metrics
+from app.services.bundle import MANIFEST_NAME
+from app.services.engine import ChessRecommender, recommender
+from app.services.logs import logger
+from app.services.stats import OpeningStats
+
+
+def _model_paths():
+    return [
+        settings.DATA_PATH,
+        settings.CONTENT_MODEL_PATH,
+        settings.CB_MATRIX_PATH,
+        settings.CB_VECTORS_PATH,
+        settings.COLLAB_MODEL_PATH,
+        settings.COLLAB_DATA_PATH,
+        settings.CF_NUMPY_MODEL_PATH,
+        settings.CF_BUCKETS_PATH,
+        Path(settings.BUNDLE_PATH) / MANIFEST_NAME,
+    ]
+
+
+def _stats_paths():
+    return [settings.STATS_PATH, Path(settings.STATS_PATH).with_suffix('.json')]
+
+
+def files_signature(paths):
+    """(path, size, mtime) file-file `paths`; berubah jika ada file yang ditulis ulang"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((str(path), stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append((str(path), None, None))
+    return tuple(signature)
+
+
+class ModelReloader:
+    """Membangun & menukar snapshot model untuk `handle` (RecommenderHandle)."""
+
+    def __init__(self, handle):
+        self._handle = handle
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._signatures = {}
+        self.state = "idle"
+        self.reloads = 0
+        self.last_error = None
+        self.last_reload = None
+
+    def status(self):
+        snapshot = self._handle.snapshot
+        return {
+            "state": "loading" if self._reload_lock.locked() else self.state,
+            "data_version": snapshot.data_version,
+            "reloads": self.reloads,
+            "last_reload": self.last_reload,
+            "last_error": self.last_error,
+            "watching": self._watcher is not None and self._watcher.is_alive(),
+        }
+
+    def start(self, reason="api"):
+        """Jalankan reload di background thread; return False jika reload lain sedang berjalan"""
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, args=(reason,), name="model-reload", daemon=True).start()
+        return True
+
+    def reload(self, reason="api", blocking=False):
+        """
+        Bangun snapshot baru lalu tukar. Return True jika snapshot baru terpasang.
+        Tanpa `blocking`, return False langsung jika reload lain sedang berjalan.
+        """
+        if not self._reload_lock.acquire(blocking=blocking):
+            return False
+        try:
+            start = time.perf_counter()
+            signatures = {"models": files_signature(_model_paths()), "stats": files_signature(_stats_paths())}
+            old = self._handle.snapshot
+            logger.info("Reloading models (%s)", reason)
+            try:
+                snapshot = self.build_snapshot(old)
+            except Exception as e:
+                # File yang sama tidak dicoba ulang oleh watcher; perubahan berikutnya memicu reload lagi
+                self._signatures = signatures
+                self.state = "failed"
+                self.last_error = str(e)
+                metrics.MODEL_RELOADS.labels("failed").inc()
+                logger.error("Model reload failed, keeping snapshot %s: %s", old.data_version, e)
+                return False
+
+            self._handle.swap(snapshot)
+            self._signatures = signatures
+            weakref.finalize(old, logger.info, "Released model snapshot %s", old.data_version)
+            elapsed = round(time.perf_counter() - start, 4)
+            self.state = "idle"
+            self.last_error = None
+            self.reloads += 1
+            self.last_reload = {
+                "reason": reason,
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "seconds": elapsed,
+                "previous_data_version": old.data_version,
+                "data_version": snapshot.data_version,
+            }
+            metrics.MODEL_RELOADS.labels("success").inc()
+            metrics.MODEL_LOAD_SECONDS.labels("reload").set(elapsed)
+            logger.info("Swapped model snapshot %s -> %s in %.2fs", old.data_version, snapshot.data_version, elapsed)
+            return True
+        finally:
+            self._reload_lock.release()
+
+    @staticmethod
+    def build_snapshot(old):
+        """Snapshot baru yang siap melayani tanpa cold start, atau exception jika tidak lengkap"""
+        snapshot = ChessRecommender()
+        snapshot.load_resources()
+        if not snapshot.is_ready:
+            raise RuntimeError("data/content-based model failed to load")
+        if old.cf_ready and not snapshot.cf_ready:
+            raise RuntimeError("collaborative model failed to load")
+        if snapshot.cf_ready:
+            snapshot.precompute_cf_buckets()
+        # Request terbaru dari snapshot lama kemungkinan besar datang lagi
+        keys = old._result_cache.keys()[-settings.RELOAD_WARM_QUERIES:] if settings.RELOAD_WARM_QUERIES > 0 else []
+        snapshot.warm_result_cache(keys)
+        return snapshot
+
+    def apply_stats(self, stats):
+        """
+        Pasang statistik opening lewat salinan snapshot aktif lalu tukar (tanpa reload model).
+        Memakai lock reload, jadi tidak tertimpa reload yang sedang berjalan. Return snapshot baru.
+
+        Checkpoint di STATS_PATH dianggap sudah berisi `stats` (disimpan sebelum dipanggil), jadi
+        signature-nya dicatat agar mode watch tidak memasang checkpoint yang sama sekali lagi.
+        """
+        with self._reload_lock:
+            old = self._handle.snapshot
+            snapshot = old.with_opening_stats(stats)
+            self._handle.swap(snapshot)
+            self._signatures["stats"] = files_signature(_stats_paths())
+        logger.info("Applied opening stats (%s games): snapshot %s -> %s",
+                    stats.games_ingested, old.data_version, snapshot.data_version)
+        return snapshot
+
+    def refresh_stats(self):
+        """Terapkan checkpoint statistik opening terbaru (tanpa reload model)"""
+        stats = OpeningStats.load(settings.STATS_PATH)
+        if stats is None:
+            return False
+        self.apply_stats(stats)
+        return True
+
+    def watch(self, interval):
+        """Pantau file model setiap `interval` detik di background thread"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._signatures = {"models": files_signature(_model_paths()), "stats": files_signature(_stats_paths())}
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watch", daemon=True)
+        self._watcher.start()
+        logger.info("Watching model files for changes every %ss", interval)
+
+    def _watch(self, interval):
+        actions = {
+            # Menunggu reload / penerapan statistik lain selesai agar perubahan tidak terlewat
+            "models": (_model_paths, lambda: self.reload("watch", blocking=True)),
+            "stats": (_stats_paths, self.refresh_stats),
+        }
+        pending = dict.fromkeys(actions)
+        while not self._stop.wait(interval):
+            for group, (paths, action) in actions.items():
+                current = files_signature(paths())
+                if current == self._signatures.get(group):
+                    pending[group] = None
+                elif current != pending[group]:
+                    # Tunggu satu interval lagi: file mungkin masih sedang ditulis
+                    pending[group] = current
+                else:
+                    pending[group] = None
+                    self._signatures[group] = current
+                    try:
+                        action()
+                    except Exception as e:
+                        logger.error("Watch action for %s failed: %s", group, e)
+
+    def stop(self):
+        self._stop.set()
+
+
+reloader = ModelReloader(recommender)
@@ -0,0 +1,405 @@
+"""
+Statistik per opening yang bisa di-update secara incremental.
+
+Counter per opening (hasil white/black/draw/lainnya, jumlah & banyaknya rating pemain,
+jumlah play = pasangan (pemain, opening) unik) disimpan sebagai matrix int64, sehingga game baru cukup ditambahkan per
+chunk dalam O(ukuran chunk) tanpa membaca ulang seluruh games.csv. Dari counter ini
+diturunkan nilai yang dipakai service:
+
+    games, win_rate_*  -> sama persis dengan crosstab(opening_name, winner) di games.csv
+    delta()            -> counter game yang masuk setelah baseline (rating & play baru), dipakai
+                          engine untuk menggeser complexity & popularity dari file model
+
+Baseline = counter saat bootstrap, yaitu game yang sudah tercermin di file model. Tanpa game
+baru, delta() nol sehingga complexity & popularity tetap persis nilai dari file model.
+
+Checkpoint = `opening_stats.npy` (counter & baseline) + `opening_stats.pairs.npy` (hash pasangan
+(pemain, opening) yang sudah dihitung) + `opening_stats.json` (nama, metadata opening, offset
+byte per file sumber). File sumber diasumsikan append-only: ingest berikutnya
+melanjutkan dari offset terakhir, dan baris terakhir yang belum lengkap ditunda.
+
+Usage (offline, dari folder services-api):
+    python -m app.services.stats games.csv                  # bootstrap dari corpus penuh (= baseline)
+    python -m app.services.stats new_games.ndjson           # tambahkan game baru
+"""
+import copy
+import hashlib
+import io
+import itertools
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CHECKPOINT_VERSION = 3
+COUNTERS = ("white", "black", "draw", "other", "rating_sum", "rating_count", "plays")
+COLUMNS = ["id", "winner", "white_id", "white_rating", "black_id", "black_rating",
+           "opening_name", "moves", "opening_ply"]
+# Tipe hemat memori: nama opening & winner sebagai kategori (int-coded per chunk)
+DTYPES = {
+    "id": "string",
+    "winner": "category",
+    "white_id": "string",
+    "white_rating": "float32",
+    "black_id": "string",
+    "black_rating": "float32",
+    "opening_name": "category",
+    "moves": "string",
+    "opening_ply": "Int16",
+}
+CHUNK_ROWS = 50000
+
+_COL = {name: i for i, name in enumerate(COUNTERS)}
+_RESULTS = ("white", "black", "draw")
+
+
+def opening_archetype(name):
+    """Nama family opening ("Sicilian Defense: Najdorf" -> "Sicilian Defense")"""
+    return name.split(":")[0].split("|")[0].split("#")[0].strip()
+
+
+def opening_moves(moves, ply):
+    """`ply` langkah pertama dari string moves game ("" jika opening_ply kosong)"""
+    if pd.isna(ply):
+        return ""
+    return ' '.join(moves.split(" ")[:int(ply)])
+
+
+def opening_moves_batch(moves, ply):
+    """opening_moves() untuk Series sekaligus: string slicing per nilai ply (jumlah ply unik kecil)"""
+    moves = moves.astype(object)
+    # opening_ply kosong (NA) -> 0 ply -> "", sama seperti opening_moves()
+    ply = pd.to_numeric(ply, errors='coerce').fillna(0).astype("int64").to_numpy()
+    result = pd.Series("", index=moves.index, dtype=object)
+    for p in np.unique(ply):
+        if p <= 0:
+            continue
+        rows = ply == p
+        # split maksimal p kali lalu ambil p token pertama == split penuh lalu [:p]
+        result[rows] = moves[rows].str.split(" ", n=int(p)).str[:int(p)].str.join(" ")
+    return result
+
+
+class _SeenIds:
+    """
+    Hash id game yang sudah dipakai (sorted uint64) untuk dedupe antar chunk, seperti
+    drop_duplicates(subset=['id']) pada seluruh file. Memori tumbuh 8 byte per game unik
+    (O(jumlah game), ~8 MB per 1 juta game), bukan dibatasi ukuran chunk.
+    Dipakai juga untuk pasangan (pemain, opening) yang sudah pernah dihitung sebagai play.
+    """
+
+    def __init__(self, hashes=None):
+        self._hashes = np.empty(0, dtype=np.uint64) if hashes is None else np.asarray(hashes, dtype=np.uint64)
+
+    @property
+    def hashes(self):
+        return self._hashes
+
+    def first_seen(self, ids):
+        """Mask baris yang id-nya belum pernah muncul (kemunculan pertama dalam chunk dipertahankan)"""
+        hashes = pd.util.hash_array(ids.astype(str).to_numpy(dtype=object))
+        first = ~pd.Series(hashes).duplicated().to_numpy()
+        pos = np.searchsorted(self._hashes, hashes)
+        known = pos < len(self._hashes)
+        known[known] = self._hashes[pos[known]] == hashes[known]
+        first &= ~known
+        # Gabungan dua run terurut: timsort ('stable') cukup linear
+        self._hashes = np.sort(np.concatenate([self._hashes, hashes[first]]), kind='stable')
+        return first
+
+
+def _manifest_path(path):
+    return Path(path).with_suffix('.json')
+
+
+def _pairs_path(path):
+    return Path(path).with_suffix('.pairs.npy')
+
+
+class OpeningStats:
+    """Counter per opening (append-only vocabulary) + offset ingest per file sumber."""
+
+    def __init__(self):
+        self.names = []
+        self.archetypes = []
+        self.moves = []
+        self._ids = {}
+        self._counts = np.zeros((0, len(COUNTERS)), dtype=np.int64)
+        self._baseline = np.zeros((0, len(COUNTERS)), dtype=np.int64)
+        self._pairs = _SeenIds()  # pasangan (pemain, opening) yang sudah dihitung di "plays"
+        self.sources = {}  # path file sumber -> offset byte yang sudah di-ingest
+        self.games_ingested = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def counts(self):
+        """Matrix counter (opening x COUNTERS) tanpa kapasitas cadangan"""
+        return self._counts[:len(self.names)]
+
+    def copy(self):
+        """Salinan independen (ingest ke salinan tidak mengubah statistik yang sedang dipakai)"""
+        return copy.deepcopy(self)
+
+    @property
+    def baseline(self):
+        """Counter saat bootstrap (opening yang ditambahkan sesudahnya: nol)"""
+        baseline = np.zeros_like(self.counts)
+        baseline[:len(self._baseline)] = self._baseline
+        return baseline
+
+    def mark_baseline(self):
+        """Tandai counter saat ini sebagai sudah tercermin di file model (setelah bootstrap)"""
+        self._baseline = self.counts.copy()
+
+    def delta(self):
+        """DataFrame counter (kolom COUNTERS) per opening untuk game setelah baseline"""
+        return pd.DataFrame(self.counts - self.baseline, columns=list(COUNTERS),
+                            index=pd.Index(self.names, name="opening_name"))
+
+    def fingerprint(self):
+        """Hash pendek isi checkpoint (nama, counter, baseline) untuk data_version"""
+        h = hashlib.sha256(json.dumps(self.names).encode())
+        h.update(np.ascontiguousarray(self.counts).tobytes())
+        h.update(np.ascontiguousarray(self.baseline).tobytes())
+        return h.hexdigest()[:16]
+
+    def _ensure(self, first_rows):
+        """Tambahkan opening baru (metadata dari game pertama di `first_rows`) ke vocabulary"""
+        names = first_rows['opening_name'].astype(object).tolist()
+        moves = opening_moves_batch(first_rows['moves'], first_rows['opening_ply']).tolist()
+        for name, opening in zip(names, moves):
+            self._ids[name] = len(self.names)
+            self.names.append(name)
+            self.archetypes.append(opening_archetype(name))
+            self.moves.append(opening)
+        if len(self.names) > len(self._counts):
+            # Kapasitas digandakan agar penambahan opening tetap amortized O(1)
+            grown = np.zeros((max(len(self.names), 2 * len(self._counts)), len(COUNTERS)), dtype=np.int64)
+            grown[:len(self._counts)] = self._counts
+            self._counts = grown
+
+    def update(self, games):
+        """Tambahkan satu chunk game (DataFrame dengan kolom COLUMNS). Return jumlah game dipakai."""
+        games = games.dropna(subset=['opening_name'])
+        if games.empty:
+            return 0
+        new = ~games['opening_name'].isin(self._ids.keys())
+        if new.any():
+            self._ensure(games[new].drop_duplicates(subset=['opening_name'], keep='first'))
+
+        # Untuk kolom kategori, map hanya dijalankan per kategori (bukan per baris)
+        ids = games['opening_name'].map(self._ids).to_numpy(dtype=np.int64)
+        n = len(self.names)
+        counts = self._counts
+
+        def add(col, values=None):
+            counts[:n, _COL[col]] += np.bincount(ids, weights=values, minlength=n).astype(np.int64)
+
+        # Hasil: seperti crosstab, game tanpa winner tidak dihitung
+        winner = games['winner']
+        for result in _RESULTS:
+            add(result, (winner == result).to_numpy(dtype=np.float64))
+        add("other", (winner.notna() & ~winner.isin(_RESULTS)).to_numpy(dtype=np.float64))
+
+        for side in ("white_rating", "black_rating"):
+            rating = pd.to_numeric(games[side], errors='coerce')
+            add("rating_sum", rating.fillna(0).to_numpy(dtype=np.float64))
+            add("rating_count", rating.notna().to_numpy(dtype=np.float64))
+        # Popularity di file model = banyaknya pasangan (pemain, opening) unik
+        # (groupby player_opening_matrix), bukan banyaknya game: play hanya dihitung
+        # untuk pasangan yang belum pernah muncul
+        players = pd.concat([games['white_id'], games['black_id']], ignore_index=True)
+        openings = pd.concat([games['opening_name'], games['opening_name']], ignore_index=True)
+        valid = players.notna().to_numpy()
+        keys = players[valid].astype(object) + "\x1f" + openings[valid].astype(object)
+        pair_ids = np.concatenate([ids, ids])[valid]
+        first = self._pairs.first_seen(keys)
+        counts[:n, _COL["plays"]] += np.bincount(pair_ids[first], minlength=n)
+
+        self.games_ingested += len(ids)
+        return len(ids)
+
+    def table(self):
+        """DataFrame per opening: metadata, games & win rates"""
+        counts = self.counts
+        results = counts[:, [_COL[c] for c in ("white", "black", "draw", "other")]]
+        games = results.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            win_rates = {c: counts[:, _COL[c]] / games for c in _RESULTS}
+        return pd.DataFrame({
+            "archetype": self.archetypes,
+            "moves": self.moves,
+            "games": games,
+            "win_rate_white": win_rates["white"],
+            "win_rate_black": win_rates["black"],
+            "win_rate_draw": win_rates["draw"],
+        }, index=pd.Index(self.names, name="opening_name"))
+
+    # --- Ingest file (CSV / NDJSON append-only) ---
+
+    def ingest(self, path, chunk_rows=CHUNK_ROWS):
+        """
+        Ingest game baru dari `path` mulai offset terakhir, per chunk `chunk_rows` baris.
+        Game dengan id yang sama di-dedupe dalam satu ingest. Return jumlah game dipakai.
+        """
+        key = str(Path(path).resolve())
+        seen = _SeenIds()
+        total = 0
+        for chunk, offset in read_game_chunks(path, self.sources.get(key, 0), chunk_rows):
+            total += self.update(chunk[seen.first_seen(chunk['id'])])
+            self.sources[key] = offset
+        return total
+
+    @classmethod
+    def from_csv(cls, path, chunk_rows=CHUNK_ROWS):
+        """
+        Agregasi games.csv secara streaming (pd.read_csv per chunk, hanya kolom COLUMNS).
+        Memori puncak ~ 1 chunk + counter per opening + 8 byte per game (dedupe id, O(jumlah game))
+        + 8 byte per pasangan (pemain, opening) unik.
+        """
+        stats = cls()
+        seen = _SeenIds()
+        for chunk in pd.read_csv(path, usecols=COLUMNS, dtype=DTYPES, chunksize=chunk_rows):
+            stats.update(chunk[seen.first_seen(chunk['id'])])
+        return stats
+
+    # --- Checkpoint ---
+
+    def save(self, path):
+        """Tulis checkpoint (.npy + .pairs.npy + manifest .json) secara atomik"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.stem + ".tmp.npy")
+        np.save(tmp, np.stack([self.counts, self.baseline]))
+        np.save(_pairs_path(tmp), self._pairs.hashes)
+        manifest = {
+            "version": CHECKPOINT_VERSION,
+            "counters": list(COUNTERS),
+            "names": self.names,
+            "archetypes": self.archetypes,
+            "moves": self.moves,
+            "sources": self.sources,
+            "games_ingested": self.games_ingested,
+        }
+        tmp_manifest = _manifest_path(tmp)
+        tmp_manifest.write_text(json.dumps(manifest))
+        os.replace(_pairs_path(tmp), _pairs_path(path))
+        os.replace(tmp, path)
+        os.replace(tmp_manifest, _manifest_path(path))
+        return manifest
+
+    @classmethod
+    def load(cls, path):
+        """Baca checkpoint; return None jika tidak ada atau versinya berbeda"""
+        path = Path(path)
+        manifest_path = _manifest_path(path)
+        if not path.is_file() or not manifest_path.is_file() or not _pairs_path(path).is_file():
+            return None
+        manifest = json.loads(manifest_path.read_text())
+        if manifest.get("version") != CHECKPOINT_VERSION or manifest.get("counters") != list(COUNTERS):
+            print(f"⚠️ Opening stats checkpoint {path} has an incompatible format; ignoring")
+            return None
+        stats = cls()
+        stats.names = manifest["names"]
+        stats.archetypes = manifest["archetypes"]
+        stats.moves = manifest["moves"]
+        stats._ids = {name: i for i, name in enumerate(stats.names)}
+        stats._counts, stats._baseline = np.load(path).astype(np.int64)
+        stats._pairs = _SeenIds(np.load(_pairs_path(path)))
+        stats.sources = manifest["sources"]
+        stats.games_ingested = manifest["games_ingested"]
+        return stats
+
+
+def _parse_chunk(lines, header, ndjson):
+    if ndjson:
+        frame = pd.read_json(io.BytesIO(b"".join(lines)), lines=True, dtype=False)
+    else:
+        frame = pd.read_csv(io.BytesIO(header + b"".join(lines)), usecols=lambda c: c in COLUMNS)
+    missing = [c for c in COLUMNS if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Games are missing columns: {missing}")
+    return frame[COLUMNS].astype(DTYPES)
+
+
+async def parse_game_stream(body, ndjson=True, chunk_rows=CHUNK_ROWS):
+    """Yield DataFrame chunk dari aliran bytes async (mis. body request HTTP): NDJSON atau CSV ber-header"""
+    header = b""
+    lines = []
+    buffer = b""
+    async for data in body:
+        buffer += data
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            if not ndjson and not header:
+                header = line + b"\n"
+            elif line.strip():
+                lines.append(line + b"\n")
+            if len(lines) >= chunk_rows:
+                yield _parse_chunk(lines, header, ndjson)
+                lines = []
+    if buffer.strip() and (ndjson or header):
+        lines.append(buffer + b"\n")
+    if lines:
+        yield _parse_chunk(lines, header, ndjson)
+
+
+def read_game_chunks(path, offset=0, chunk_rows=CHUNK_ROWS):
+    """
+    Yield (DataFrame chunk, offset byte setelah chunk) dari CSV atau NDJSON (.ndjson/.jsonl).
+    Hanya baris lengkap (diakhiri newline) yang dibaca; satu game per baris.
+    """
+    path = Path(path)
+    ndjson = path.suffix in (".ndjson", ".jsonl")
+    with open(path, 'rb') as f:
+        if offset > os.fstat(f.fileno()).st_size:
+            raise ValueError(f"{path} is shorter than the ingested offset {offset}; sources must be append-only")
+        header = b"" if ndjson else f.readline()
+        offset = max(offset, len(header))
+        f.seek(offset)
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if lines and not lines[-1].endswith(b"\n"):
+                # Baris terakhir belum lengkap (file masih ditulis): dibaca pada ingest berikutnya
+                lines.pop()
+                done = True
+            else:
+                done = len(lines) < chunk_rows
+            offset += sum(map(len, lines))
+            rows = [line for line in lines if line.strip()]
+            if rows:
+                yield _parse_chunk(rows, header, ndjson), offset
+            if done:
+                return
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="Ingest games (CSV / NDJSON) into the incremental opening stats checkpoint")
+    parser.add_argument("files", nargs="+", help="append-only games files; re-running continues from the last offset")
+    parser.add_argument("--checkpoint", default=str(settings.STATS_PATH))
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--no-baseline", action="store_true",
+                        help="new checkpoint: count these games as new (not already in the model files)")
+    args = parser.parse_args()
+
+    stats = OpeningStats.load(args.checkpoint)
+    # Checkpoint baru = bootstrap dari corpus training: game-nya sudah tercermin di file model
+    bootstrap = stats is None and not args.no_baseline
+    stats = stats or OpeningStats()
+    for file in args.files:
+        start = time.perf_counter()
+        n_games = stats.ingest(file, args.chunk_rows)
+        if bootstrap:
+            stats.mark_baseline()
+        # Checkpoint per file: jika ingest berikutnya gagal, file ini tidak dibaca ulang
+        stats.save(args.checkpoint)
+        print(f"✅ Ingested {n_games} games from {file} in {time.perf_counter() - start:.1f}s")
+    print(f"✅ Checkpoint {args.checkpoint}: {len(stats)} openings, {stats.games_ingested} games")
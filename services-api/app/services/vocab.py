@@ -0,0 +1,39 @@
+import numpy as np
+
+
+class OpeningVocabulary:
+    """
+    Id integer bersama untuk semua nama opening yang bisa keluar dari stage CB maupun CF,
+    sehingga skor keduanya bisa disejajarkan sebagai array dense.
+
+    Id bersifat append-only: nama baru (mis. vocabulary CF yang dimuat belakangan)
+    mendapat id baru tanpa mengubah id lama. Urutan leksikografis (urutan baris hasil
+    outer-merge pandas) disimpan di `rank` (id -> posisi terurut).
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        self.rank = np.empty(0, dtype=np.intp)
+        self.add(names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, names):
+        """Daftarkan nama yang belum dikenal, lalu kembalikan array id untuk `names`"""
+        names = [str(name) for name in names]
+        new = [name for name in dict.fromkeys(names) if name not in self.ids]
+        if new:
+            for name in new:
+                self.ids[name] = len(self.names)
+                self.names.append(name)
+            order = sorted(range(len(self.names)), key=self.names.__getitem__)
+            rank = np.empty(len(order), dtype=np.intp)
+            rank[order] = np.arange(len(order))
+            self.rank = rank
+        return np.array([self.ids[name] for name in names], dtype=np.intp)
+
+    def lookup(self, names):
+        """Id untuk nama yang dikenal (nama lain diabaikan)"""
+        return np.array([self.ids[name] for name in names if name in self.ids], dtype=np.intp)
@@ -0,0 +1,116 @@
+"""
+Benchmark content-based retrieval: matrix similarity (SimilarityIndex) vs vektor fitur
+(VectorIndex, exact brute-force BLAS dan IVF) pada vocabulary opening yang makin besar.
+
+    python -m benchmarks.cb_index [--sizes 1500 5000 10000 50000] [--nprobe 4 8 16]
+                                  [--top-k 50] [--queries 500] [--output results.json]
+
+Fitur sintetis mirip TF-IDF nama opening: setiap opening punya term family (dibagi dengan
+opening lain di family yang sama) dan term variasi sendiri, dinormalisasi L2. Matrix
+similarity = V V^T, hanya dibangun sampai --matrix-max opening (memori O(n^2)).
+Query mengikuti workload /predict: 1-3 favorit, opening populer lebih sering.
+
+Per ukuran dilaporkan: storage (MB), waktu build, latency per query (p50/p95/p99 ms) dan
+recall@k terhadap hasil exact (matrix jika ada, selain itu brute-force vektor yang setara).
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.cb_engine import SimilarityIndex
+from app.services.cb_vectors import IVFIndex, VectorIndex
+from benchmarks.run import _time_each
+
+
+def synthetic_features(n, dim=512, family_size=30, terms=(3, 5), seed=0):
+    """(nama opening, vektor float32 ter-normalisasi L2) dengan struktur family"""
+    rng = np.random.default_rng(seed)
+    n_families = max(1, n // family_size)
+    family_terms = rng.integers(0, dim, size=(n_families, terms[0]))
+    vectors = np.zeros((n, dim), dtype=np.float32)
+    families = rng.integers(0, n_families, size=n)
+    rows = np.arange(n)[:, None]
+    vectors[rows, family_terms[families]] = rng.uniform(0.5, 1.5, size=(n, terms[0]))
+    vectors[rows, rng.integers(0, dim, size=(n, terms[1]))] += rng.uniform(0.2, 1.0, size=(n, terms[1]))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [f"Opening {i:06d}" for i in range(n)], vectors
+
+
+def favorite_sets(names, n_queries, seed=0):
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(names) + 1)
+    weights /= weights.sum()
+    return [
+        tuple(names[i] for i in rng.choice(len(names), size=int(rng.integers(1, 4)), replace=False, p=weights))
+        for _ in range(n_queries)
+    ]
+
+
+def recall(truth, found):
+    """Rata-rata |top-k exact ∩ top-k kandidat| / k"""
+    return round(float(np.mean([len(np.intersect1d(t[0], f[0])) / len(t[0]) for t, f in zip(truth, found)])), 4)
+
+
+def bench_size(n, args):
+    names, vectors = synthetic_features(n, dim=args.dim, seed=args.seed)
+    queries = favorite_sets(names, args.queries, seed=args.seed)
+    result = {"n": n, "dim": args.dim, "storage_mb": {}, "build_seconds": {}, "latency": {}, "recall_at_k": {}}
+
+    exact = VectorIndex(names, vectors)
+    result["storage_mb"]["vectors"] = round(vectors.nbytes / 1e6, 2)
+    search = lambda index: (lambda favorites: index.top_n_positions(favorites, args.top_k))  # noqa: E731
+    truth = [exact.top_n_positions(q, args.top_k) for q in queries]
+    result["latency"]["vectors_exact"] = _time_each(search(exact), queries)
+
+    if n <= args.matrix_max:
+        start = time.perf_counter()
+        columns = vectors @ vectors.T
+        result["build_seconds"]["matrix"] = round(time.perf_counter() - start, 3)
+        result["storage_mb"]["matrix"] = round(columns.nbytes / 1e6, 2)
+        matrix = SimilarityIndex(names, columns)
+        matrix_top = [matrix.top_n_positions(q, args.top_k) for q in queries]
+        result["latency"]["matrix"] = _time_each(search(matrix), queries)
+        result["recall_at_k"]["vectors_exact"] = recall(matrix_top, truth)
+        truth = matrix_top
+        del matrix, columns
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(vectors, seed=args.seed)
+    result["build_seconds"]["ivf"] = round(time.perf_counter() - start, 3)
+    result["storage_mb"]["ivf"] = round((ivf.centroids.nbytes + ivf.order.nbytes + ivf.offsets.nbytes) / 1e6, 2)
+    result["ivf_lists"] = len(ivf)
+    approx = VectorIndex(names, vectors, ivf=ivf)
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        found = [approx.top_n_positions(q, args.top_k) for q in queries]
+        result["recall_at_k"][f"ivf_nprobe_{nprobe}"] = recall(truth, found)
+        result["latency"][f"ivf_nprobe_{nprobe}"] = _time_each(search(approx), queries)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recall@k and latency of content-based retrieval: matrix vs vector index")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1500, 5000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--top-k", type=int, default=50, help="CB candidates per query (engine default)")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--matrix-max", type=int, default=10000, help="largest vocabulary to build a dense matrix for")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here (default: stdout only)")
+    args = parser.parse_args(argv)
+
+    results = {"meta": {"top_k": args.top_k, "queries": args.queries, "numpy": np.__version__},
+               "sizes": [bench_size(n, args) for n in args.sizes]}
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
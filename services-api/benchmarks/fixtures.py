@@ -0,0 +1,236 @@
+"""
+Fixture sintetis untuk benchmark (tanpa data asli, tanpa TensorFlow).
+
+Menghasilkan file dengan format yang sama seperti pipeline training:
+    games.csv                       -> kolom Lichess (id, moves, opening_ply, opening_name, winner, ...)
+    content_based_model.pkl         -> {'similarity_matrix': DataFrame opening x opening}
+    collaborative_data.pkl          -> encoder, player_opening_matrix, player_data, opening_rating
+    collaborative_model_numpy.pkl   -> NumpyCFScorer (embedding -> dense -> sigmoid), dipakai tanpa Keras
+
+Urutan langkah opening dibangun sebagai pohon (variasi memperpanjang opening induknya),
+jadi prefix bersama mirip data asli. Semua angka acak berasal dari `seed`, sehingga
+fixture dengan parameter yang sama selalu identik.
+
+    python -m benchmarks.fixtures --size medium --output /tmp/chessrecs-bench
+"""
+import json
+import pickle
+import random
+from pathlib import Path
+
+import chess
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from app.services.cf_engine import NumpyCFScorer
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "fixtures.json"
+
+SIZES = {
+    "small": {"n_openings": 300, "n_games": 5000, "n_players": 800},
+    "medium": {"n_openings": 1500, "n_games": 20000, "n_players": 6000},
+    "large": {"n_openings": 3000, "n_games": 100000, "n_players": 25000},
+}
+
+FAMILIES = [
+    "Sicilian Defense", "French Defense", "Caro-Kann Defense", "Queen's Gambit Declined",
+    "Ruy Lopez", "Italian Game", "King's Indian Defense", "English Opening",
+    "Scandinavian Defense", "Pirc Defense", "Slav Defense", "Nimzo-Indian Defense",
+    "Dutch Defense", "Queen's Pawn Game", "King's Pawn Game", "Philidor Defense",
+]
+
+
+def _random_moves(board, n, rng):
+    """Tambahkan hingga n langkah legal acak ke board (in place), return list SAN"""
+    moves = []
+    for _ in range(n):
+        legal = list(board.legal_moves)
+        if not legal:
+            break
+        move = rng.choice(legal)
+        moves.append(board.san(move))
+        board.push(move)
+    return moves
+
+
+def _openings(n_openings, rng):
+    """Nama, family & urutan langkah (SAN) opening; sebagian besar memperpanjang opening lain"""
+    openings = []
+    for i in range(n_openings):
+        if openings and rng.random() < 0.8:
+            parent = openings[rng.randrange(len(openings))]
+            family, base = parent["family"], parent["moves"]
+        else:
+            family, base = FAMILIES[i % len(FAMILIES)], []
+        board = chess.Board()
+        for move in base:
+            board.push_san(move)
+        moves = base + _random_moves(board, rng.randint(1, 3) if base else rng.randint(2, 4), rng)
+        openings.append({"name": f"{family}: Variation {i + 1}", "family": family, "moves": moves})
+    return openings
+
+
+def _games(openings, n_games, n_players, rng, np_rng):
+    """DataFrame games.csv; popularitas opening mengikuti distribusi zipf"""
+    # Beberapa lanjutan legal per opening, dipakai bergantian oleh game
+    continuations = []
+    for opening in openings:
+        board = chess.Board()
+        for move in opening["moves"]:
+            board.push_san(move)
+        continuations.append([_random_moves(board.copy(), rng.randint(4, 12), rng) for _ in range(2)])
+
+    players = [f"player_{i:05d}" for i in range(n_players)]
+    player_rating = np.clip(np_rng.normal(1500, 300, n_players), 600, 2900).astype(int)
+    weights = 1.0 / np.arange(1, len(openings) + 1) ** 1.1
+    # Setiap opening muncul minimal sekali (vocabulary CF = semua opening)
+    opening_idx = np.concatenate([
+        np.arange(len(openings)),
+        np_rng.choice(len(openings), size=max(0, n_games - len(openings)), p=weights / weights.sum()),
+    ])[:n_games]
+    white = np_rng.integers(0, n_players, n_games)
+    black = np_rng.integers(0, n_players, n_games)
+
+    rows = []
+    for game_id, (o, w, b) in enumerate(zip(opening_idx, white, black)):
+        opening = openings[o]
+        moves = opening["moves"] + continuations[o][game_id % 2]
+        expected_white = 1 / (1 + 10 ** ((player_rating[b] - player_rating[w]) / 400))
+        roll = np_rng.random()
+        winner = "draw" if roll < 0.05 else ("white" if roll < 0.05 + 0.95 * expected_white else "black")
+        rows.append({
+            "id": f"g{game_id:07d}",
+            "rated": True,
+            "turns": len(moves),
+            "victory_status": "resign" if winner != "draw" else "draw",
+            "winner": winner,
+            "increment_code": "10+0",
+            "white_id": players[w],
+            "white_rating": int(player_rating[w]),
+            "black_id": players[b],
+            "black_rating": int(player_rating[b]),
+            "moves": " ".join(moves),
+            "opening_eco": "A00",
+            "opening_name": opening["name"],
+            "opening_ply": len(opening["moves"]),
+        })
+    return pd.DataFrame(rows)
+
+
+def _content_model(openings, np_rng, dim=32):
+    """Cosine similarity dari fitur acak yang berkorelasi per family"""
+    names = sorted(o["name"] for o in openings)
+    family_of = {o["name"]: o["family"] for o in openings}
+    family_vec = {f: np_rng.normal(size=dim) for f in FAMILIES}
+    features = np.stack([family_vec[family_of[n]] + 0.7 * np_rng.normal(size=dim) for n in names])
+    features /= np.linalg.norm(features, axis=1, keepdims=True)
+    similarity = pd.DataFrame(features @ features.T, index=names, columns=names)
+    return {"similarity_matrix": similarity, "opening_names": names}
+
+
+def _collaborative_data(games):
+    """Struktur collaborative_data.pkl yang dihasilkan notebook training"""
+    sides = []
+    for side in ("white", "black"):
+        sides.append(pd.DataFrame({
+            "player_id": games[f"{side}_id"],
+            "opening_name": games["opening_name"],
+            "rating": games[f"{side}_rating"],
+            "played_as": side,
+        }))
+    player_data = pd.concat(sides, ignore_index=True)
+
+    player_encoder = LabelEncoder().fit(player_data["player_id"])
+    opening_encoder = LabelEncoder().fit(games["opening_name"])
+    matrix = player_data.groupby(["player_id", "opening_name"]).size().reset_index(name="frequency")
+    matrix["player_encoded"] = player_encoder.transform(matrix["player_id"])
+    matrix["opening_encoded"] = opening_encoder.transform(matrix["opening_name"])
+    opening_rating = player_data.groupby("opening_name")["rating"].agg(["mean", "median", "std"]).reset_index()
+    return {
+        "player_encoder": player_encoder,
+        "opening_encoder": opening_encoder,
+        "player_opening_matrix": matrix,
+        "opening_rating": opening_rating,
+        "player_data": player_data,
+    }
+
+
+def _cf_scorer(n_players, n_openings, np_rng, dim=32, hidden=(64, 32)):
+    """NumpyCFScorer dengan arsitektur model CF asli: 2 embedding -> concat -> dense -> sigmoid"""
+    def dense(n_in, n_out):
+        return (np_rng.normal(0, np.sqrt(2.0 / n_in), (n_in, n_out)).astype(np.float32),
+                np_rng.normal(0, 0.05, n_out).astype(np.float32))
+
+    player_table = np_rng.normal(0, 0.3, (n_players, dim)).astype(np.float32)
+    opening_table = np_rng.normal(0, 0.3, (n_openings, dim)).astype(np.float32)
+    layers, n_in = [], 2 * dim
+    for width in hidden + (1,):
+        kernel, bias = dense(n_in, width)
+        layers.append((kernel, bias, "sigmoid" if width == 1 else "relu"))
+        n_in = width
+    return NumpyCFScorer(player_table, opening_table, layers)
+
+
+def paths(output):
+    output = Path(output)
+    return {
+        "games": output / "games.csv",
+        "content_model": output / "content_based_model.pkl",
+        "collaborative_data": output / "collaborative_data.pkl",
+        "cf_numpy_model": output / "collaborative_model_numpy.pkl",
+    }
+
+
+def generate(output, n_openings, n_games, n_players, seed=0):
+    """
+    Tulis fixture ke folder `output` dan return dict path. Jika fixture dengan parameter
+    yang sama sudah ada, file lama dipakai ulang.
+    """
+    output = Path(output)
+    params = {"format_version": FORMAT_VERSION, "n_openings": n_openings, "n_games": n_games,
+              "n_players": n_players, "seed": seed}
+    files = paths(output)
+    manifest_path = output / MANIFEST_NAME
+    if manifest_path.is_file() and json.loads(manifest_path.read_text()) == params \
+            and all(p.is_file() for p in files.values()):
+        return files
+
+    output.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    openings = _openings(n_openings, rng)
+    games = _games(openings, n_games, n_players, rng, np_rng)
+    games.to_csv(files["games"], index=False)
+
+    with open(files["content_model"], "wb") as f:
+        pickle.dump(_content_model(openings, np_rng), f, protocol=pickle.HIGHEST_PROTOCOL)
+    collaborative_data = _collaborative_data(games)
+    with open(files["collaborative_data"], "wb") as f:
+        pickle.dump(collaborative_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    scorer = _cf_scorer(
+        len(collaborative_data["player_encoder"].classes_),
+        len(collaborative_data["opening_encoder"].classes_),
+        np_rng,
+    )
+    scorer.save(files["cf_numpy_model"])
+
+    manifest_path.write_text(json.dumps(params, indent=2))
+    return files
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate synthetic games.csv + model fixtures for benchmarks")
+    parser.add_argument("--size", default="medium", choices=sorted(SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=str(Path(tempfile.gettempdir()) / "chessrecs-bench"))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    files = generate(Path(args.output) / f"{args.size}-{args.seed}", seed=args.seed, **SIZES[args.size])
+    print(f"✅ Fixtures ({args.size}) ready in {time.perf_counter() - start:.1f}s: {files['games'].parent}")
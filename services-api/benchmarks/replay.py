@@ -0,0 +1,336 @@
+"""
+Replay workload (rating, favorites, alpha) lewat ChessRecommender untuk regresi ranking & profiling.
+
+    # Rekam golden output (fixture sintetis, atau model dari env service dengan --use-env)
+    python -m benchmarks.replay capture --output golden.json [--queries 5000] [--top-n 10]
+                                        [--workload queries.jsonl] [--profile-dir prof/]
+
+    # Bandingkan engine saat ini dengan golden (exit code 1 jika ranking/skor berubah)
+    python -m benchmarks.replay compare golden.json [--path single|batch] [--profile-dir prof/]
+                                        [--against other.json] [--output report.json]
+
+Workload: sintetis (benchmarks.run._workload, seed tetap) atau rekaman JSONL dengan satu body
+/predict per baris ({"user_rating", "favorite_openings", "alpha"}). Setiap query dihitung tanpa
+result cache: `single` lewat _predict_uncached (jalur /predict), `batch` lewat predict_batch.
+
+Drift per query: top-k overlap (|A ∩ B| / k), urutan sama atau tidak, dan selisih skor maksimum
+per field untuk opening yang ada di kedua hasil. Waktu per stage (CB, CF, hybrid + format) diukur
+terpisah; dengan --profile-dir setiap stage juga dijalankan di bawah cProfile (<stage>.prof untuk
+snakeviz / flameprof / gprof2dot, <stage>.txt ringkasan cumulative). Flamegraph sampling:
+    py-spy record -o flame.svg -- python -m benchmarks.replay compare golden.json
+"""
+import argparse
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import fixtures
+from benchmarks.run import _configure_env, _summary, _workload
+
+FORMAT_VERSION = 1
+SCORE_FIELDS = ("hybrid_score", "cb_score", "cf_score", "win_rate_white", "win_rate_black", "win_rate_draw")
+TEXT_FIELDS = ("archetype", "moves", "fen")
+STAGES = ("cb", "cf", "hybrid")
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_workload(path):
+    """Query dari file JSONL (satu body /predict per baris)"""
+    queries = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                q = json.loads(line)
+                queries.append({
+                    "user_rating": int(q["user_rating"]),
+                    "favorite_openings": list(q["favorite_openings"]),
+                    "alpha": float(q.get("alpha", 0.7)),
+                })
+    return queries
+
+
+def _keys(recommender, queries, top_n):
+    """Key ternormalisasi seperti predict() (favorit terurut, alpha terkuantisasi)"""
+    return [recommender._result_cache_key(q["user_rating"], q["favorite_openings"], q["alpha"], top_n)
+            for q in queries]
+
+
+def replay(recommender, queries, top_n, path="single"):
+    """Hasil engine per query, dihitung tanpa result cache"""
+    keys = _keys(recommender, queries, top_n)
+    recommender._result_cache.clear()
+    if path == "batch":
+        profiles = [(rating, list(favorites), alpha) for rating, favorites, alpha, _ in keys]
+        results = [r for _, r in recommender.predict_batch(profiles, top_n=top_n)]
+    else:
+        results = [recommender._predict_uncached(*key) for key in keys]
+    recommender._result_cache.clear()
+    return results
+
+
+def _stage_calls(recommender, keys):
+    """{stage: fungsi(key)}; urutan & argumen sama dengan _predict_uncached"""
+    candidates = {}
+
+    def cb(key):
+        candidates[key] = [recommender._get_content_based(list(key[1])), None]
+
+    def cf(key):
+        candidates[key][1] = recommender._get_collaborative(key[0])
+
+    def hybrid(key):
+        cb_recs, cf_recs = candidates[key]
+        recommender._hybrid_results(cb_recs, cf_recs, list(key[1]), key[2], key[3])
+
+    return {"cb": cb, "cf": cf, "hybrid": hybrid}
+
+
+def time_stages(recommender, queries, top_n, profile_dir=None):
+    """
+    Latency per stage (p50/p95/p99 ms + total detik) dengan CF cache kosong di awal, jadi
+    stage cf mencakup inference per rating bucket seperti setelah startup.
+    """
+    keys = _keys(recommender, queries, top_n)
+    timings = {}
+    for profiled in (False, True) if profile_dir else (False,):
+        recommender.clear_cf_cache()
+        calls = _stage_calls(recommender, keys)
+        for stage in STAGES:
+            fn = calls[stage]
+            if profiled:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                for key in keys:
+                    fn(key)
+                profiler.disable()
+                _write_profile(profiler, Path(profile_dir), stage)
+                continue
+            samples = []
+            for key in keys:
+                start = time.perf_counter()
+                fn(key)
+                samples.append(time.perf_counter() - start)
+            timings[stage] = {**_summary(samples), "total_seconds": round(float(np.sum(samples)), 4)}
+    return timings
+
+
+def _write_profile(profiler, directory, stage):
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(directory / f"{stage}.prof")
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(30)
+    (directory / f"{stage}.txt").write_text(text.getvalue())
+
+
+def query_drift(expected, actual, k):
+    """Drift satu query: top-k overlap, urutan, selisih skor maksimum & field teks yang berubah"""
+    names_a = [r["opening_name"] for r in expected][:k]
+    names_b = [r["opening_name"] for r in actual][:k]
+    overlap = len(set(names_a) & set(names_b)) / max(len(names_a), len(names_b), 1)
+    by_name = {r["opening_name"]: r for r in actual}
+    deltas = dict.fromkeys(SCORE_FIELDS, 0.0)
+    changed = []
+    for a in expected:
+        b = by_name.get(a["opening_name"])
+        if b is None:
+            continue
+        for field in SCORE_FIELDS:
+            deltas[field] = max(deltas[field], abs(a[field] - b[field]))
+        changed += [f"{a['opening_name']}.{field}" for field in TEXT_FIELDS if a.get(field) != b.get(field)]
+    return {"overlap": overlap, "same_order": names_a == names_b, "max_delta": deltas, "changed_fields": changed}
+
+
+def drift_report(golden, current, k=None, worst=10):
+    """Ringkasan drift semua query antara dua daftar hasil (urutan query sama)"""
+    if len(golden["results"]) != len(current["results"]):
+        raise ValueError(f"Query count differs: {len(golden['results'])} vs {len(current['results'])}")
+    k = k or golden["meta"]["top_n"]
+    per_query = [query_drift(a, b, k) for a, b in zip(golden["results"], current["results"])]
+    overlaps = np.array([d["overlap"] for d in per_query])
+    max_delta = {field: max((d["max_delta"][field] for d in per_query), default=0.0) for field in SCORE_FIELDS}
+    # Query terburuk dulu: overlap terkecil, urutan berubah, lalu selisih skor terbesar
+    ranked = sorted(range(len(per_query)), key=lambda i: (
+        per_query[i]["overlap"], per_query[i]["same_order"], -max(per_query[i]["max_delta"].values())
+    ))
+    return {
+        "queries": len(per_query),
+        "k": k,
+        "overlap_mean": round(float(overlaps.mean()), 6) if len(per_query) else 1.0,
+        "overlap_min": round(float(overlaps.min()), 6) if len(per_query) else 1.0,
+        "queries_reordered": sum(not d["same_order"] for d in per_query),
+        "queries_changed_fields": sum(bool(d["changed_fields"]) for d in per_query),
+        "max_delta": max_delta,
+        "worst": [
+            {"query": golden["queries"][i], **per_query[i]}
+            for i in ranked[:worst]
+            if not per_query[i]["same_order"] or per_query[i]["changed_fields"] or max(per_query[i]["max_delta"].values()) > 0
+        ],
+    }
+
+
+def speedups(golden, current):
+    """Rasio waktu total per stage golden / saat ini (> 1 = lebih cepat; hanya bermakna di mesin yang sama)"""
+    before, after = golden.get("timings") or {}, current.get("timings") or {}
+    return {
+        stage: round(before[stage]["total_seconds"] / after[stage]["total_seconds"], 3)
+        for stage in STAGES
+        if stage in before and stage in after and after[stage]["total_seconds"] > 0
+    }
+
+
+def _setup_engine(args):
+    """Muat ChessRecommender dari fixture sintetis (default) atau dari env service (--use-env)"""
+    source = {"use_env": True}
+    if not args.use_env:
+        workdir = Path(args.fixtures_dir) / f"{args.size}-{args.seed}"
+        files = fixtures.generate(workdir, seed=args.seed, **fixtures.SIZES[args.size])
+        _configure_env(files, workdir)
+        source = {"size": args.size, "seed": args.seed, "fixtures": fixtures.SIZES[args.size]}
+    os.environ.setdefault("LOG_LEVEL", "warning")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        from app.services.engine import recommender
+        recommender.load_resources()
+    if not recommender.is_ready or not recommender.cf_ready:
+        raise SystemExit("❌ Models failed to load (see service logs)")
+    return recommender, source
+
+
+def run(args, queries=None):
+    """Replay + timing; return dokumen golden (meta, queries, results, timings)"""
+    recommender, source = _setup_engine(args)
+    from app.config import settings
+
+    if queries is None:
+        if args.workload:
+            queries = load_workload(args.workload)
+        else:
+            queries = _workload(recommender.opening_names(), args.queries, np.random.default_rng(args.seed))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        results = replay(recommender, queries, args.top_n, path=args.path)
+        replay_seconds = time.perf_counter() - start
+        timings = time_stages(recommender, queries, args.top_n, profile_dir=args.profile_dir)
+    return {
+        "meta": {
+            "format_version": FORMAT_VERSION,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_revision": _git_revision(),
+            "source": source,
+            "workload": args.workload or "synthetic",
+            "top_n": args.top_n,
+            "path": args.path,
+            "cf_engine": settings.CF_ENGINE,
+            "cb_engine": settings.CB_ENGINE,
+            "data_version": recommender.data_version,
+            "replay_seconds": round(replay_seconds, 3),
+        },
+        "queries": queries,
+        "results": results,
+        "timings": timings,
+    }
+
+
+def _write_json(path, document, indent=2):
+    text = json.dumps(document, indent=indent)
+    if path:
+        Path(path).write_text(text)
+    return text
+
+
+def cmd_capture(args):
+    golden = run(args)
+    # Golden bisa berisi puluhan ribu hasil: tanpa indentasi
+    _write_json(args.output, golden, indent=None)
+    print(json.dumps({"output": args.output, "meta": golden["meta"], "timings": golden["timings"]}, indent=2))
+    return 0
+
+
+def cmd_compare(args):
+    golden = json.loads(Path(args.golden).read_text())
+    if golden["meta"].get("format_version") != FORMAT_VERSION:
+        raise SystemExit(f"❌ Unsupported golden format: {golden['meta'].get('format_version')}")
+    if args.against:
+        current = json.loads(Path(args.against).read_text())
+    else:
+        # Workload, fixture & top_n mengikuti golden agar hasilnya bisa dibandingkan per query
+        source = golden["meta"]["source"]
+        args.use_env = args.use_env or source.get("use_env", False)
+        args.size, args.seed = source.get("size", args.size), source.get("seed", args.seed)
+        args.top_n = golden["meta"]["top_n"]
+        current = run(args, queries=golden["queries"])
+    drift = drift_report(golden, current, k=args.k)
+    failed = drift["overlap_min"] < args.min_overlap or max(drift["max_delta"].values()) > args.max_delta \
+        or drift["queries_changed_fields"] > 0
+    report = {
+        "golden": golden["meta"],
+        "current": current["meta"],
+        "drift": drift,
+        "speedup": speedups(golden, current),
+        "timings": current.get("timings"),
+        "thresholds": {"min_overlap": args.min_overlap, "max_delta": args.max_delta},
+        "passed": not failed,
+    }
+    print(_write_json(args.output, report))
+    if failed:
+        print(f"❌ Ranking drift: overlap_min={drift['overlap_min']} max_delta={max(drift['max_delta'].values())}"
+              f" reordered={drift['queries_reordered']}", file=sys.stderr)
+    else:
+        print(f"✅ Parity with {args.golden} ({drift['queries']} queries)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a query workload through the recommender: golden capture, ranking drift & per-stage profiles")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def engine_options(p):
+        p.add_argument("--size", default="medium", choices=sorted(fixtures.SIZES))
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--fixtures-dir", default=str(Path(tempfile.gettempdir()) / "chessrecs-bench"))
+        p.add_argument("--use-env", action="store_true", help="load the models configured by the service env instead of fixtures")
+        p.add_argument("--path", default="single", choices=["single", "batch"], help="predict path to replay")
+        p.add_argument("--profile-dir", help="write cProfile output per stage here")
+
+    capture = sub.add_parser("capture", help="record golden rankings & scores")
+    engine_options(capture)
+    capture.add_argument("--output", required=True)
+    capture.add_argument("--workload", help="JSONL of /predict bodies (default: synthetic)")
+    capture.add_argument("--queries", type=int, default=5000, help="synthetic workload size")
+    capture.add_argument("--top-n", type=int, default=10)
+    capture.set_defaults(func=cmd_capture)
+
+    compare = sub.add_parser("compare", help="replay a golden file's queries and report ranking drift")
+    engine_options(compare)
+    compare.add_argument("golden")
+    compare.add_argument("--against", help="compare with another captured file instead of replaying")
+    compare.add_argument("--k", type=int, help="top-k for overlap (default: golden top_n)")
+    compare.add_argument("--min-overlap", type=float, default=1.0)
+    compare.add_argument("--max-delta", type=float, default=0.0, help="allowed absolute score change")
+    compare.add_argument("--output", help="write the report JSON here (default: stdout only)")
+    compare.set_defaults(func=cmd_compare, workload=None)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
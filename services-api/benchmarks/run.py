@@ -0,0 +1,365 @@
+"""
+Benchmark latency/throughput recommendation service (offline, fixture sintetis).
+
+    python -m benchmarks.run [--size small|medium|large] [--output results.json]
+                             [--baseline benchmarks/baseline.json] [--save-baseline]
+
+1. Fixture dibuat (atau dipakai ulang) lewat benchmarks/fixtures.py, lalu service diarahkan
+   ke fixture tersebut lewat env var yang sama dengan production (DATA_PATH, ...).
+2. Microbenchmark per stage: moves_to_fen (cold/batch/cached), CB, CF (miss & hit),
+   hybrid merge, merge + formatting, predict (uncached & cached).
+3. Load test in-process ke /predict & /openings: request dikirim langsung ke ASGI app
+   (tanpa socket) dengan sejumlah request concurrent; `predict_cold_cf` mengirim burst
+   request serentak dengan CF cache kosong (CF inference di-micro-batch), dan
+   `predict_cold_cf_deadline` burst yang sama dengan budget 2 ms (response ter-degradasi dihitung).
+4. Hasil (p50/p95/p99 dalam ms, RPS) ditulis sebagai JSON. Jika ada baseline dengan
+   fixture yang sama, metrik yang memburuk lebih dari --tolerance dilaporkan sebagai
+   regresi dan exit code = 1.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import fixtures
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def _summary(samples):
+    """Statistik latency (detik -> ms)"""
+    ms = np.asarray(samples, dtype=np.float64) * 1e3
+    return {
+        "n": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+    }
+
+
+def _time_each(fn, inputs, setup=None):
+    """Jalankan fn(x) untuk setiap input, ukur setiap panggilan (setup & warmup tidak ikut diukur)"""
+    if setup is not None:
+        setup()
+    fn(inputs[0])
+    samples = []
+    for x in inputs:
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn(x)
+        samples.append(time.perf_counter() - start)
+    return _summary(samples)
+
+
+def _configure_env(files, workdir):
+    """Arahkan config service ke fixture (harus sebelum `app` diimpor)"""
+    os.environ.update({
+        "DATA_PATH": str(files["games"]),
+        "CONTENT_MODEL_PATH": str(files["content_model"]),
+        "COLLAB_DATA_PATH": str(files["collaborative_data"]),
+        "CF_NUMPY_MODEL_PATH": str(files["cf_numpy_model"]),
+        # File di bawah ini tidak dibuat: service memakai jalur legacy (CSV + pickle)
+        "COLLAB_MODEL_PATH": str(workdir / "collaborative_model.keras"),
+        "CB_MATRIX_PATH": str(workdir / "content_based_matrix.npy"),
+        "CB_VECTORS_PATH": str(workdir / "content_based_vectors.npy"),
+        "CF_BUCKETS_PATH": str(workdir / "cf_bucket_scores.npy"),
+        "BUNDLE_PATH": str(workdir / "bundle"),
+        "CF_ENGINE": "numpy",
+        "CF_PRECOMPUTE": "off",
+        "STARTUP_MODE": "blocking",
+        "LOG_LEVEL": "warning",
+    })
+
+
+def _workload(openings, n, rng):
+    """Profil request mirip frontend: rating kelipatan 50, alpha kelipatan 0.1, 1-3 favorit populer"""
+    weights = 1.0 / np.arange(1, len(openings) + 1)
+    weights /= weights.sum()
+    profiles = []
+    for _ in range(n):
+        favorites = rng.choice(len(openings), size=int(rng.integers(1, 4)), replace=False, p=weights)
+        profiles.append({
+            "user_rating": int(rng.integers(16, 51)) * 50,
+            "favorite_openings": [openings[i] for i in favorites],
+            "alpha": round(float(rng.integers(0, 11)) / 10, 1),
+        })
+    return profiles
+
+
+def run_micro(recommender, profiles, repeat):
+    from app.services import fen
+    from app.services.hybrid import blend
+
+    results = {}
+    moves = [meta['moves'] for meta in recommender._opening_index.values()]
+    sample_moves = moves[:repeat]
+
+    results["fen_cold"] = _time_each(fen.moves_to_fen, sample_moves, setup=fen.clear_fen_cache)
+    results["fen_batch_all_openings"] = _time_each(
+        fen.moves_to_fen_batch, [moves] * max(3, repeat // 50), setup=fen.clear_fen_cache
+    )
+    fen.moves_to_fen_batch(moves)
+    results["fen_cached"] = _time_each(fen.moves_to_fen, sample_moves)
+
+    sample = profiles[:repeat]
+    favorites = [p["favorite_openings"] for p in sample]
+    ratings = [p["user_rating"] for p in sample]
+    results["cb"] = _time_each(recommender._get_content_based, favorites)
+
+    results["cf_miss"] = _time_each(
+        recommender._get_collaborative, ratings[:max(10, repeat // 10)], setup=recommender.clear_cf_cache
+    )
+    recommender.precompute_cf_buckets()
+    results["cf_hit"] = _time_each(recommender._get_collaborative, ratings)
+
+    vocab = recommender._vocab
+    candidates = [
+        (recommender._get_content_based(p["favorite_openings"]), recommender._get_collaborative(p["user_rating"]), p)
+        for p in sample
+    ]
+    results["hybrid_merge"] = _time_each(
+        lambda c: blend(c[0], c[1], vocab.lookup(c[2]["favorite_openings"]), c[2]["alpha"], 5, vocab.rank),
+        candidates
+    )
+    results["hybrid_merge_format"] = _time_each(
+        lambda c: recommender._hybrid_results(c[0], c[1], c[2]["favorite_openings"], c[2]["alpha"], 5),
+        candidates
+    )
+
+    keys = [recommender._result_cache_key(p["user_rating"], p["favorite_openings"], p["alpha"], 5) for p in sample]
+    results["predict_uncached"] = _time_each(lambda key: recommender._predict_uncached(*key), keys)
+    for p in sample:
+        recommender.predict(p["user_rating"], p["favorite_openings"], p["alpha"])
+    results["predict_cached"] = _time_each(
+        lambda p: recommender.predict(p["user_rating"], p["favorite_openings"], p["alpha"]), sample
+    )
+    return results
+
+
+async def _asgi_request(app, method, path, body=b"", headers=()):
+    """Satu request HTTP langsung ke ASGI app (tanpa socket); return (status, body, headers)"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"benchmark"), (b"content-length", str(len(body)).encode()), *headers],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Client tidak pernah disconnect selama response dikirim
+        await asyncio.Event().wait()
+
+    response = {"status": None, "headers": {}, "body": []}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message.get("headers", ()))
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return response["status"], b"".join(response["body"]), response["headers"]
+
+
+async def _load(app, requests, concurrency):
+    """Kirim semua request dengan `concurrency` worker; return statistik latency + RPS"""
+    samples = []
+    errors = 0
+    queue = iter(requests)
+
+    async def worker():
+        nonlocal errors
+        for method, path, body, headers in queue:
+            start = time.perf_counter()
+            status, _, _ = await _asgi_request(app, method, path, body, headers)
+            samples.append(time.perf_counter() - start)
+            errors += status != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {**_summary(samples), "concurrency": concurrency, "errors": errors,
+            "rps": round(len(samples) / elapsed, 2)}
+
+
+async def _cold_cf_bursts(app, recommender, requests, concurrency, bursts):
+    """
+    Burst `concurrency` request serentak dengan CF cache & result cache kosong (CF miss dibatch).
+    `degraded` = jumlah response yang dilayani tanpa CF (header X-Degraded).
+    """
+    samples = []
+    errors = 0
+    degraded = 0
+    elapsed = 0.0
+
+    async def one(method, path, body, headers):
+        nonlocal errors, degraded
+        start = time.perf_counter()
+        status, _, response_headers = await _asgi_request(app, method, path, body, headers)
+        samples.append(time.perf_counter() - start)
+        errors += status != 200
+        degraded += b"x-degraded" in response_headers
+
+    for i in range(bursts):
+        recommender.clear_cf_cache()
+        recommender._result_cache.clear()
+        burst = requests[i * concurrency:(i + 1) * concurrency]
+        start = time.perf_counter()
+        await asyncio.gather(*(one(*request) for request in burst))
+        elapsed += time.perf_counter() - start
+    recommender._result_cache.clear()
+    return {**_summary(samples), "concurrency": concurrency, "errors": errors, "degraded": degraded,
+            "rps": round(len(samples) / elapsed, 2)}
+
+
+def run_load(app, recommender, profiles, n_requests, concurrency):
+    json_headers = ((b"content-type", b"application/json"),)
+    predict = [("POST", "/predict", json.dumps(p).encode(), json_headers) for p in profiles[:n_requests]]
+    # Budget ketat dari gateway: CF yang tidak muat di-degradasi (fallback popularity)
+    deadline_headers = json_headers + ((b"x-request-timeout-ms", b"2"),)
+    predict_deadline = [(method, path, body, deadline_headers) for method, path, body, _ in predict]
+    # Format ringkas untuk gateway (app/services/encoding.py)
+    msgpack_headers = json_headers + ((b"accept", b"application/msgpack"),)
+    predict_msgpack = [(method, path, body, msgpack_headers) for method, path, body, _ in predict]
+    openings = [("GET", "/openings", b"", ())] * n_requests
+    openings_gzip = [("GET", "/openings", b"", ((b"accept-encoding", b"gzip"),))] * n_requests
+    bursts = max(1, min(20, n_requests // concurrency))
+    results = {
+        "predict_cold_cf": asyncio.run(_cold_cf_bursts(app, recommender, predict, concurrency, bursts)),
+        "predict_cold_cf_deadline": asyncio.run(
+            _cold_cf_bursts(app, recommender, predict_deadline, concurrency, bursts)
+        ),
+        "predict": asyncio.run(_load(app, predict, concurrency)),
+    }
+    # Result cache dikosongkan agar MessagePack menghitung ulang profil yang sama seperti "predict"
+    recommender._result_cache.clear()
+    results["predict_msgpack"] = asyncio.run(_load(app, predict_msgpack, concurrency))
+    results["openings"] = asyncio.run(_load(app, openings, concurrency))
+    results["openings_gzip"] = asyncio.run(_load(app, openings_gzip, concurrency))
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """Daftar regresi: latency naik atau RPS turun lebih dari `tolerance` (relatif) terhadap baseline"""
+    regressions = []
+    for section in ("micro", "load"):
+        for name, stats in current.get(section, {}).items():
+            base = baseline.get(section, {}).get(name)
+            if not base:
+                continue
+            for metric in LATENCY_METRICS:
+                if base.get(metric, 0) > 0 and stats[metric] > base[metric] * (1 + tolerance):
+                    regressions.append({"benchmark": f"{section}.{name}", "metric": metric,
+                                        "baseline": base[metric], "current": stats[metric]})
+            if "rps" in stats and base.get("rps", 0) > 0 and stats["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append({"benchmark": f"{section}.{name}", "metric": "rps",
+                                    "baseline": base["rps"], "current": stats["rps"]})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark for the recommendation service")
+    parser.add_argument("--size", default="medium", choices=sorted(fixtures.SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixtures-dir", default=str(Path(tempfile.gettempdir()) / "chessrecs-bench"))
+    parser.add_argument("--repeat", type=int, default=300, help="samples per microbenchmark")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per load-test endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--output", help="write results JSON here (default: stdout only)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown vs baseline")
+    args = parser.parse_args(argv)
+
+    workdir = Path(args.fixtures_dir) / f"{args.size}-{args.seed}"
+    start = time.perf_counter()
+    files = fixtures.generate(workdir, seed=args.seed, **fixtures.SIZES[args.size])
+    fixture_seconds = time.perf_counter() - start
+    _configure_env(files, workdir)
+
+    # Log service (print per request) tidak ikut ke output benchmark
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        from app.services.engine import recommender
+        from app.main import app
+
+        start = time.perf_counter()
+        recommender.load_resources()
+        load_seconds = time.perf_counter() - start
+
+        rng = np.random.default_rng(args.seed)
+        profiles = _workload(recommender.opening_names(), max(args.repeat, args.requests), rng)
+        micro = run_micro(recommender, profiles, args.repeat)
+        recommender._result_cache.clear()
+        load = {} if args.skip_load else run_load(app, recommender, profiles, args.requests, args.concurrency)
+
+    import pandas as pd
+    results = {
+        "meta": {
+            "size": args.size,
+            "seed": args.seed,
+            "fixtures": fixtures.SIZES[args.size],
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "fixture_seconds": round(fixture_seconds, 2),
+            "load_seconds": round(load_seconds, 2),
+            "result_cache": recommender.cache_stats()["result_cache"],
+        },
+        "micro": micro,
+        "load": load,
+    }
+
+    baseline_path = Path(args.baseline)
+    regressions = []
+    if baseline_path.is_file():
+        baseline = json.loads(baseline_path.read_text())
+        same_fixture = (baseline["meta"]["size"], baseline["meta"]["seed"]) == (args.size, args.seed)
+        if same_fixture:
+            regressions = compare(results, baseline, args.tolerance)
+            results["baseline"] = {"path": str(baseline_path), "created_at": baseline["meta"]["created_at"],
+                                   "tolerance": args.tolerance, "regressions": regressions}
+        else:
+            print(f"⚠️ Baseline {baseline_path} was recorded with a different fixture; not compared", file=sys.stderr)
+
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps({k: v for k, v in results.items() if k != "baseline"}, indent=2))
+        print(f"✅ Saved baseline to {baseline_path}", file=sys.stderr)
+    for r in regressions:
+        print(f"❌ Regression {r['benchmark']} {r['metric']}: {r['baseline']} -> {r['current']}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
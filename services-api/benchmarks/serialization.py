@@ -0,0 +1,149 @@
+"""
+Benchmark serialisasi response /predict & /predict/batch (tanpa model, tanpa server).
+
+    python -m benchmarks.serialization [--top-n 5] [--batch 1000] [--repeats 500]
+                                       [--gzip-levels 1 6] [--output results.json]
+
+Record sintetis berbentuk RecommendationResponse dengan nama opening, langkah SAN & FEN dari
+benchmarks.fixtures, skor float64 penuh. Dua payload: satu response /predict (top-n record) dan
+satu batch (--batch profil x top-n record).
+
+Per format dilaporkan ukuran body (bytes) dan waktu encode (server) & decode (client, termasuk
+gunzip) per payload (p50/p95/p99 ms):
+    legacy         -> jalur lama: /predict lewat response_model FastAPI (validasi pydantic,
+                      serialize, json.dumps); batch json.dumps per baris NDJSON
+    json           -> app.services.encoding (dict hasil engine langsung ke bytes)
+    msgpack        -> app.services.encoding dengan Accept: application/msgpack
+    <format>_gzip<level> -> body di atas dikompres gzip
+"""
+import argparse
+import gzip
+import json
+import random
+from pathlib import Path
+from typing import List
+
+import chess
+from pydantic import TypeAdapter
+
+from app.schemas import RecommendationResponse
+from app.services import encoding
+from benchmarks.fixtures import _openings
+from benchmarks.run import _time_each
+
+
+def synthetic_results(n_openings=1500, seed=0):
+    """Dict hasil engine (field RecommendationResponse) untuk setiap opening sintetis"""
+    rng = random.Random(seed)
+    records = []
+    for opening in _openings(n_openings, rng):
+        board = chess.Board()
+        for move in opening["moves"]:
+            board.push_san(move)
+        white, black = rng.random() * 0.5, rng.random() * 0.4
+        records.append({
+            "opening_name": opening["name"],
+            "archetype": opening["family"],
+            "moves": " ".join(opening["moves"]),
+            "fen": board.fen(),
+            "hybrid_score": rng.random(),
+            "cb_score": round(rng.random(), 4),
+            "cf_score": rng.random(),
+            "win_rate_white": white,
+            "win_rate_black": black,
+            "win_rate_draw": 1 - white - black,
+        })
+    return records
+
+
+def payloads(records, top_n, batch, seed=0):
+    rng = random.Random(seed)
+    predict = rng.sample(records, top_n)
+    rows = [{"index": i, "recommendations": rng.sample(records, top_n)} for i in range(batch)]
+    return predict, rows
+
+
+def formats(gzip_levels):
+    """{nama: (encode(payload) -> bytes, decode(bytes) -> obj)}; payload /predict = list, batch = list of record"""
+    adapter = TypeAdapter(List[RecommendationResponse])
+
+    def legacy(payload):
+        if payload and "index" in payload[0]:
+            return "".join(json.dumps(row) + "\n" for row in payload).encode()
+        # Seperti FastAPI untuk response_model: validasi, serialize ke tipe JSON, lalu JSONResponse
+        payload = adapter.dump_python(adapter.validate_python(payload), mode="json")
+        return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+    def stream(media_type):
+        def encode(payload):
+            if payload and "index" in payload[0]:
+                return b"".join(encoding.ResponseEncoder(media_type).stream(payload))
+            return encoding.encode(payload, media_type)
+        return encode
+
+    def json_decode(body):
+        text = body.decode()
+        return [json.loads(line) for line in text.splitlines()] if text.startswith("{") else json.loads(text)
+
+    negotiated = {"json": (stream(encoding.JSON), json_decode)}
+    if encoding.msgpack is not None:
+        negotiated["msgpack"] = (stream(encoding.MSGPACK), _unpack_all)
+    result = {"legacy": (legacy, json_decode), **negotiated}
+    for name, (encode, decode) in negotiated.items():
+        for level in gzip_levels:
+            result[f"{name}_gzip{level}"] = _gzipped(encode, decode, level)
+    return result
+
+
+def _gzipped(encode, decode, level):
+    return (
+        lambda payload: encoding.gzip_bytes(encode(payload), level),
+        lambda body: decode(gzip.decompress(body)),
+    )
+
+
+def _unpack_all(body):
+    """Satu objek MessagePack (/predict) atau rangkaian objek (batch)"""
+    unpacker = encoding.msgpack.Unpacker()
+    unpacker.feed(body)
+    objects = list(unpacker)
+    return objects[0] if len(objects) == 1 else objects
+
+
+def bench_payload(payload, args):
+    result = {}
+    inputs = [payload] * args.repeats
+    for name, (encode, decode) in formats(args.gzip_levels).items():
+        body = encode(payload)
+        result[name] = {
+            "bytes": len(body),
+            "encode": _time_each(encode, inputs),
+            "decode": _time_each(decode, [body] * args.repeats),
+        }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Size and encode/decode time of /predict response formats")
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=1000, help="profiles in the /predict/batch payload")
+    parser.add_argument("--repeats", type=int, default=500, help="timed runs per format (batch: repeats // 50)")
+    parser.add_argument("--gzip-levels", type=int, nargs="+", default=[1, 6])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here (default: stdout only)")
+    args = parser.parse_args(argv)
+
+    predict, batch = payloads(synthetic_results(seed=args.seed), args.top_n, args.batch, seed=args.seed)
+    results = {"meta": {"top_n": args.top_n, "batch": args.batch, "msgpack": encoding.msgpack is not None},
+               "predict": bench_payload(predict, args)}
+    args.repeats = max(5, args.repeats // 50)
+    results["batch"] = bench_payload(batch, args)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.cf_engine import KerasCFScorer, NumpyCFScorer, check_parity
+
+tf = pytest.importorskip("tensorflow")
+
+N_PLAYERS, N_OPENINGS = 40, 25
+
+
+def _model(player_first=True, flatten=True, hidden=(16, 8), dropout=True):
+    """Model CF kecil dengan arsitektur yang sama seperti collaborative_model.keras"""
+    tf.keras.utils.set_random_seed(0)
+    shape = (1,) if flatten else ()
+    player = tf.keras.Input(shape=shape, name="player")
+    opening = tf.keras.Input(shape=shape, name="opening")
+    player_vec = tf.keras.layers.Embedding(N_PLAYERS, 8)(player)
+    opening_vec = tf.keras.layers.Embedding(N_OPENINGS, 6)(opening)
+    if flatten:
+        player_vec = tf.keras.layers.Flatten()(player_vec)
+        opening_vec = tf.keras.layers.Flatten()(opening_vec)
+    parts = [player_vec, opening_vec] if player_first else [opening_vec, player_vec]
+    x = tf.keras.layers.Concatenate()(parts)
+    for width in hidden:
+        x = tf.keras.layers.Dense(width, activation="relu")(x)
+        if dropout:
+            x = tf.keras.layers.Dropout(0.2)(x)
+    output = tf.keras.layers.Dense(1, activation="sigmoid")(x)
+    model = tf.keras.Model([player, opening], output)
+    # Bobot acak default menghasilkan prediksi di sekitar 0.5; perbesar agar selisih terlihat
+    model.set_weights([w * 3 for w in model.get_weights()])
+    return model
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"player_first": False},
+    {"flatten": False},
+    {"hidden": (), "dropout": False},
+])
+def test_numpy_scorer_matches_keras_predict(kwargs):
+    model = _model(**kwargs)
+    players = np.arange(N_PLAYERS)
+    openings = np.arange(N_OPENINGS)
+
+    scorer = NumpyCFScorer.from_keras(model)
+    diff = check_parity(KerasCFScorer(model), scorer, players, openings)
+
+    assert diff <= settings.CF_PARITY_TOLERANCE
+
+
+def test_numpy_scorer_chunks_and_roundtrip(tmp_path):
+    model = _model()
+    players = np.array([3, 0, 39, 3])
+    openings = np.array([24, 1, 7])
+    expected = KerasCFScorer(model).score(players, openings)
+
+    chunked = NumpyCFScorer.from_keras(model, grid_cells=len(openings))
+    np.testing.assert_allclose(chunked.score(players, openings), expected, atol=settings.CF_PARITY_TOLERANCE)
+
+    path = tmp_path / "cf.pkl"
+    chunked.save(path, source_sha256="abc")
+    assert NumpyCFScorer.load(path, source_sha256="other") is None
+    loaded = NumpyCFScorer.load(path, source_sha256="abc")
+    np.testing.assert_allclose(loaded.score(players, openings), expected, atol=settings.CF_PARITY_TOLERANCE)
+
+
+def test_unsupported_architecture_is_rejected():
+    player = tf.keras.Input(shape=(1,))
+    opening = tf.keras.Input(shape=(1,))
+    player_vec = tf.keras.layers.Flatten()(tf.keras.layers.Embedding(N_PLAYERS, 4)(player))
+    opening_vec = tf.keras.layers.Flatten()(tf.keras.layers.Embedding(N_OPENINGS, 4)(opening))
+    output = tf.keras.layers.Dot(axes=1)([player_vec, opening_vec])
+    model = tf.keras.Model([player, opening], output)
+
+    with pytest.raises(NotImplementedError):
+        NumpyCFScorer.from_keras(model)
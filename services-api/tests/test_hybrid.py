@@ -0,0 +1,151 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.config import settings
+from app.services.cb_engine import SimilarityIndex
+from app.services.engine import ChessRecommender
+from app.services.hybrid import NO_CANDIDATES, _frame, blend, reference_blend
+from app.services.ranking import descending_order, percentile_rank, top_n_indices
+from app.services.vocab import OpeningVocabulary
+
+# Urutan id sengaja tidak leksikografis, agar urutan baris outer-merge ikut teruji
+NAMES = [f"Opening {chr(ord('Z') - i % 26)}{i}" for i in range(60)]
+
+
+def _candidates(rng, vocab, size, decimals=None, constant=None):
+    ids = rng.choice(len(vocab), size=size, replace=False).astype(np.intp)
+    scores = rng.random(size)
+    if decimals is not None:
+        scores = np.round(scores, decimals)
+    if constant is not None:
+        scores = np.full(size, constant)
+    order = descending_order(scores)
+    return ids[order], scores[order]
+
+
+def _assert_same(actual, expected, vocab):
+    if expected is None:
+        assert actual is None
+        return
+    ids, hybrid, cb_col, cf_col = actual
+    assert [vocab.names[i] for i in ids] == expected["opening_name"].tolist()
+    np.testing.assert_array_equal(hybrid, expected["hybrid_score"].to_numpy(dtype=np.float64))
+    np.testing.assert_array_equal(cb_col, expected["cb_score"].to_numpy(dtype=np.float64))
+    np.testing.assert_array_equal(cf_col, expected["cf_score"].to_numpy(dtype=np.float64))
+
+
+def _check(cb, cf, favorites, alpha, top_n, vocab):
+    actual = blend(cb, cf, vocab.lookup(favorites), alpha, top_n, vocab.rank)
+    expected = reference_blend(
+        _frame(cb, vocab.names, "similarity_score"),
+        _frame(cf, vocab.names, "score"),
+        favorites, alpha, top_n,
+    )
+    _assert_same(actual, expected, vocab)
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("cb_kwargs, cf_kwargs", [
+    ({}, {}),
+    ({"decimals": 1}, {"decimals": 1}),  # banyak nilai seri
+    ({"decimals": 0}, {}),
+    ({"constant": 0.0}, {"decimals": 1}),  # tidak ada skor CB positif
+    ({"constant": 0.5}, {"constant": 0.5}),  # semua seri, hybrid konstan
+])
+def test_blend_matches_reference(seed, cb_kwargs, cf_kwargs):
+    rng = np.random.default_rng(seed)
+    vocab = OpeningVocabulary(NAMES)
+    cb = _candidates(rng, vocab, int(rng.integers(1, 40)), **cb_kwargs)
+    cf = _candidates(rng, vocab, int(rng.integers(1, 40)), **cf_kwargs)
+    favorites = list(rng.choice(NAMES, size=int(rng.integers(0, 4)), replace=False)) + ["Unknown Opening"]
+    for alpha in (0.0, 0.3, 0.5, 1.0):
+        for top_n in (1, 5, 100):
+            _check(cb, cf, favorites, alpha, top_n, vocab)
+
+
+@pytest.mark.parametrize("decimals", [None, 1])
+def test_blend_single_stage_matches_reference(decimals):
+    rng = np.random.default_rng(1)
+    vocab = OpeningVocabulary(NAMES)
+    candidates = _candidates(rng, vocab, 30, decimals=decimals)
+    favorites = [vocab.names[candidates[0][0]]]
+    for alpha in (0.0, 0.5, 1.0):
+        _check(candidates, NO_CANDIDATES, favorites, alpha, 10, vocab)
+        _check(NO_CANDIDATES, candidates, favorites, alpha, 10, vocab)
+    _check(NO_CANDIDATES, NO_CANDIDATES, favorites, 0.5, 10, vocab)
+
+
+def _tied_content_model(n=120, seed=0):
+    """content_based_model.pkl dengan similarity dibulatkan 1 desimal (banyak nilai seri)"""
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.random((n, n)), 1)
+    values = np.maximum(values, values.T)
+    np.fill_diagonal(values, 1.0)
+    names = [f"Opening {chr(ord('Z') - i % 26)}{i}" for i in range(n)]
+    sim_df = pd.DataFrame(values, index=names, columns=names)
+    return {"similarity_matrix": sim_df, "opening_names": names}
+
+
+@pytest.mark.parametrize("source", ["pickle", "matrix"])
+def test_content_based_candidates_match_pandas_baseline(source, tmp_path, monkeypatch):
+    model = _tied_content_model()
+    model_path = tmp_path / "content_based_model.pkl"
+    with open(model_path, "wb") as f:
+        pickle.dump(model, f)
+    matrix_path = tmp_path / "content_based_matrix.npy"
+    if source == "matrix":
+        SimilarityIndex.from_model(model).save(matrix_path, source_path=model_path)
+    monkeypatch.setattr(settings, "CONTENT_MODEL_PATH", model_path)
+    monkeypatch.setattr(settings, "CB_MATRIX_PATH", matrix_path)
+    monkeypatch.setattr(settings, "CB_ENGINE", "matrix")
+    recommender = ChessRecommender()
+    recommender._load_content_based()
+
+    sim_df = model["similarity_matrix"]
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        favorites = list(rng.choice(model["opening_names"], size=int(rng.integers(1, 5)), replace=False))
+        # Jalur pandas sebelum refactor (ChessRecommender._get_content_based lama)
+        valid_favs = [o for o in favorites if o in model["opening_names"]]
+        expected = sim_df[valid_favs].mean(axis=1).sort_values(ascending=False).head(50)
+
+        ids, scores = recommender._get_content_based(favorites)
+        assert [recommender._vocab.names[i] for i in ids] == expected.index.tolist()
+        np.testing.assert_array_equal(scores, expected.to_numpy())
+
+
+@pytest.mark.parametrize("values", [
+    [3.0, 1.0, 3.0, 2.0, 1.0, 3.0],
+    [0.5] * 17,
+    [1.0, np.nan, 2.0, np.nan, 2.0],
+    list(np.round(np.random.default_rng(0).random(200), 1)),
+    [],
+])
+def test_descending_order_matches_pandas_sort_values(values):
+    values = np.asarray(values, dtype=np.float64)
+    expected = pd.Series(values).sort_values(ascending=False).index.to_numpy()
+    np.testing.assert_array_equal(descending_order(values), expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("n", [1, 50, 500])
+def test_top_n_indices_matches_pandas_head(seed, n):
+    values = np.round(np.random.default_rng(seed).random(300), 1)  # banyak nilai seri di batas top-n
+    expected = pd.Series(values).sort_values(ascending=False).head(n).index.to_numpy()
+    np.testing.assert_array_equal(top_n_indices(values, n), expected)
+
+
+@pytest.mark.parametrize("values", [
+    [3.0, 1.0, 3.0, 2.0, 1.0, 3.0],
+    [0.5] * 17,
+    [0.0, 0.0, 1.0],
+    list(np.round(np.random.default_rng(0).random(200), 1)),
+    [],
+])
+def test_percentile_rank_matches_pandas_rank(values):
+    values = np.asarray(values, dtype=np.float64)
+    expected = pd.Series(values).rank(method="average", pct=True).to_numpy()
+    np.testing.assert_array_equal(percentile_rank(values), expected)